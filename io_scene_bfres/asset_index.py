@@ -0,0 +1,259 @@
+"""SQLite index of the models, materials and textures in a game dump, to find the file that holds a texture.
+
+The index is built without Blender, from the command line:
+
+    python -m io_scene_bfres.asset_index path/to/romfs path/to/index.sqlite
+
+Running it again only scans files whose modification time or size changed. Every file is decompressed and unpacked,
+and the BFRES and BNTX files in it are read with the header scanners, so nothing is decoded.
+
+Inside a file, an entry is found by its `member` path: a JSON list of SARC file indices, ending with the name of the
+embedded file if it is inside a BFRES. The member of a file that isn't in an archive is `[]`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from . import container
+from .exceptions import MalformedFileError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+log = logging.getLogger(__name__)
+
+SUFFIXES = {".bfres", ".sbfres", ".bntx", ".szs", ".zs", ".sarc", ".pack"}
+"""Suffixes of the files that are scanned, any other file in the dump is skipped."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS models (file_id INTEGER NOT NULL, member TEXT NOT NULL, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS materials (
+    file_id INTEGER NOT NULL, member TEXT NOT NULL, model TEXT NOT NULL, name TEXT NOT NULL, texture_refs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS textures (
+    file_id INTEGER NOT NULL,
+    member TEXT NOT NULL,
+    name TEXT NOT NULL,
+    format TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mip_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS models_name ON models (name);
+CREATE INDEX IF NOT EXISTS textures_name ON textures (name);
+CREATE INDEX IF NOT EXISTS models_file ON models (file_id);
+CREATE INDEX IF NOT EXISTS materials_file ON materials (file_id);
+CREATE INDEX IF NOT EXISTS textures_file ON textures (file_id);
+"""
+
+
+@dataclass
+class FileEntries:
+    """The rows scanned from one file."""
+
+    models: list[tuple[str, str]] = field(default_factory=list)
+    """`(member, name)`"""
+    materials: list[tuple[str, str, str, str]] = field(default_factory=list)
+    """`(member, model, name, texture refs as JSON)`"""
+    textures: list[tuple[str, str, str, int, int, int]] = field(default_factory=list)
+    """`(member, name, format, width, height, mip count)`"""
+
+
+@dataclass(frozen=True)
+class TextureLocation:
+    path: Path
+    member: tuple[str | int, ...]
+
+
+class AssetIndex:
+    """An asset index database, created if it doesn't exist."""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def update(self, root, workers=0) -> tuple[int, int]:
+        """Scan the files under `root` that are new or changed since the last update, and forget deleted ones.
+
+        Return the number of scanned and removed files.
+        """
+        root = Path(root).resolve()
+        known = {
+            path: (file_id, mtime_ns, size)
+            for file_id, path, mtime_ns, size in self.connection.execute("SELECT id, path, mtime_ns, size FROM files")
+        }
+        changed = []
+        seen = set()
+        for path in _walk(root):
+            stat = path.stat()
+            seen.add(str(path))
+            entry = known.get(str(path))
+            if entry is None or entry[1:] != (stat.st_mtime_ns, stat.st_size):
+                changed.append((path, stat.st_mtime_ns, stat.st_size))
+
+        removed = [file_id for path, (file_id, _, _) in known.items() if path not in seen and _is_under(path, root)]
+        with self.connection:
+            for file_id in removed:
+                self._remove(file_id)
+
+        paths = [path for path, _, _ in changed]
+        if not paths:
+            return 0, len(removed)
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            for (path, mtime_ns, size), entries in zip(changed, pool.map(scan_file, paths, chunksize=16)):
+                with self.connection:
+                    self._store(path, mtime_ns, size, entries)
+        log.info("Scanned %d files, removed %d", len(changed), len(removed))
+        return len(changed), len(removed)
+
+    def find_texture(self, name: str) -> list[TextureLocation]:
+        """The files that hold a texture named `name`."""
+        rows = self.connection.execute(
+            "SELECT files.path, textures.member FROM textures JOIN files ON files.id = textures.file_id "
+            "WHERE textures.name = ?",
+            (name,),
+        )
+        return [TextureLocation(Path(path), tuple(json.loads(member))) for path, member in rows]
+
+    def find_textures(self, names: Iterable[str]) -> dict[str, list[TextureLocation]]:
+        return {name: locations for name in names if (locations := self.find_texture(name))}
+
+    def find_model(self, name: str) -> list[Path]:
+        """The files that hold a model named `name`."""
+        rows = self.connection.execute(
+            "SELECT DISTINCT files.path FROM models JOIN files ON files.id = models.file_id WHERE models.name = ?",
+            (name,),
+        )
+        return [Path(path) for (path,) in rows]
+
+    def _remove(self, file_id: int):
+        for table in ("models", "materials", "textures"):
+            self.connection.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,))  # noqa: S608
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _store(self, path: Path, mtime_ns: int, size: int, entries: FileEntries):
+        row = self.connection.execute("SELECT id FROM files WHERE path = ?", (str(path),)).fetchone()
+        if row is not None:
+            self._remove(row[0])
+        file_id = self.connection.execute(
+            "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)", (str(path), mtime_ns, size)
+        ).lastrowid
+        self.connection.executemany("INSERT INTO models VALUES (?, ?, ?)", [(file_id, *r) for r in entries.models])
+        self.connection.executemany(
+            "INSERT INTO materials VALUES (?, ?, ?, ?, ?)", [(file_id, *r) for r in entries.materials]
+        )
+        self.connection.executemany(
+            "INSERT INTO textures VALUES (?, ?, ?, ?, ?, ?, ?)", [(file_id, *r) for r in entries.textures]
+        )
+
+
+def scan_file(path) -> FileEntries:
+    """Scan a file for the index, an unreadable file has no entries."""
+    entries = FileEntries()
+    try:
+        with open(path, "rb") as f:
+            _scan_stream(io.BytesIO(f.read()), (), entries)
+    except Exception:
+        log.warning("Could not scan '%s'", path, exc_info=True)
+    return entries
+
+
+def _scan_stream(raw: io.BytesIO, member: tuple, entries: FileEntries):
+    from .bfrespy.scan import scan as scan_bfres
+    from .bntx.scan import scan as scan_bntx
+
+    raw = container.decompress(raw)
+    magic = raw.read(4)
+    raw.seek(0, io.SEEK_SET)
+    key = json.dumps(member)
+    match magic:
+        case b"BNTX":
+            for tex in scan_bntx(raw).textures:
+                entries.textures.append((key, tex.name, tex.format_name, tex.width, tex.height, tex.mip_count))
+        case b"FRES":
+            summary = scan_bfres(raw)
+            for model in summary.models:
+                entries.models.append((key, model.name))
+                for mat in model.materials:
+                    entries.materials.append((key, model.name, mat.name, json.dumps(mat.texture_refs)))
+            data = raw.getbuffer()
+            for name, (offset, size) in summary.external_files.items():
+                if offset and bytes(data[offset : offset + 4]) == b"BNTX":
+                    _scan_stream(io.BytesIO(data[offset : offset + size]), (*member, name), entries)
+        case b"SARC":
+            for i, data in enumerate(container.sarc_files(raw)):
+                _scan_stream(io.BytesIO(data), (*member, i), entries)
+
+
+def open_member(path, member: Iterable[str | int]) -> io.BytesIO:
+    """Return the decompressed stream of a file in the index, following its member path."""
+    with open(path, "rb") as f:
+        raw = container.decompress(io.BytesIO(f.read()))
+    for part in member:
+        if isinstance(part, int):
+            for i, data in enumerate(container.sarc_files(raw)):
+                if i == part:
+                    raw = container.decompress(io.BytesIO(data))
+                    break
+            else:
+                raise MalformedFileError(f"'{path}' has no SARC member {part}")
+        else:
+            from .bfrespy.scan import scan as scan_bfres
+
+            offset, size = scan_bfres(raw).external_files[part]
+            raw = io.BytesIO(raw.getbuffer()[offset : offset + size])
+    return raw
+
+
+def _walk(root: Path) -> Iterator[Path]:
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath, filename)
+            if path.suffix.lower() in SUFFIXES:
+                yield path
+
+
+def _is_under(path: str, root: Path) -> bool:
+    return Path(path).is_relative_to(root)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index the models, materials and textures in a game dump.")
+    parser.add_argument("root", type=Path, help="directory to search for BFRES, BNTX and SARC files")
+    parser.add_argument("index", type=Path, help="SQLite database to create or update")
+    parser.add_argument("--jobs", type=int, default=0, help="number of processes, 0 for one per core")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with AssetIndex(args.index) as index:
+        index.update(args.root, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,11 @@ class AttributeFormat:
             self.min = TYPE_RANGES[self.read[-1]][0]
             self.max = TYPE_RANGES[self.read[-1]][1]
 
+        self.count = int(self.read[:-1] or 1)
+        """Number of components per vertex."""
+        self.dtype = np.dtype("<" + self.read[-1])
+        """Type of a single component."""
+
     @staticmethod
     def nibble(array: np.ndarray):
         # XXX: Untested
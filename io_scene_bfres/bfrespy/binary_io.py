@@ -14,6 +14,7 @@ class BinaryReader:
     def __init__(self, stream: io.BytesIO | io.BufferedReader | bytes):
         self.endianness: str
         self.stream: io.BytesIO | io.BufferedReader
+        self._buffer: memoryview | None = None
 
         if isinstance(stream, bytes):
             self.stream = io.BytesIO(stream)
@@ -42,6 +43,33 @@ class BinaryReader:
     def tell(self):
         return self.stream.tell()
 
+    @property
+    def buffer(self) -> memoryview:
+        """The whole stream as a read only memoryview.
+
+        The contents of a BytesIO are shared rather than copied, any other stream is read once.
+        """
+        if self._buffer is None:
+            if isinstance(self.stream, io.BytesIO):
+                data = self.stream.getvalue()
+            else:
+                with self.temporary_seek(0, io.SEEK_SET):
+                    data = self.stream.read()
+            self._buffer = memoryview(data).toreadonly()
+        return self._buffer
+
+    def read_view(self, count) -> memoryview:
+        """Return a zero-copy view of the next `count` bytes and advance past them."""
+        pos = self.tell()
+        self.seek(count, io.SEEK_CUR)
+        return self.buffer[pos : pos + count]
+
+    def read_records(self, dtype: np.dtype, count) -> np.ndarray:
+        """Read `count` records of a structured dtype at once, copied so they don't keep the stream alive."""
+        pos = self.tell()
+        self.seek(dtype.itemsize * count, io.SEEK_CUR)
+        return np.frombuffer(self.buffer, dtype, count, pos).copy()
+
     def read_null_string(self, encoding=None) -> str:
         # Mostly the same as ascii i dont think there's harm in setting this?
         encoding = encoding if encoding is not None else "utf-8"
@@ -14,8 +14,6 @@ if TYPE_CHECKING:
 
 T = TypeVar("T", bound=core.ResData)
 
-stringcache: dict[int, str] = {}
-
 
 class Decimal10x5:
     """Represents a 16-bit fixed-point decimal consisting of 1 sign bit, 10
@@ -423,7 +421,7 @@ class Buffer(core.ResData):
 
     def __init__(self):
         self.stride: int
-        self.data: list[bytes]
+        self.data: list[bytes | memoryview]
         self.flags: int
         self.buff_offs: int
 
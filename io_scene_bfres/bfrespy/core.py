@@ -5,7 +5,10 @@ import logging
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING, TypeVar
 
+import numpy as np
+
 from . import binary_io as bin_io
+from .records import Record, RecordArray
 
 if TYPE_CHECKING:
     from collections.abc import Callable
@@ -22,6 +25,7 @@ class ResData(ABC):
 
 
 _I = TypeVar("_I", bound=ResData)
+_R = TypeVar("_R", bound=Record)
 _T = TypeVar("_T")
 
 BYTE_ORDER = {
@@ -36,10 +40,18 @@ log = logging.getLogger(__name__)
 class ResFileLoader(bin_io.BinaryReader):
     """Load the hierachy and data of a Bfres ResFile"""
 
-    def __init__(self, res_file, stream: io.BytesIO | io.BufferedReader, res_data: ResData | None = None):
+    def __init__(
+        self,
+        res_file,
+        stream: io.BytesIO | io.BufferedReader,
+        res_data: ResData | None = None,
+        string_cache: dict[int, str] | None = None,
+    ):
         super().__init__(stream)
         self.res_file = res_file
         self._data_map = {}
+        self.string_cache: dict[int, str] = {} if string_cache is None else string_cache
+        """Strings referenced by ID instead of by offset, from an external string file."""
         self.is_switch: bool
         if res_data:
             self.importable_file = res_data
@@ -114,32 +126,43 @@ class ResFileLoader(bin_io.BinaryReader):
                 count -= 1
             return list_
 
+    def load_records(self, record_type: type[_R], count, offset=None) -> RecordArray[_R]:
+        """Read and return an array of count records of type _R, like
+        `load_list`, but all at once.
+        """
+        offset = self.read_offset() if offset is None else offset
+        if offset == 0 or count == 0:
+            return RecordArray(record_type, np.empty(0, record_type.dtype(self.endianness)))
+        with self.temporary_seek(offset, io.SEEK_SET):
+            return RecordArray(record_type, self.read_records(record_type.dtype(self.endianness), count))
+
     def load_string(self, encoding=None) -> str:
         """Read and return a str instance from the following offset or an
         empty string if the read offset is 0.
         """
-        from . import common
+        return self.load_string_at(self.read_offset(), encoding)
 
-        offset = self.read_offset()
+    def load_string_at(self, offset, encoding=None) -> str:
+        """Return the str instance at an offset or an empty string if the
+        offset is 0.
+        """
         if offset == 0:
             return ""
-        if offset in common.stringcache:
-            return common.stringcache[offset]
+        if offset in self.string_cache:
+            return self.string_cache[offset]
         with self.temporary_seek(offset, io.SEEK_SET):
             return self.read_string(encoding)
 
     def load_strings(self, count, encoding=None) -> tuple[str, ...]:
         """Read and return count of str from the following offset."""
-        from . import common
-
         offsets = self.read_offsets(count)
         names = [""] * len(offsets)
         with self.temporary_seek():
             for i, offset in enumerate(offsets):
                 if offset == 0:
                     continue
-                if offset in common.stringcache:
-                    names[i] = common.stringcache[offset]
+                if offset in self.string_cache:
+                    names[i] = self.string_cache[offset]
                 self.seek(offset, io.SEEK_SET)
                 names[i] = self.read_string(encoding)
         return tuple(names)
@@ -161,7 +184,10 @@ class ResFileLoader(bin_io.BinaryReader):
             dict_.load(dict_type, self)
 
             keys = list(dict_.keys())
-            values = self.load_list(dict_type, len(dict_), values_offs)
+            if issubclass(dict_type, Record):
+                values = self.load_records(dict_type, len(dict_), values_offs)
+            else:
+                values = self.load_list(dict_type, len(dict_), values_offs)
 
             dict_.clear()
             for i in range(len(keys)):
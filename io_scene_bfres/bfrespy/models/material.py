@@ -1,9 +1,12 @@
 import math
+from collections import defaultdict
 from enum import IntEnum, auto
+from functools import lru_cache
 from typing import Any
 
+import numpy as np
+
 from .. import core, gx2
-from ..binary_io import BinaryReader
 from ..common import ResDict, ResString, Srt2D, Srt3D, TexSrt, TexSrtMode, TextureRef, UserData
 
 
@@ -94,88 +97,10 @@ class Material(core.ResData):
     def __read_shaderparams(self, data: bytes, endianness: str):
         if data is None:
             return
-        import io
-
-        with BinaryReader(io.BytesIO(data)) as reader:
-            reader.endianness = endianness
-            for param in self.shaderparams.values():
-                reader.seek(param.data_offs, io.SEEK_SET)
-                param.data = self.__read_param_data(param.type, reader)
-
-    def __read_param_data(self, type_, reader: BinaryReader):
-        match type_:
-            case ShaderParamType.BOOL:
-                return reader.read_bool()
-            case ShaderParamType.BOOL2:
-                return reader.read_bools(2)
-            case ShaderParamType.BOOL3:
-                return reader.read_bools(3)
-            case ShaderParamType.BOOL4:
-                return reader.read_bools(4)
-            case ShaderParamType.FLOAT:
-                return reader.read_single()
-            case ShaderParamType.FLOAT2:
-                return reader.read_singles(2)
-            case ShaderParamType.FLOAT2X2:
-                return reader.read_singles(2 * 2)
-            case ShaderParamType.FLOAT2X3:
-                return reader.read_singles(2 * 3)
-            case ShaderParamType.FLOAT2X4:
-                return reader.read_singles(2 * 4)
-            case ShaderParamType.FLOAT3:
-                return reader.read_singles(3)
-            case ShaderParamType.FLOAT3X2:
-                return reader.read_singles(3 * 2)
-            case ShaderParamType.FLOAT3X3:
-                return reader.read_singles(3 * 3)
-            case ShaderParamType.FLOAT3X4:
-                return reader.read_singles(3 * 4)
-            case ShaderParamType.FLOAT4:
-                return reader.read_singles(4)
-            case ShaderParamType.FLOAT4X2:
-                return reader.read_singles(4 * 2)
-            case ShaderParamType.FLOAT4X3:
-                return reader.read_singles(4 * 3)
-            case ShaderParamType.FLOAT4X4:
-                return reader.read_singles(4 * 4)
-            case ShaderParamType.INT:
-                return reader.read_int32()
-            case ShaderParamType.INT2:
-                return reader.read_int32s(2)
-            case ShaderParamType.INT3:
-                return reader.read_int32s(3)
-            case ShaderParamType.INT4:
-                return reader.read_int32s(4)
-            case ShaderParamType.UINT:
-                return reader.read_int32()
-            case ShaderParamType.UINT2:
-                return reader.read_int32s(2)
-            case ShaderParamType.UINT3:
-                return reader.read_int32s(3)
-            case ShaderParamType.UINT4:
-                return reader.read_int32s(4)
-            case ShaderParamType.RESERVED2:
-                return reader.read_bytes(2)
-            case ShaderParamType.RESERVED3:
-                return reader.read_bytes(3)
-            case ShaderParamType.RESERVED4:
-                return reader.read_bytes(4)
-            case ShaderParamType.SRT2D:
-                return Srt2D(reader.read_vector2f(), reader.read_single(), reader.read_vector2f())
-            case ShaderParamType.SRT3D:
-                return Srt3D(
-                    reader.read_vector3f(),
-                    reader.read_vector3f(),
-                    reader.read_vector3f(),
-                )
-            case ShaderParamType.TEX_SRT | ShaderParamType.TEX_SRT_EX:
-                return TexSrt(
-                    TexSrtMode(reader.read_int32()),
-                    reader.read_vector2f(),
-                    reader.read_single(),
-                    reader.read_vector2f(),
-                )
-        return 0
+        params = list(self.shaderparams.values())
+        table = tuple((param.type, param.data_offs) for param in params)
+        for param, (type_, _), value in zip(params, table, decode_shader_params(data, table, endianness)):
+            param.data = _param_value(type_, value)
 
 
 class MaterialFlags(IntEnum):
@@ -547,6 +472,124 @@ class ShaderParamType(IntEnum):
     """The value is a TexSrtEx."""
 
 
+_PARAM_LAYOUTS: dict[ShaderParamType, tuple[str, int]] = {
+    ShaderParamType.BOOL: ("?", 1),
+    ShaderParamType.BOOL2: ("?", 2),
+    ShaderParamType.BOOL3: ("?", 3),
+    ShaderParamType.BOOL4: ("?", 4),
+    ShaderParamType.INT: ("i4", 1),
+    ShaderParamType.INT2: ("i4", 2),
+    ShaderParamType.INT3: ("i4", 3),
+    ShaderParamType.INT4: ("i4", 4),
+    ShaderParamType.UINT: ("i4", 1),
+    ShaderParamType.UINT2: ("i4", 2),
+    ShaderParamType.UINT3: ("i4", 3),
+    ShaderParamType.UINT4: ("i4", 4),
+    ShaderParamType.FLOAT: ("f4", 1),
+    ShaderParamType.FLOAT2: ("f4", 2),
+    ShaderParamType.FLOAT3: ("f4", 3),
+    ShaderParamType.FLOAT4: ("f4", 4),
+    ShaderParamType.RESERVED2: ("V", 2),
+    ShaderParamType.FLOAT2X2: ("f4", 2 * 2),
+    ShaderParamType.FLOAT2X3: ("f4", 2 * 3),
+    ShaderParamType.FLOAT2X4: ("f4", 2 * 4),
+    ShaderParamType.RESERVED3: ("V", 3),
+    ShaderParamType.FLOAT3X2: ("f4", 3 * 2),
+    ShaderParamType.FLOAT3X3: ("f4", 3 * 3),
+    ShaderParamType.FLOAT3X4: ("f4", 3 * 4),
+    ShaderParamType.RESERVED4: ("V", 4),
+    ShaderParamType.FLOAT4X2: ("f4", 4 * 2),
+    ShaderParamType.FLOAT4X3: ("f4", 4 * 3),
+    ShaderParamType.FLOAT4X4: ("f4", 4 * 4),
+}
+"""The element format and count of the vector and matrix parameter types, matrices are flat."""
+
+
+_SRT_READS: dict[ShaderParamType, tuple[tuple[str, int, int], ...]] = {
+    ShaderParamType.SRT2D: (("f4", 5, 0),),
+    ShaderParamType.SRT3D: (("f4", 9, 0),),
+    ShaderParamType.TEX_SRT: (("i4", 1, 0), ("f4", 5, 4)),
+    ShaderParamType.TEX_SRT_EX: (("i4", 1, 0), ("f4", 5, 4)),
+}
+"""The `(format, count, offset)` of the fields of the SRT types, assembled by `_param_value`."""
+
+
+@lru_cache(maxsize=256)
+def _param_reads(table: tuple[tuple[ShaderParamType, int], ...]) -> list[tuple[str, int, int, list, np.ndarray]]:
+    """The reads that decode a parameter table, one for all values with the same format, count and alignment.
+
+    Every read is `(format, count, alignment, targets, element indices)`, with the element indices of every value in a
+    row. A target is a parameter index, or `(parameter index, field)` for the fields of SRT values. Floats and ints are
+    indexed in 32-bit words starting at the alignment, the rest in bytes.
+    """
+    groups = defaultdict(list)
+    for i, (type_, offset) in enumerate(table):
+        if type_ in _SRT_READS:
+            fields = [((i, field), *read) for field, read in enumerate(_SRT_READS[type_])]
+        else:
+            fields = [(i, *_PARAM_LAYOUTS[type_], 0)]
+        for target, fmt, count, delta in fields:
+            start = offset + delta
+            if fmt in {"f4", "i4"}:
+                groups[fmt, count, start % 4].append((target, start // 4))
+            else:
+                groups[fmt, count, 0].append((target, start))
+    reads = []
+    for (fmt, count, shift), values in groups.items():
+        starts = np.array([start for _, start in values], dtype=np.int64)
+        reads.append((fmt, count, shift, [target for target, _ in values], starts[:, np.newaxis] + np.arange(count)))
+    return reads
+
+
+@lru_cache(maxsize=256)
+def decode_shader_params(data: bytes, table: tuple[tuple[ShaderParamType, int], ...], endianness: str) -> tuple:
+    """The values of the parameters at `(type, data offset)` in a material's parameter block.
+
+    The parameters are gathered from views of the block, with one NumPy index for all values of the same layout. SRT
+    values are tuples of their fields, see `_param_value`. Many materials share the same defaults, so the values of
+    identical blocks are cached.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    values: list[Any] = [None] * len(table)
+    for fmt, count, shift, targets, elements in _param_reads(table):
+        if fmt in {"f4", "i4"}:
+            source = np.frombuffer(data, np.dtype(fmt).newbyteorder(endianness), (len(data) - shift) // 4, shift)
+        else:
+            source = raw
+        if elements.size and elements.max() >= len(source):
+            raise ValueError("Shader parameter is outside of the parameter block")
+        rows = source[elements]
+        if fmt == "V":
+            converted = [row.tobytes() for row in rows]
+        elif count == 1:
+            converted = (rows[:, 0] != 0 if fmt == "?" else rows[:, 0]).tolist()
+        else:
+            converted = map(tuple, (rows != 0 if fmt == "?" else rows).tolist())
+        for target, value in zip(targets, converted):
+            if isinstance(target, tuple):
+                i, field = target
+                values[i] = values[i] or [None] * len(_SRT_READS[table[i][0]])
+                values[i][field] = value
+            else:
+                values[target] = value
+    return tuple(tuple(value) if isinstance(value, list) else value for value in values)
+
+
+def _param_value(type_: ShaderParamType, value) -> Any:
+    """The `ShaderParam.data` of a decoded parameter, SRT values are made from their fields."""
+    match type_:
+        case ShaderParamType.SRT2D:
+            ((sx, sy, rotation, tx, ty),) = value
+            return Srt2D((sx, sy), rotation, (tx, ty))
+        case ShaderParamType.SRT3D:
+            (srt,) = value
+            return Srt3D(srt[0:3], srt[3:6], srt[6:9])
+        case ShaderParamType.TEX_SRT | ShaderParamType.TEX_SRT_EX:
+            mode, (sx, sy, rotation, tx, ty) = value
+            return TexSrt(TexSrtMode(mode), (sx, sy), rotation, (tx, ty))
+    return value
+
+
 class Sampler(core.ResData):
     """Represents a Texture sampler in a UserData section, storing
     configuration on how to draw and interpolate textures.
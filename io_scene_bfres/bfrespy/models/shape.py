@@ -4,7 +4,8 @@ from enum import IntEnum, IntFlag
 from ..common import Buffer, ResDict
 from ..core import ResData, ResFileLoader
 from ..gx2 import GX2IndexFormat, GX2PrimitiveType
-from ..switch.memory_pool import BufferInfo, BufferTextureViewInfo, MemoryPool
+from ..records import Record, RecordArray
+from ..switch.memory_pool import BufferInfo, MemoryPool
 from .vertex_buffer_attrib import VertexBuffer
 
 
@@ -26,7 +27,7 @@ class Shape(ResData):
         self.meshes: list[Mesh] = []
         self.skin_bone_idxs = ()
         self.key_shapes: ResDict[KeyShape] = ResDict()
-        self.submesh_boundings: list[Bounding] = []
+        self.submesh_boundings: RecordArray[Bounding] | list[Bounding] = []
         self.submesh_bounding_nodes: list[BoundingNode] = []
         self.submesh_bounding_idxs = []
         self.vtx_buffer = VertexBuffer()
@@ -142,14 +143,14 @@ class Mesh(ResData):
             self.first_vtx = loader.read_uint32()
             num_submesh = loader.read_uint16()
             _ = loader.seek(2)
-            self.submeshes = loader.load_list(SubMesh, num_submesh, offset=submesh_array_offs)
-            data_offs = BufferTextureViewInfo.buff_offs + face_buff_offs
+            self.submeshes = loader.load_records(SubMesh, num_submesh, offset=submesh_array_offs)
+            data_offs = loader.res_file.buffer_info.buff_offs + face_buff_offs
 
             self.index_buffer = Buffer()
             self.index_buffer.flags = buffer_size.flags
             self.index_buffer.data = [b""]
             self.index_buffer.data[0] = loader.load_custom(
-                bytes, lambda: loader.read_bytes(buffer_size.size), data_offs
+                bytes, lambda: loader.read_view(buffer_size.size), data_offs
             )
 
     class SwitchIndexFormat(IntEnum):
@@ -178,7 +179,7 @@ class Mesh(ResData):
     primitive_type_list = {
         SwitchPrimitiveType.TRIANGLES: GX2PrimitiveType.TRIANGLES,
         SwitchPrimitiveType.TRIANGLES_ADJACENCY: GX2PrimitiveType.TRIANGLES_ADJACENCY,
-        SwitchPrimitiveType.TRIANGLE_STRIP: GX2PrimitiveType.TRIANGLE_STRIP_ADJACENCY,
+        SwitchPrimitiveType.TRIANGLE_STRIP: GX2PrimitiveType.TRIANGLE_STRIP,
         SwitchPrimitiveType.TRIANGLE_STRIP_ADJACENCY: GX2PrimitiveType.TRIANGLE_STRIP_ADJACENCY,
         SwitchPrimitiveType.LINES: GX2PrimitiveType.LINES,
         SwitchPrimitiveType.LINES_ADJACENCY: GX2PrimitiveType.LINES_ADJACENCY,
@@ -188,7 +189,9 @@ class Mesh(ResData):
     }
 
 
-class SubMesh(ResData):
+class SubMesh(ResData, Record):
+    _FIELDS = (("offset", "u4"), ("count", "u4"))
+
     def __init__(self):
         self.offset: int
         self.count: int
@@ -201,7 +204,9 @@ class SubMesh(ResData):
         self.count = loader.read_uint32()
 
 
-class KeyShape(ResData):
+class KeyShape(ResData, Record):
+    _FIELDS = (("target_attrib_idx", "V20"), ("target_attrib_idx_offs", "V4"))
+
     def __init__(self):
         self.target_attrib_idx: bytes
         self.target_attrib_idx_offs: bytes
@@ -211,11 +216,20 @@ class KeyShape(ResData):
         self.target_attrib_idx_offs = loader.read_bytes(4)
 
 
-class BoundingNode(ResData):
+class BoundingNode(ResData, Record):
     """Represents a node in a SubMesh bounding tree to determine when to show
     which sub mesh of a Mesh
     """
 
+    _FIELDS = (
+        ("left_child_idx", "u2"),
+        ("next_sibling", "u2"),
+        ("right_child_idx", "u2"),
+        ("unk", "u2"),
+        ("submesh_idx", "u2"),
+        ("submesh_cnt", "u2"),
+    )
+
     def __init__(self):
         self.left_child_idx: int
         self.next_sibling: int
@@ -234,9 +248,11 @@ class BoundingNode(ResData):
 
 
 @dataclass
-class Bounding:
+class Bounding(Record):
     """Represents a spatial bounding box."""
 
+    _FIELDS = (("center", "3f4"), ("extent", "3f4"))
+
     center: tuple[float, float, float]
     extent: tuple[float, float, float]
 
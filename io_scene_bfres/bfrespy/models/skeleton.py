@@ -1,7 +1,13 @@
+from __future__ import annotations
+
+import io
 from enum import IntFlag
 
+import numpy as np
+
 from ..common import ResDict, UserData
 from ..core import ResData, ResFileLoader
+from ..records import Fields, record_dtype, record_values
 
 
 class Bone(ResData):
@@ -16,7 +22,7 @@ class Bone(ResData):
     _FLAGS_MASK_TRANSFORM_CUMULATIVE = 0b11110000_00000000_00000000_00000000
 
     def __init__(self):
-        _flags = 0
+        self._flags = 0
         self.name = ""
         self.userdata = ResDict()
         self.parent_idx = -1
@@ -96,6 +102,27 @@ class Bone(ResData):
 
     # Methods
 
+    @staticmethod
+    def table_fields(version_major2: int) -> Fields:
+        """The layout of a bone in the bone array of a Switch file, the same fields `load` reads."""
+        fields = (("name_offs", "u8"), ("userdata_values_offs", "u8"), ("userdata_dict_offs", "u8"))
+        if version_major2 > 9:
+            fields += (("", "V8"),)
+        elif version_major2 in (8, 9):
+            fields += (("", "V16"),)
+        return fields + (
+            ("idx", "i2"),
+            ("parent_idx", "i2"),
+            ("smooth_mtx_idx", "i2"),
+            ("rigid_mtx_idx", "i2"),
+            ("billboard_idx", "i2"),
+            ("num_user_data", "u2"),
+            ("flags", "u4"),
+            ("scale", "3f4"),
+            ("rotation", "4f4"),
+            ("position", "3f4"),
+        )
+
     def load(self, loader: ResFileLoader):
         if loader.is_switch:
             self.name = loader.load_string()
@@ -224,6 +251,21 @@ class Skeleton(ResData):
         self.mtx_to_bone_list = []
         self.inverse_model_mtxs = []
         self.bones = ResDict()
+        self.bone_table: np.ndarray | None = None
+        """The bone array as a structured array with the fields of `Bone.table_fields`, for Switch files."""
+
+        # The bones as arrays, in the order of `bones`.
+        self.positions = np.zeros((0, 3), dtype=np.float32)
+        self.rotations = np.zeros((0, 4), dtype=np.float32)
+        """Quaternions as `(w, x, y, z)`, or XYZ Euler angles in the first three columns if `euler` is set."""
+        self.scales = np.zeros((0, 3), dtype=np.float32)
+        self.euler = np.zeros(0, dtype=bool)
+        self.parent_idx = np.zeros(0, dtype=np.int16)
+        self.smooth_mtx_idx = np.zeros(0, dtype=np.int16)
+        self.rigid_mtx_idx = np.zeros(0, dtype=np.int16)
+        self.mtx_to_bone = np.zeros(0, dtype=np.int32)
+        """The bone of every smooth and then rigid matrix, the palette skinning indices refer to."""
+
         self.flags_rotation = SkeletonFlagRotation.EULER_XYZ
         self.flags_scaling = SkeletonFlagScaling.MAYA
 
@@ -279,7 +321,7 @@ class Skeleton(ResData):
 
             bone_dict_offs = loader.read_offset()
             bone_array_offs = loader.read_offset()
-            self.bones = loader.load_dict_values(Bone, bone_dict_offs, bone_array_offs)
+            self.bones = self._load_bones(loader, bone_dict_offs, bone_array_offs)
             mtx_to_bone_list_offs = loader.read_offset()
             inverse_model_mtx_offs = loader.read_offset()
 
@@ -304,6 +346,73 @@ class Skeleton(ResData):
             self.inverse_model_mtxs = loader.load_custom(
                 list, lambda: loader.read_matrix_3x4s(self.num_smooth_mtxs), inverse_model_mtx_offs
             )
+        self._load_arrays()
+
+    def _load_arrays(self):
+        """Fill the bone arrays from the bone table, or from the bones if there is none."""
+        if self.bone_table is not None:
+            table = self.bone_table
+            positions, rotations, scales, flags = table["position"], table["rotation"], table["scale"], table["flags"]
+            parent_idx, smooth_mtx_idx, rigid_mtx_idx = (
+                table["parent_idx"],
+                table["smooth_mtx_idx"],
+                table["rigid_mtx_idx"],
+            )
+        else:
+            bones = list(self.bones.values())
+            positions = [bone.position[0:3] for bone in bones]
+            rotations = [bone.rotation[0:4] for bone in bones]
+            scales = [bone.scale[0:3] for bone in bones]
+            flags = [bone._flags for bone in bones]
+            parent_idx = [bone.parent_idx for bone in bones]
+            smooth_mtx_idx = [bone.smooth_mtx_idx for bone in bones]
+            rigid_mtx_idx = [bone.rigid_mtx_idx for bone in bones]
+        count = len(self.bones)
+        self.positions = np.asarray(positions, dtype=np.float32).reshape(count, 3)
+        self.rotations = np.asarray(rotations, dtype=np.float32).reshape(count, 4)
+        self.scales = np.asarray(scales, dtype=np.float32).reshape(count, 3)
+        self.euler = (np.asarray(flags, dtype=np.uint32) & Bone._FLAGS_MASK_ROTATE) == BoneFlagsRotation.EULER_XYZ
+        self.parent_idx = np.asarray(parent_idx, dtype=np.int16)
+        self.smooth_mtx_idx = np.asarray(smooth_mtx_idx, dtype=np.int16)
+        self.rigid_mtx_idx = np.asarray(rigid_mtx_idx, dtype=np.int16)
+        self.mtx_to_bone = np.asarray(self.mtx_to_bone_list, dtype=np.int32)
+
+    def _load_bones(self, loader: ResFileLoader, dict_offs, values_offs) -> ResDict[Bone]:
+        """Read the whole bone array at once, instead of one `Bone.load` at a time."""
+        bones = ResDict()
+        if dict_offs == 0:
+            return bones
+        with loader.temporary_seek(dict_offs, io.SEEK_SET):
+            bones.load(Bone, loader)
+        keys = list(bones.keys())
+        bones.clear()
+
+        dtype = record_dtype(Bone.table_fields(loader.res_file.version_major2), loader.endianness)
+        with loader.temporary_seek(values_offs, io.SEEK_SET):
+            self.bone_table = loader.read_records(dtype, len(keys))
+        names = loader.load_strings_at(self.bone_table["name_offs"].tolist())
+        for key, name, row in zip(keys, names, record_values(self.bone_table)):
+            bone = Bone()
+            bone.name = name
+            (
+                _,
+                userdata_values_offs,
+                userdata_dict_offs,
+                _,
+                bone.parent_idx,
+                bone.smooth_mtx_idx,
+                bone.rigid_mtx_idx,
+                bone.billboard_idx,
+                _,
+                bone._flags,
+                bone.scale,
+                bone.rotation,
+                bone.position,
+            ) = row
+            if userdata_dict_offs != 0:
+                bone.userdata = loader.load_dict_values(UserData, userdata_dict_offs, userdata_values_offs)
+            bones.append(key, bone)
+        return bones
 
 
 class SkeletonFlagScaling(IntFlag):
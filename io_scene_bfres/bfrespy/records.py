@@ -0,0 +1,105 @@
+"""Arrays of fixed-size records, read with one structured NumPy dtype instead of one object and unpack per field."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from functools import cache
+from typing import TYPE_CHECKING, ClassVar, Generic, TypeVar, overload
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+_R = TypeVar("_R", bound="Record")
+
+Fields = tuple[tuple[str, str], ...]
+"""`(name, format)` of every field in file order, with NumPy formats without byte order like `u4` or `3f4`.
+Fields without a name are padding.
+"""
+
+
+@cache
+def record_dtype(fields: Fields, endianness: str) -> np.dtype:
+    """The structured dtype of a record layout, padding takes space but isn't a field."""
+    names, formats, offsets = [], [], []
+    offset = 0
+    for name, fmt in fields:
+        dtype = np.dtype(fmt)
+        if name:
+            names.append(name)
+            formats.append(dtype.newbyteorder(endianness) if dtype.subdtype is None else _subarray(dtype, endianness))
+            offsets.append(offset)
+        offset += dtype.itemsize
+    return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": offset})
+
+
+def _subarray(dtype: np.dtype, endianness: str) -> np.dtype:
+    base, shape = dtype.subdtype
+    return np.dtype((base.newbyteorder(endianness), shape))
+
+
+def record_values(table: np.ndarray) -> list[tuple]:
+    """The fields of every record as Python values, vectors as tuples like `read_vector3f` returns them."""
+    rows = table.tolist()
+    vectors = [i for i, name in enumerate(table.dtype.names) if table.dtype[name].subdtype is not None]
+    if not vectors:
+        return rows
+    converted = []
+    for row in rows:
+        row = list(row)
+        for i in vectors:
+            row[i] = tuple(row[i].tolist())
+        converted.append(tuple(row))
+    return converted
+
+
+class Record:
+    """A fixed-size record, which `ResFileLoader.load_records` reads a whole array of at once."""
+
+    _FIELDS: ClassVar[Fields]
+
+    @classmethod
+    def dtype(cls, endianness: str) -> np.dtype:
+        return record_dtype(cls._FIELDS, endianness)
+
+    @classmethod
+    def from_values(cls: type[_R], names: tuple[str, ...], values: tuple) -> _R:
+        record = cls.__new__(cls)
+        record.__dict__.update(zip(names, values))
+        return record
+
+
+class RecordArray(Sequence, Generic[_R]):
+    """Records backed by a structured array.
+
+    Indexing or iterating makes the record objects, with the fields as attributes. A whole field is an array in
+    `data`, like `submeshes.data["count"]`.
+    """
+
+    __slots__ = ("data", "record_type")
+
+    def __init__(self, record_type: type[_R], data: np.ndarray):
+        self.record_type = record_type
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    @overload
+    def __getitem__(self, index: int) -> _R: ...
+    @overload
+    def __getitem__(self, index: slice) -> RecordArray[_R]: ...
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordArray(self.record_type, self.data[index])
+        i = range(len(self.data))[index]
+        return self.record_type.from_values(self.data.dtype.names, record_values(self.data[i : i + 1])[0])
+
+    def __iter__(self) -> Iterator[_R]:
+        names = self.data.dtype.names
+        for values in record_values(self.data):
+            yield self.record_type.from_values(names, values)
+
+    def __repr__(self):
+        return f"RecordArray[{self.record_type.__name__}]({len(self)})"
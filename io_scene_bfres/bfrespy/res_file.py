@@ -27,8 +27,12 @@ class ResFile(ResData):
 
         MESH_CODEC_RESAVE = 1 << 7
 
-    def __init__(self, stream: io.BytesIO | io.BufferedReader):
-        """Initialize a new instance of the ResFile class from a stream"""
+    def __init__(self, stream: io.BytesIO | io.BufferedReader, external_strings: dict[int, str] | None = None):
+        """Initialize a new instance of the ResFile class from a stream.
+
+        `external_strings` is the table of a previously loaded file that holds external strings, for files that refer
+        to their strings by ID.
+        """
         self.external_flag: ResFile.ExternalFlags
 
         self.is_platform_switch: bool
@@ -56,11 +60,13 @@ class ResFile(ResData):
         self.bone_visibility_anims: ResDict[VisibilityAnim]
         self.scene_anims: ResDict[SceneAnims]
         self.external_files: ResDict[ExternalFile]
+        self.external_strings: dict[int, str] = {} if external_strings is None else external_strings
+        self.holds_external_strings = False
 
         if self.is_switch_binary(stream):
             from .switch.switchcore import ResFileSwitchLoader
 
-            with ResFileSwitchLoader(self, stream) as loader:
+            with ResFileSwitchLoader(self, stream, string_cache=self.external_strings) as loader:
                 loader._execute()
         else:
             raise NotImplementedError("Sorry, WiiU files aren't supported yet")
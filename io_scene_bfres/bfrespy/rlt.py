@@ -1,4 +1,5 @@
 from .core import ResData, ResFileLoader
+from .records import Record, record_values
 
 
 class RelocationTable(ResData):
@@ -18,20 +19,20 @@ class RelocationTable(ResData):
         sections = []
         for i in range(self.section_count):
             sections.append(loader.load(self.ResSection, False))
+        entry_count = sum(section.entry_count for section in sections)
+        entries = iter(record_values(loader.read_records(self.ResEntry.dtype(loader.endianness), entry_count)))
         for section in sections:
             file_base = 0 if section.base_pointer == 0 else section.base_pointer - section.region_offs
             for e in range(section.entry_count):
-                entry = loader.load(self.ResEntry, False)
-                region_offs = entry.region_offs
-                offset_count = entry.reloc_count
+                region_offs, array_count, offset_count, array_stride = next(entries)
                 offset_mask = offset_count & 3
-                for array_idx in range(entry.array_count):
+                for array_idx in range(array_count):
                     region_offset_iter = region_offs
                     for offset_idx in range(offset_count):
                         reloc_pointer = file_base + region_offset_iter if region_offset_iter != 0 else 0
                         self.reloc_dict[region_offset_iter] = reloc_pointer
                         region_offset_iter += 8
-                    region_offs = region_offs + offset_count * 8 + entry.array_stride * 8
+                    region_offs = region_offs + offset_count * 8 + array_stride * 8
 
     @staticmethod
     def calc_table_size(sections, entries):
@@ -59,7 +60,9 @@ class RelocationTable(ResData):
             self.base_entry_idx = loader.read_uint32()
             self.entry_count = loader.read_uint32()
 
-    class ResEntry(ResData):
+    class ResEntry(ResData, Record):
+        _FIELDS = (("region_offs", "u4"), ("array_count", "u2"), ("reloc_count", "u1"), ("array_stride", "u1"))
+
         def __init__(self):
             self.region_offs: int
             self.array_count: int
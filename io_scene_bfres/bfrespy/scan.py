@@ -0,0 +1,258 @@
+"""Fast scanning of the names and counts in a ResFile, without loading it.
+
+Only the file header, the dictionaries and the headers of models, shapes, vertex buffers and materials are read. No
+vertex, index or texture data is touched, so a whole game dump can be catalogued quickly.
+"""
+
+from __future__ import annotations
+
+import io
+import struct
+from dataclasses import dataclass, field
+
+from .common import ResDict
+from .res_file import ResFile
+from .switch.switchcore import ResFileSwitchLoader
+
+
+@dataclass
+class ShapeSummary:
+    name: str
+    material_idx: int
+    vtx_count: int
+    vtx_skin_count: int
+    lod_count: int
+    attributes: tuple[str, ...]
+
+
+@dataclass
+class MaterialSummary:
+    name: str
+    texture_refs: tuple[str, ...]
+
+
+@dataclass
+class ModelSummary:
+    name: str
+    shapes: list[ShapeSummary] = field(default_factory=list)
+    materials: list[MaterialSummary] = field(default_factory=list)
+
+    @property
+    def vtx_count(self) -> int:
+        return sum(shape.vtx_count for shape in self.shapes)
+
+
+@dataclass
+class ResFileSummary:
+    """The names and counts of a ResFile, see `scan`."""
+
+    name: str
+    version: int
+    models: list[ModelSummary] = field(default_factory=list)
+    skeletal_anims: tuple[str, ...] = ()
+    external_files: dict[str, tuple[int, int]] = field(default_factory=dict)
+    """The `(offset, size)` of every embedded file, by name."""
+    holds_external_strings: bool = False
+
+    @property
+    def texture_refs(self) -> set[str]:
+        """The names of the textures any material refers to."""
+        return {name for model in self.models for mat in model.materials for name in mat.texture_refs}
+
+
+def scan(stream: io.BytesIO | io.BufferedReader, external_strings: dict[int, str] | None = None) -> ResFileSummary:
+    """Read the summary of a decompressed ResFile.
+
+    `external_strings` is the table of a previously loaded file that holds external strings, like for `ResFile`.
+    """
+    if not ResFile.is_switch_binary(stream):
+        raise NotImplementedError("Sorry, WiiU files aren't supported yet")
+    return _Scanner(stream, external_strings).scan()
+
+
+HEADER_SIZE = 0xF0
+"""The bytes of a ResFile `holds_external_strings` needs."""
+
+
+def holds_external_strings(header: bytes) -> bool:
+    """Whether the header of a decompressed ResFile says it holds the external string table other files refer to.
+
+    Unlike `scan`, this only needs the first `HEADER_SIZE` bytes of the file.
+    """
+    if len(header) < HEADER_SIZE or header[:4] != b"FRES" or not ResFile.is_switch_binary(io.BytesIO(header)):
+        return False
+    version_major2 = struct.unpack_from("<I", header, 8)[0] >> 16 & 0xFF
+    return version_major2 >= 10 and ResFile.has_flag(header[0xEE], ResFile.ExternalFlags.HOLDS_EXTERNAL_STRINGS)
+
+
+class _Scanner:
+    """Reads the same fields as the switch parsers, but skips everything that isn't a name or a count."""
+
+    def __init__(self, stream, external_strings):
+        self.loader = ResFileSwitchLoader(None, stream, string_cache=external_strings)
+        self.version_major = 0
+        self.version_major2 = 0
+
+    def scan(self) -> ResFileSummary:
+        loader = self.loader
+        loader.check_signature("FRES    ")
+        version = loader.read_uint32()
+        self.version_major = version >> 24
+        self.version_major2 = version >> 16 & 0xFF
+        loader.read_byte_order()
+        loader.seek(18)  # alignment, address size, file name, flags, block offset, relocation table and file size
+
+        summary = ResFileSummary(loader.load_string(), version)
+        model_offs = loader.read_offset()
+        model_dict_offs = loader.read_offset()
+        if self.version_major2 >= 9:
+            loader.seek(32)  # reserved
+        summary.skeletal_anims = tuple(self._dict_keys(loader.read_offset(), loader.read_offset()))
+        loader.seek(8 * 8)  # material, bone visibility, shape and scene animations
+        loader.seek(2 * 8)  # memory pool and buffer info
+
+        if self.version_major2 >= 10:
+            with loader.temporary_seek(0xEE, io.SEEK_SET):
+                flags = loader.read_byte()
+            if ResFile.has_flag(flags, ResFile.ExternalFlags.HOLDS_EXTERNAL_STRINGS):
+                summary.holds_external_strings = True
+                return summary
+
+        external_values_offs = loader.read_offset()
+        external_dict_offs = loader.read_offset()
+        external_names = self._dict_keys(external_values_offs, external_dict_offs)
+        external_files = self._list(self._external_file, len(external_names), external_values_offs)
+        summary.external_files = dict(zip(external_names, external_files))
+
+        models = len(self._dict_keys(model_offs, model_dict_offs))
+        summary.models = self._list(self._model, models, model_offs)
+        return summary
+
+    def _model(self) -> ModelSummary:
+        loader = self.loader
+        loader.check_signature("FMDL")
+        self._block_header()
+        model = ModelSummary(loader.load_string())
+        loader.seek(3 * 8)  # path, skeleton and vertex buffers
+        shape_values_offs = loader.read_offset()
+        shape_dict_offs = loader.read_offset()
+        material_values_offs = loader.read_offset()
+        material_dict_offs = loader.read_offset()
+        if self.version_major2 == 9:
+            off = material_dict_offs
+            material_dict_offs = loader.read_offset()
+            if material_dict_offs == 0:
+                material_dict_offs = off
+        elif self.version_major2 >= 10:
+            loader.seek(8)  # shader assign
+        loader.seek(3 * 8 + 6)  # user data, user pointer and vertex buffer, shape and material counts
+        loader.seek(10)  # user data count and padding, or shader assign and user data counts and padding
+
+        shapes = len(self._dict_keys(shape_values_offs, shape_dict_offs))
+        model.shapes = self._list(self._shape, shapes, shape_values_offs)
+        materials = len(self._dict_keys(material_values_offs, material_dict_offs))
+        model.materials = self._list(self._material, materials, material_values_offs)
+        return model
+
+    def _shape(self) -> ShapeSummary:
+        loader = self.loader
+        loader.check_signature("FSHP")
+        self._block_header()
+        name = loader.load_string()
+        vtx_buffer_offs = loader.read_offset()
+        loader.seek(6 * 8)  # meshes, skin bone indices, key shapes, bounding boxes and radius or user pointer
+        if self.version_major2 > 2 or self.version_major > 0:
+            loader.seek(8)  # user pointer
+        else:
+            loader.seek(4)  # radius
+        if self.version_major2 < 9:
+            loader.seek(4)  # flags
+        loader.seek(2)  # index
+        material_idx = loader.read_uint16()
+        loader.seek(6)  # bone, vertex buffer and skin bone index count
+        vtx_skin_count = loader.read_byte()
+        lod_count = loader.read_byte()
+        loader.seek(2)  # key shape and target attribute counts
+        if (self.version_major2 <= 2 and self.version_major == 0) or self.version_major2 >= 9:
+            loader.seek(2)  # padding
+        else:
+            loader.seek(6)  # padding
+
+        vtx_count, attributes = 0, ()
+        if vtx_buffer_offs:
+            with loader.temporary_seek(vtx_buffer_offs, io.SEEK_SET):
+                vtx_count, attributes = self._vertex_buffer()
+        return ShapeSummary(name, material_idx, vtx_count, vtx_skin_count, lod_count, attributes)
+
+    def _vertex_buffer(self) -> tuple[int, tuple[str, ...]]:
+        loader = self.loader
+        loader.check_signature("FVTX")
+        self._block_header()
+        attributes = tuple(self._dict_keys(loader.read_offset(), loader.read_offset()))
+        loader.seek(2 * 8)  # memory pool and unknown
+        if self.version_major2 > 2 or self.version_major > 0:
+            loader.seek(8)  # unknown
+        loader.seek(3 * 8 + 8)  # buffer sizes, strides, padding, buffer offset and attribute, buffer and index counts
+        return loader.read_uint32(), attributes
+
+    def _material(self) -> MaterialSummary:
+        loader = self.loader
+        loader.check_signature("FMAT")
+        self._block_header()
+        name = loader.load_string()
+        if self.version_major2 >= 10:
+            loader.seek(2 * 8)  # shader info and textures
+            texture_name_offs = loader.read_offset()
+            # samplers, render info and shader param tables, reserved, user data, volatile flags, user pointer, slots
+            loader.seek(15 * 8 + 2 + 1)
+            texture_count = loader.read_byte()
+            loader.seek(12)  # reserved, user data count, render info and UBO sizes and padding
+        else:
+            loader.seek(4 * 8)  # render infos, shader assign and textures
+            texture_name_offs = loader.read_offset()
+            loader.seek(12 * 8)  # samplers, shader params, param source, user data, volatile flags, pointer and slots
+            if self.version_major2 < 9:
+                loader.seek(4)  # flags
+            loader.seek(4)  # index and render info count
+            texture_count = loader.read_byte()
+            loader.seek(11)  # sampler, shader param, volatile, param source, raw param and user data counts
+            if self.version_major2 < 9:
+                loader.seek(4)  # padding
+        return MaterialSummary(name, self._strings(texture_name_offs, texture_count))
+
+    def _external_file(self) -> tuple[int, int]:
+        return self.loader.read_offset(), self.loader.read_size()
+
+    def _block_header(self):
+        """Skip the flags or the block header at the start of a section."""
+        self.loader.seek(4 if self.version_major2 >= 9 else 12)
+
+    def _list(self, scan, count, offset) -> list:
+        if offset == 0 or count == 0:
+            return []
+        with self.loader.temporary_seek(offset, io.SEEK_SET):
+            return [scan() for _ in range(count)]
+
+    def _dict_keys(self, values_offs, dict_offs) -> list[str]:
+        """The keys of a dictionary, in the order of its values."""
+        if dict_offs == 0 or values_offs == 0:
+            return []
+        with self.loader.temporary_seek(dict_offs, io.SEEK_SET):
+            dict_ = ResDict()
+            dict_.load(None, self.loader)
+            return list(dict_.keys())
+
+    def _strings(self, offset, count) -> tuple[str, ...]:
+        if offset == 0 or count == 0:
+            return ()
+        loader = self.loader
+        with loader.temporary_seek(offset, io.SEEK_SET):
+            offsets = loader.read_uint64s(count)
+            names = []
+            for string_offs in offsets:
+                if string_offs in loader.string_cache:
+                    names.append(loader.string_cache[string_offs])
+                    continue
+                loader.seek(string_offs, io.SEEK_SET)
+                names.append(loader.read_string())
+            return tuple(names)
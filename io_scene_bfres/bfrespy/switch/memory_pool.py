@@ -32,14 +32,15 @@ class BufferTextureViewInfo(ResData):
     vertex and index buffers.
     """
 
-    # Public Properties
-    buff_offs: int
-    vtx_buffer_data: list[bytes] = []
-    index_buffer_data: list[bytes] = []
-    unk = 34
+    def __init__(self):
+        self.buff_offs = 0
+        """Offset of the buffer data in the file, buffer offsets are relative to it."""
+        self.vtx_buffer_data: list[bytes] = []
+        self.index_buffer_data: list[bytes] = []
+        self.unk = 34
 
     def load(self, loader: ResFileLoader):
-        BufferTextureViewInfo.unk = loader.read_uint32()
+        self.unk = loader.read_uint32()
         size = loader.read_uint32()
-        BufferTextureViewInfo.buff_offs = loader.read_int64()
+        self.buff_offs = loader.read_int64()
         loader.seek(16)  # padding
@@ -1,6 +1,6 @@
 import io
 
-from ...models.shape import KeyShape, Mesh, Shape, ShapeFlags
+from ...models.shape import Bounding, KeyShape, Mesh, Shape, ShapeFlags
 from ...models.vertex_buffer_attrib import VertexBuffer
 from ..switchcore import ResFileSwitchLoader
 
@@ -66,10 +66,6 @@ class ShapeParser:
         )
 
         bounding_box_cnt = sum([len(mesh.submeshes) + 1 for mesh in shape.meshes])
-        shape.submesh_boundings = (
-            []
-            if bounding_box_cnt == 0
-            else loader.load_custom(list, lambda: loader.read_boundings(bounding_box_cnt), bounding_box_array_offs)
-        )
+        shape.submesh_boundings = loader.load_records(Bounding, bounding_box_cnt, bounding_box_array_offs)
 
         shape.submesh_bounding_nodes = []
@@ -2,12 +2,15 @@ import io
 
 from ...common import Buffer
 from ...core import ResData
+from ...records import Record
 from ...models.vertex_buffer_attrib import VertexAttrib, VertexBuffer
-from ..memory_pool import BufferTextureViewInfo, MemoryPool
+from ..memory_pool import MemoryPool
 from ..switchcore import ResFileSwitchLoader
 
 
-class VertexBufferStride(ResData):
+class VertexBufferStride(ResData, Record):
+    _FIELDS = (("stride", "u4"), ("", "V12"))
+
     def __init__(self):
         self.stride: int
 
@@ -19,7 +22,9 @@ class VertexBufferStride(ResData):
         loader.seek(12)
 
 
-class VertexBufferSize(ResData):
+class VertexBufferSize(ResData, Record):
+    _FIELDS = (("size", "u4"), ("gpu_access_flags", "u4"), ("", "V8"))
+
     def __init__(self):
         self.size: int
         self.gpu_access_flags: int
@@ -65,17 +70,18 @@ class VertexBufferParser:
         # buffer data, including faces.
         # To obtain a list of all the buffer data, it would be by the
         # index buffer offset + buff_offs.
+        # The buffers are views into the file data, nothing is copied.
 
-        stride_array = loader.load_list(VertexBufferStride, num_buffer, vtx_stride_size_offs)
-        vtx_buff_size_array = loader.load_list(VertexBufferSize, num_buffer, vtx_buff_size_offs)
+        strides = loader.load_records(VertexBufferStride, num_buffer, vtx_stride_size_offs).data["stride"].tolist()
+        sizes = loader.load_records(VertexBufferSize, num_buffer, vtx_buff_size_offs).data["size"].tolist()
 
         vtx_buffer.buffers = []
-        with loader.temporary_seek(BufferTextureViewInfo.buff_offs + buff_offs, io.SEEK_SET):
+        with loader.temporary_seek(loader.res_file.buffer_info.buff_offs + buff_offs, io.SEEK_SET):
             for buff in range(num_buffer):
                 buffer = Buffer()
                 buffer.data = [b""]
-                buffer.stride = stride_array[buff].stride
+                buffer.stride = strides[buff]
 
                 loader.align(vtx_buffer.gpu_buff_align)
-                buffer.data[0] = loader.read_bytes(vtx_buff_size_array[buff].size)
+                buffer.data[0] = loader.read_view(sizes[buff])
                 vtx_buffer.buffers.append(buffer)
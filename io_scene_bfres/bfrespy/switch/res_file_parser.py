@@ -62,11 +62,13 @@ class ResFileParser:
                 external_file_offset = loader.read_offset()
                 external_file_dict = loader.load_dict(common.ResString)
 
+                # A fresh table, files that were loaded with the previous one keep it.
+                res_file.external_strings = {}
+                res_file.holds_external_strings = True
                 with loader.temporary_seek(external_file_offset, io.SEEK_SET):
-                    common.stringcache.clear()
                     for string in external_file_dict:
                         string_id = loader.read_int64()
-                        common.stringcache[string_id] = string
+                        res_file.external_strings[string_id] = string
                 return
 
             # GPU section for TOTK
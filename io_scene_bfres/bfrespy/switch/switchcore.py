@@ -1,6 +1,6 @@
 import io
 
-from .. import common, core
+from .. import core
 from ..res_file import ResFile
 
 
@@ -10,8 +10,9 @@ class ResFileSwitchLoader(core.ResFileLoader):
         res_file: ResFile,
         stream: io.BytesIO | io.BufferedReader,
         res_data: core.ResData | None = None,
+        string_cache: dict[int, str] | None = None,
     ):
-        super().__init__(res_file, stream, res_data)
+        super().__init__(res_file, stream, res_data, string_cache)
         self.endianness = "<"
         self.is_switch = True
 
@@ -29,12 +30,11 @@ class ResFileSwitchLoader(core.ResFileLoader):
         offset = self.read_uint32()
         size = self.read_uint64()
 
-    def load_string(self, encoding=None) -> str:
-        offset = self.read_offset()
+    def load_string_at(self, offset, encoding=None) -> str:
         if offset == 0:
             return ""
-        if offset in common.stringcache:
-            return common.stringcache[offset]
+        if offset in self.string_cache:
+            return self.string_cache[offset]
         if offset < 0:
             return ""
         with self.temporary_seek(offset, io.SEEK_SET) as reader:
@@ -43,6 +43,25 @@ class ResFileSwitchLoader(core.ResFileLoader):
             except IndexError:
                 return ""
 
+    def load_strings_at(self, offsets, encoding=None) -> list[str]:
+        """Return the strings at many offsets, read straight from the buffer without seeking."""
+        buffer = self.buffer
+        encoding = encoding if encoding is not None else "utf-8"
+        names = []
+        for offset in offsets:
+            if offset in self.string_cache:
+                names.append(self.string_cache[offset])
+            elif offset <= 0 or offset + 2 > len(buffer):
+                names.append("")
+            else:
+                size = int.from_bytes(buffer[offset : offset + 2], "little" if self.endianness == "<" else "big")
+                data = bytes(buffer[offset + 2 : offset + 3 + size])
+                if data.find(0) != size:
+                    names.append(self.load_string_at(offset, encoding))
+                else:
+                    names.append(data[:size].decode(encoding))
+        return names
+
     def load_strings(self, count, encoding=None) -> tuple[str, ...]:
         offsets = self.read_uint64s(count)
         names = []
@@ -50,8 +69,8 @@ class ResFileSwitchLoader(core.ResFileLoader):
             for i, offset in enumerate(offsets):
                 if offset == 0:
                     names.append(None)
-                if offset in common.stringcache:
-                    names[i] = common.stringcache[offset]
+                if offset in self.string_cache:
+                    names[i] = self.string_cache[offset]
                 else:
                     self.seek(offset, io.SEEK_SET)
                     names.append(self.read_string(encoding))
@@ -59,4 +78,10 @@ class ResFileSwitchLoader(core.ResFileLoader):
 
     def read_string(self, encoding=None):
         size = self.read_uint16()
+        start = self.tell()
+        data = self.read_bytes(size + 1)
+        if data.find(0) == size:
+            return data[:size].decode(encoding if encoding is not None else "utf-8")
+        # The length doesn't match, read up to the terminator instead.
+        self.seek(start, io.SEEK_SET)
         return self.read_null_string(encoding)
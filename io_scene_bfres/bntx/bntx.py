@@ -2,6 +2,7 @@ import io
 import logging
 
 from ..bfrespy import core
+from .brti import BRTI
 from .nx import NX
 
 log = logging.getLogger(__name__)
@@ -35,3 +36,7 @@ class BNTX(core.ResData):
         siz_file = loader.read_uint32()
 
         self.nx = loader.load(NX, use_offset=False)
+
+    def get(self, name: str) -> BRTI | None:
+        """Return the texture named `name`, or None if this file doesn't contain it."""
+        return self.nx.textures.get(name)
@@ -1,3 +1,4 @@
+import copy
 import io
 import logging
 import math
@@ -23,7 +24,10 @@ class BRTI(core.ResData):
     def __init__(self):
         self.name: str
         self.mip_offsets = []
-        self.mip_data: bytes
+        self.data: bytes
+        self.gob_height_log2 = 0
+        self._mip_data: bytes | None = None
+        self._pixels = None
 
     def load(self, loader: core.ResFileLoader):
         loader.check_signature(self.__signature)
@@ -71,7 +75,59 @@ class BRTI(core.ResData):
                 self.mip_offsets.append(entry)
 
         self.__read_data(loader, ptrs_offset, data_len)
-        self.pixels = self.format_.decompress(self)
+
+    @property
+    def mip_data(self) -> bytes:
+        """The deswizzled data of the first mip level, deswizzled on first access."""
+        if self._mip_data is None:
+            size = math.ceil(self.width / self.blk_width) * math.ceil(self.height / self.blk_height) * self.bpp
+            result = deswizzle(
+                self.width,
+                self.height,
+                self.blk_width,
+                self.blk_height,
+                self.bpp,
+                self.tile_mode,
+                self.gob_height_log2,
+                self.data,
+            )
+            self._mip_data = result[:size]
+        return self._mip_data
+
+    @mip_data.setter
+    def mip_data(self, value: bytes):
+        self._mip_data = value
+        self._pixels = None
+
+    @property
+    def mip_count(self) -> int:
+        return len(self.mip_offsets)
+
+    def mip_level(self, level: int) -> "BRTI":
+        """Return a shallow copy of this texture that describes mip level `level` as its first level.
+
+        The copy shares the raw data of this texture, nothing is deswizzled or decoded until it is accessed.
+        """
+        if not 0 <= level < max(self.mip_count, 1):
+            raise IndexError(f"Texture '{self.name}' has no mip level {level}")
+        if level == 0:
+            return self
+
+        mip = copy.copy(self)
+        mip.width = max(1, self.width >> level)
+        mip.height = max(1, self.height >> level)
+        mip.gob_height_log2 = max(0, self.blk_height_log2 - self.__blk_height_shift(level))
+        mip.data = memoryview(self.data)[self.mip_offsets[level] - self.mip_offsets[0] :]
+        mip._mip_data = None
+        mip._pixels = None
+        return mip
+
+    @property
+    def pixels(self):
+        """The decompressed pixels of the first mip level, decompressed on first access."""
+        if self._pixels is None:
+            self._pixels = self.format_.decompress(self)
+        return self._pixels
 
     class ChannelType(IntEnum):
         ZERO = 0
@@ -102,25 +158,14 @@ class BRTI(core.ResData):
         loader.seek(ptrs_offset, io.SEEK_SET)
         loader.seek(loader.read_uint64(), io.SEEK_SET)
         self.data = loader.read_bytes(data_len)
+        self.gob_height_log2 = max(0, self.blk_height_log2 - self.__blk_height_shift(0))
 
+    def __blk_height_shift(self, level):
+        """How far the GOB height of mip level `level` is reduced, the shift grows with every small level."""
         lines_per_blk_height = (1 << self.blk_height_log2) * 8
         blk_height_shift = 0
-        mip_offset = self.mip_offsets[0]
-
-        size = math.ceil(self.width / self.blk_width) * math.ceil(self.height / self.blk_height) * self.bpp
-
-        if pow2_round_up(math.ceil(self.height / self.blk_height)) < lines_per_blk_height:
-            blk_height_shift += 1
-
-        result = deswizzle(
-            self.width,
-            self.height,
-            self.blk_width,
-            self.blk_height,
-            self.bpp,
-            self.tile_mode,
-            max(0, self.blk_height_log2 - blk_height_shift),
-            self.data,
-        )
-
-        self.mip_data = result[:size]
+        for i in range(level + 1):
+            height = max(1, self.height >> i)
+            if pow2_round_up(math.ceil(height / self.blk_height)) < lines_per_blk_height:
+                blk_height_shift += 1
+        return blk_height_shift
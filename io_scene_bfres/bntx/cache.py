@@ -0,0 +1,122 @@
+"""Size bounded cache of decoded textures, shared by every import in the process.
+
+Entries are keyed by the raw texture data rather than by name, so the same texture in different files is only decoded
+once, and different textures that happen to share a name never collide.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .pixelfmt.parallel import decode_parallel
+from .pixelfmt.stream import DEFAULT_STRIP_HEIGHT
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable
+
+    from .brti import BRTI
+    from .pixelfmt.parallel import DecodePool
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+class DecodedTextureCache:
+    """Least recently used cache of float RGBA pixel arrays, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> np.ndarray | None:
+        with self._lock:
+            pixels = self._entries.get(key)
+            if pixels is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pixels
+
+    def put(self, key: Hashable, pixels: np.ndarray):
+        """Add an array to the cache, evicting the least recently used ones to stay within `max_bytes`.
+
+        The array is made read only, since every later lookup shares it.
+        """
+        pixels.flags.writeable = False
+        if pixels.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = pixels
+            self.nbytes += pixels.nbytes
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, pixels = self._entries.popitem(last=False)
+            self.nbytes -= pixels.nbytes
+
+
+decoded_textures = DecodedTextureCache()
+"""The cache shared by the whole session."""
+
+
+def texture_key(tex: BRTI) -> tuple:
+    """A key that identifies the decoded first mip level of a texture by its contents."""
+    digest = hashlib.blake2b(tex.data, digest_size=16).digest()
+    return (tex.fmt_id, int(tex.fmt_dtype), tex.width, tex.height, tex.tile_mode, tex.gob_height_log2, digest)
+
+
+def decode_key(tex: BRTI, channel_types=None, flip=False) -> tuple:
+    """The cache key of a texture decoded with the given options."""
+    return (texture_key(tex), None if channel_types is None else bytes(channel_types), flip)
+
+
+def decode_cached(
+    tex: BRTI,
+    pool: DecodePool | None = None,
+    strip_height=DEFAULT_STRIP_HEIGHT,
+    channel_types=None,
+    flip=False,
+    cache: DecodedTextureCache = decoded_textures,
+) -> np.ndarray:
+    """Return the decoded float `(height, width, 4)` pixels of a texture, decoding them only if they aren't cached.
+
+    The arguments are the same as for `decode_parallel`. The returned array is read only.
+    """
+    key = decode_key(tex, channel_types, flip)
+    pixels = cache.get(key)
+    if pixels is not None:
+        log.debug("Texture '%s' found in the decoded texture cache", tex.name)
+        return pixels
+
+    pixels = decode_parallel(tex, pool, strip_height, channel_types, flip)
+    cache.put(key, pixels)
+    return pixels
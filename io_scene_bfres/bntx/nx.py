@@ -1,5 +1,6 @@
 import io
 import logging
+from collections.abc import Iterator, Sequence
 
 from ..bfrespy import core
 from .brti import BRTI
@@ -7,11 +8,49 @@ from .brti import BRTI
 log = logging.getLogger(__name__)
 
 
+class TextureList(Sequence[BRTI]):
+    """The textures of a BNTX, indexable by position or by name.
+
+    Only the headers and raw data are read when the file is loaded, a texture is decoded on first access of its
+    pixels.
+    """
+
+    def __init__(self):
+        self._textures: list[BRTI] = []
+        self._by_name: dict[str, BRTI] = {}
+
+    def append(self, tex: BRTI):
+        self._textures.append(tex)
+        self._by_name.setdefault(tex.name, tex)
+
+    def get(self, name: str, default=None) -> BRTI | None:
+        return self._by_name.get(name, default)
+
+    def names(self):
+        return self._by_name.keys()
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return item in self._by_name
+        return item in self._textures
+
+    def __getitem__(self, index):
+        if isinstance(index, str):
+            return self._by_name[index]
+        return self._textures[index]
+
+    def __iter__(self) -> Iterator[BRTI]:
+        return iter(self._textures)
+
+    def __len__(self):
+        return len(self._textures)
+
+
 class NX(core.ResData):
     """An NX texture in a BNTX."""
 
     def __init__(self):
-        self.textures: list[BRTI] = []
+        self.textures = TextureList()
 
     def load(self, loader: core.ResFileLoader):
         target_platform = loader.read_raw_string(4, "ascii")
@@ -0,0 +1,217 @@
+"""Decode a single large texture on a process pool.
+
+The block grid is split into tiles of whole GOB rows. The raw swizzled data and the float RGBA output both live in
+shared memory, so workers only receive a few integers per tile and write their pixels straight to their final place,
+which the caller then uses as it is.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .base import TextureFormat
+from .stream import DEFAULT_STRIP_HEIGHT, decode_strips, select_components
+from .swizzle import gob_row_height
+
+if TYPE_CHECKING:
+    from ..brti import BRTI
+
+log = logging.getLogger(__name__)
+
+PARALLEL_MIN_PIXELS = 1024 * 1024
+"""Textures with fewer pixels than this are decoded in the calling process, the pool overhead isn't worth it."""
+
+TILES_PER_WORKER = 4
+"""Tiles scheduled per worker, so that workers finishing early can pick up more work."""
+
+
+def plan_tiles(tex: BRTI, workers: int) -> list[tuple[int, int]]:
+    """Split the block rows of a texture into `[row_start, row_end)` tiles for `workers` processes.
+
+    Returns a single tile covering the whole texture when it is too small to be worth decoding in parallel.
+    """
+    total_rows = math.ceil(tex.height / tex.blk_height)
+    if workers <= 1 or tex.width * tex.height < PARALLEL_MIN_PIXELS:
+        return [(0, total_rows)]
+
+    gob_rows = gob_row_height(tex.gob_height_log2)
+    num_gob_rows = math.ceil(total_rows / gob_rows)
+    num_tiles = min(num_gob_rows, workers * TILES_PER_WORKER)
+    if num_tiles <= 1:
+        return [(0, total_rows)]
+
+    tile_rows = math.ceil(num_gob_rows / num_tiles) * gob_rows
+    return [(row, min(row + tile_rows, total_rows)) for row in range(0, total_rows, tile_rows)]
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+class DecodePool:
+    """The worker processes large textures are decoded on, shared by every texture of an import.
+
+    The processes are started when the first texture needs them and stopped by `shutdown`. They are spawned rather
+    than forked, so they don't start as copies of Blender and of whichever thread asked for them.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = workers or default_workers()
+        """The number of processes, 0 for one per core."""
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> DecodePool:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def decode_parallel(
+    tex: BRTI,
+    pool: DecodePool | None = None,
+    strip_height=DEFAULT_STRIP_HEIGHT,
+    channel_types=None,
+    flip=False,
+) -> np.ndarray:
+    """Decode the first mip level of a texture into a new float `(height, width, 4)` array.
+
+    Large textures are decoded on `pool` if it is given, into shared memory the returned array is a view of. If
+    `channel_types` is given, the component selectors are applied to every tile. If `flip` is set the rows are
+    written bottom up, which is the order Blender expects.
+    """
+    tiles = plan_tiles(tex, pool.workers) if pool is not None else [(0, math.ceil(tex.height / tex.blk_height))]
+    if len(tiles) > 1:
+        try:
+            return _decode_pool(tex, pool, tiles, strip_height, channel_types, flip)
+        except (BrokenProcessPool, OSError):
+            log.warning("Could not decode '%s' on a process pool, decoding textures in this process", tex.name)
+            pool.shutdown()
+            pool.workers = 1
+
+    out = np.empty((tex.height, tex.width, 4), dtype=np.float32)
+    _decode_tile(tex, out, 0, tiles[-1][1], strip_height, channel_types, flip)
+    return out
+
+
+def _decode_pool(tex: BRTI, pool: DecodePool, tiles, strip_height, channel_types, flip) -> np.ndarray:
+    log.debug("Decoding '%s' as %d tiles on %d processes", tex.name, len(tiles), pool.workers)
+    shape = (tex.height, tex.width, 4)
+    dtype = np.dtype(np.float32)
+    shm_in = shared_memory.SharedMemory(create=True, size=max(len(tex.data), 1))
+    try:
+        shm_out = shared_memory.SharedMemory(create=True, size=math.prod(shape) * dtype.itemsize)
+    except BaseException:
+        shm_in.close()
+        shm_in.unlink()
+        raise
+    futures = []
+    try:
+        shm_in.buf[: len(tex.data)] = tex.data
+        params = _tex_params(tex)
+        executor = pool.executor()
+        futures = [
+            executor.submit(
+                _decode_shared_tile,
+                params,
+                shm_in.name,
+                len(tex.data),
+                shm_out.name,
+                shape,
+                dtype.str,
+                row_start,
+                row_end,
+                strip_height,
+                channel_types,
+                flip,
+            )
+            for row_start, row_end in tiles
+        ]
+        for future in futures:
+            future.result()
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        shm_out.close()
+        raise
+    finally:
+        shm_in.close()
+        shm_in.unlink()
+        # The mapping stays valid until it is closed, the name is only needed by the workers.
+        shm_out.unlink()
+    out = np.ndarray(shape, dtype=dtype, buffer=shm_out.buf)
+    # Unmapped once the array and every view of it are gone.
+    weakref.finalize(out, shm_out.close)
+    return out
+
+
+def _decode_tile(tex: BRTI, out, row_start, row_end, strip_height, channel_types, flip):
+    for y, pixels in decode_strips(tex, strip_height, row_start, row_end):
+        if channel_types is not None:
+            pixels = select_components(pixels, channel_types)
+        if flip:
+            end = tex.height - y
+            out[end - len(pixels) : end] = pixels[::-1]
+        else:
+            out[y : y + len(pixels)] = pixels
+
+
+def _tex_params(tex: BRTI) -> dict:
+    """The picklable subset of a BRTI needed to decode it."""
+    return {
+        "name": tex.name,
+        "fmt_id": tex.fmt_id,
+        "fmt_dtype": int(tex.fmt_dtype),
+        "width": tex.width,
+        "height": tex.height,
+        "blk_width": tex.blk_width,
+        "blk_height": tex.blk_height,
+        "bpp": tex.bpp,
+        "tile_mode": tex.tile_mode,
+        "gob_height_log2": tex.gob_height_log2,
+    }
+
+
+def _decode_shared_tile(
+    params, in_name, in_size, out_name, shape, dtype, row_start, row_end, strip_height, channel_types, flip
+):
+    """Worker entry point, decodes one tile from shared memory into shared memory."""
+    from ..brti import BRTI
+
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    data = shm_in.buf[:in_size]
+    try:
+        tex = BRTI()
+        for key, value in params.items():
+            setattr(tex, key, value)
+        tex.fmt_dtype = BRTI.TextureDataType(params["fmt_dtype"])
+        tex.format_ = TextureFormat.get(tex.fmt_id)
+        tex.data = data
+
+        out = np.ndarray(shape, dtype=dtype, buffer=shm_out.buf)
+        _decode_tile(tex, out, row_start, row_end, strip_height, channel_types, flip)
+        del tex, out
+    finally:
+        data.release()
+        shm_in.close()
+        shm_out.close()
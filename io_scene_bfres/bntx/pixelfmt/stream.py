@@ -0,0 +1,104 @@
+"""Strip-wise decoding of large textures.
+
+Instead of deswizzling a whole surface and expanding it to float RGBA in one go, the surface is processed in horizontal
+strips of whole GOB rows. Each GOB row is contiguous in swizzled memory, so a strip only ever touches its own part of
+the raw data and the scratch memory is bounded by the strip size.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+import math
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .swizzle import deswizzle_rows, gob_row_height
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from ..brti import BRTI
+
+log = logging.getLogger(__name__)
+
+DEFAULT_STRIP_HEIGHT = 1024
+"""Default strip height in pixel rows."""
+
+
+def strip_block_rows(tex: BRTI, strip_height: int) -> int:
+    """Return the number of block rows per strip for a strip of about `strip_height` pixel rows.
+
+    The result is rounded up to whole GOB rows. A `strip_height` of 0 or less selects the whole surface.
+    """
+    total_rows = math.ceil(tex.height / tex.blk_height)
+    if strip_height <= 0:
+        return max(total_rows, 1)
+
+    gob_rows = gob_row_height(tex.gob_height_log2)
+    rows = math.ceil(strip_height / tex.blk_height)
+    return max(gob_rows, math.ceil(rows / gob_rows) * gob_rows)
+
+
+def decode_strip(tex: BRTI, row: int, block_rows: int) -> tuple[int, np.ndarray]:
+    """Deswizzle and decode `block_rows` block rows of the first mip level, starting at block row `row`.
+
+    Returns `(y, pixels)`, where `y` is the first pixel row of the strip (counted from the top, in the texture's own
+    orientation) and `pixels` is a float `(rows, width, 4)` RGBA array.
+    """
+    y = row * tex.blk_height
+    height = min(block_rows * tex.blk_height, tex.height - y)
+
+    strip = copy.copy(tex)
+    strip.height = height
+    strip.mip_data = deswizzle_rows(
+        tex.width,
+        tex.height,
+        tex.blk_width,
+        tex.blk_height,
+        tex.bpp,
+        tex.tile_mode,
+        tex.gob_height_log2,
+        tex.data,
+        row,
+        row + block_rows,
+    )
+
+    pixels = tex.format_.decodepixels(strip.pixels)
+    pixels = np.reshape(pixels, -1)[: height * tex.width * 4]
+    return y, pixels.reshape((height, tex.width, 4))
+
+
+def decode_strips(
+    tex: BRTI, strip_height=DEFAULT_STRIP_HEIGHT, row_start=0, row_end=None
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Deswizzle and decode the first mip level of a texture strip by strip.
+
+    Only the block rows in [row_start, row_end) are decoded, by default the whole surface. Yields the same
+    `(y, pixels)` pairs as `decode_strip`.
+    """
+    block_rows = strip_block_rows(tex, strip_height)
+    total_rows = math.ceil(tex.height / tex.blk_height)
+    row_end = total_rows if row_end is None else min(row_end, total_rows)
+
+    for row in range(row_start, row_end, block_rows):
+        yield decode_strip(tex, row, min(block_rows, row_end - row))
+
+
+def select_components(pixels: np.ndarray, channel_types) -> np.ndarray:
+    """Reorder the channels of an RGBA array according to the texture's component selectors."""
+    if all(channel_types[ch] == ch + 2 for ch in range(4)):
+        return pixels
+    selected = np.empty_like(pixels)
+    for ch in range(4):
+        match channel_types[ch]:
+            case 0:
+                selected[..., ch] = 0
+            case 1:
+                selected[..., ch] = 1
+            case 2 | 3 | 4 | 5 as source:
+                selected[..., ch] = pixels[..., source - 2]
+            case _:
+                selected[..., ch] = pixels[..., ch]
+    return selected
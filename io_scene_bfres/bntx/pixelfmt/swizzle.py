@@ -4,6 +4,8 @@
 import logging
 import math
 
+import numpy as np
+
 log = logging.getLogger(__name__)
 
 
@@ -11,53 +13,72 @@ def round_up(x, y):
     return ((x - 1) | (y - 1)) + 1
 
 
+def gob_row_height(blk_height_log2) -> int:
+    """Number of block rows in one row of GOBs, the smallest unit that is contiguous in swizzled memory."""
+    return 8 * (1 << blk_height_log2)
+
+
 def deswizzle(width, height, blk_width, blk_height, bpp, tile_mode, blk_height_log2, data) -> bytes:
     """Deswizzled image data"""
+    rows = math.ceil(height / blk_height)
+    return deswizzle_rows(width, height, blk_width, blk_height, bpp, tile_mode, blk_height_log2, data, 0, rows)
+
+
+def deswizzle_rows(
+    width, height, blk_width, blk_height, bpp, tile_mode, blk_height_log2, data, row_start, row_end
+) -> bytes:
+    """Deswizzle the block rows in [row_start, row_end) of a surface.
+
+    Only the part of `data` covering those rows is read, so a surface can be processed in strips without ever holding
+    the whole deswizzled image in memory.
+    """
     # Modified from https://github.com/aboood40091/BNTX-Editor/ which is under a GPL-3.0 License
     block_height = 1 << blk_height_log2
 
     width = math.ceil(width / blk_width)
     height = math.ceil(height / blk_height)
+    row_end = min(row_end, height)
+    if row_start >= row_end:
+        return b""
 
     if tile_mode == 1:
-        pitch = width * bpp
-
         # If wii u support is added this depends on if the header of the texture is "NX" or not
-        pitch = round_up(pitch, 32)
-
+        pitch = round_up(width * bpp, 32)
         surf_size = pitch * height
 
+        rows = np.arange(row_start, row_end, dtype=np.int64) * pitch
+        cols = np.arange(width * bpp, dtype=np.int64)
     else:
         pitch = round_up(width * bpp, 64)
         surf_size = pitch * round_up(height, block_height * 8)
 
-    result = bytearray(surf_size)
-
-    for y in range(height):
-        for x in range(width):
-            if tile_mode == 1:
-                pos = y * pitch + x * bpp
-
-            else:
-                pos = __get_addr_block_linear(x, y, width, bpp, 0, block_height)
+        rows = __block_linear_row_addrs(row_start, row_end, width, bpp, block_height)
+        cols = __block_linear_col_addrs(width * bpp, block_height)
 
-            pos_ = (y * width + x) * bpp
+    addrs = rows[:, np.newaxis] + cols[np.newaxis, :]
 
-            if pos + bpp <= surf_size:
-                result[pos_ : pos_ + bpp] = data[pos : pos + bpp]
+    src = np.frombuffer(data, dtype=np.uint8)
+    limit = min(surf_size, len(src))
+    valid = addrs < limit
+    result = np.zeros(addrs.shape, dtype=np.uint8)
+    result[valid] = src[addrs[valid]]
 
-    return bytes(result)
+    return result.tobytes()
 
 
-def __get_addr_block_linear(x, y, image_width, bytes_per_pixel, base_address, block_height):
+def __block_linear_row_addrs(row_start, row_end, image_width, bytes_per_pixel, block_height):
+    """The part of the block linear address that only depends on the row."""
     image_width_in_gobs = math.ceil((image_width * bytes_per_pixel) / 64)
-    gob_address = (
-        base_address
-        + (y // (8 * block_height)) * 512 * block_height * image_width_in_gobs
-        + (x * bytes_per_pixel // 64) * 512 * block_height
+    y = np.arange(row_start, row_end, dtype=np.int64)
+    return (
+        (y // (8 * block_height)) * 512 * block_height * image_width_in_gobs
         + (y % (8 * block_height) // 8) * 512
+        + ((y % 8) // 2) * 64
+        + (y % 2) * 16
     )
 
-    x *= bytes_per_pixel
 
-    return gob_address + ((x % 64) // 32) * 256 + ((y % 8) // 2) * 64 + ((x % 32) // 16) * 32 + (y % 2) * 16 + (x % 16)
+def __block_linear_col_addrs(row_bytes, block_height):
+    """The part of the block linear address that only depends on the byte column."""
+    x = np.arange(row_bytes, dtype=np.int64)
+    return (x // 64) * 512 * block_height + ((x % 64) // 32) * 256 + ((x % 32) // 16) * 32 + (x % 16)
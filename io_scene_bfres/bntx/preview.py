@@ -0,0 +1,141 @@
+"""Small previews of textures, decoded from the smallest mip level that is big enough.
+
+Can also be run without Blender to write PNG thumbnails for a whole directory tree:
+
+    python -m io_scene_bfres.bntx.preview DUMP_DIR OUT_DIR --size 128
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import logging
+import math
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .pixelfmt.stream import DEFAULT_STRIP_HEIGHT, decode_strips, select_components
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from .brti import BRTI
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PREVIEW_SIZE = 128
+
+
+def select_mip(tex: BRTI, size: int) -> int:
+    """Return the smallest mip level whose larger side is still at least `size` pixels."""
+    for level in reversed(range(tex.mip_count)):
+        if max(tex.width >> level, tex.height >> level) >= size:
+            return level
+    return 0
+
+
+def preview(
+    tex: BRTI, size=DEFAULT_PREVIEW_SIZE, channel_types=None, strip_height=DEFAULT_STRIP_HEIGHT, decoded=None
+) -> np.ndarray:
+    """Return a float `(height, width, 4)` RGBA preview that fits in `size` x `size`, top row first.
+
+    Only the selected mip level is deswizzled and decoded, strip by strip, the larger levels are never touched. If
+    the first level is selected and `decoded` is given, it is used instead. It must be that level decoded with
+    `channel_types`, top row first.
+    """
+    level = select_mip(tex, size)
+    if level == 0 and decoded is not None:
+        pixels = decoded
+    else:
+        mip = tex.mip_level(level)
+        pixels = np.empty((mip.height, mip.width, 4), dtype=np.float32)
+        for y, strip in decode_strips(mip, strip_height):
+            pixels[y : y + len(strip)] = strip
+        if channel_types is not None:
+            pixels = select_components(pixels, channel_types)
+
+    step = math.ceil(max(pixels.shape[1], pixels.shape[0]) / size)
+    return pixels[::step, ::step]
+
+
+def write_png(path, pixels: np.ndarray):
+    """Write a float RGBA array, top row first, as an 8 bit PNG."""
+    height, width = pixels.shape[:2]
+    rgba = (np.clip(pixels, 0, 1) * 255 + 0.5).astype(np.uint8)
+    # Every scanline starts with filter type 0
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes())))
+        f.write(chunk(b"IEND", b""))
+
+
+def iter_textures(path) -> Iterator[BRTI]:
+    """Yield every texture in a BNTX, or in the BNTX files embedded in a BFRES or SARC archive."""
+    with open(path, "rb") as f:
+        yield from _iter_stream(io.BytesIO(f.read()))
+
+
+def _iter_stream(raw: io.BytesIO) -> Iterator[BRTI]:
+    from .. import container
+    from ..bfrespy.res_file import ResFile
+    from .bntx import BNTX
+
+    raw = container.decompress(raw)
+    magic = raw.read(4)
+    raw.seek(0, io.SEEK_SET)
+    match magic:
+        case b"BNTX":
+            yield from BNTX(raw).nx.textures
+        case b"FRES":
+            for node in ResFile(raw).external_files:
+                if node.value.data[:4] == b"BNTX":
+                    yield from _iter_stream(io.BytesIO(node.value.data))
+        case b"SARC":
+            for data in container.sarc_files(raw):
+                yield from _iter_stream(io.BytesIO(data))
+
+
+def write_previews(path: Path, root: Path, out: Path, size=DEFAULT_PREVIEW_SIZE) -> int:
+    """Write a PNG preview for every texture in `path` to `out`, mirroring the tree under `root`."""
+    dest = out / path.relative_to(root)
+    count = 0
+    try:
+        for tex in iter_textures(path):
+            dest.mkdir(parents=True, exist_ok=True)
+            write_png(dest / f"{tex.name}.png", preview(tex, size, tex.channel_types))
+            count += 1
+    except Exception:
+        log.exception("Could not write previews for '%s'", path)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write PNG thumbnails for every texture in a directory tree.")
+    parser.add_argument("root", type=Path, help="directory to search for BNTX, BFRES and SARC files")
+    parser.add_argument("out", type=Path, help="directory to write the thumbnails to")
+    parser.add_argument("--size", type=int, default=DEFAULT_PREVIEW_SIZE, help="largest side of a thumbnail")
+    parser.add_argument("--jobs", type=int, default=0, help="number of processes, 0 for one per core")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    files = sorted(p for p in args.root.rglob("*") if p.is_file())
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as pool:
+        futures = [pool.submit(write_previews, path, args.root, args.out, args.size) for path in files]
+        total = sum(future.result() for future in futures)
+    log.info("Wrote %d previews from %d files", total, len(files))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Fast scanning of the texture names and formats in a BNTX, without reading or deswizzling the texture data."""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+
+from ..bfrespy.switch.switchcore import ResFileSwitchLoader
+from .brti import BRTI
+from .pixelfmt.formatinfo import formats
+
+
+@dataclass
+class TextureSummary:
+    name: str
+    width: int
+    height: int
+    depth: int
+    mip_count: int
+    fmt_id: int
+    fmt_dtype: BRTI.TextureDataType
+    data_size: int
+
+    @property
+    def format_name(self) -> str:
+        """The name of the format, like `BC1_SRGB`."""
+        return formats.get(self.fmt_id << 8 | self.fmt_dtype, f"{self.fmt_id:#x}_{self.fmt_dtype.name}")
+
+
+@dataclass
+class BntxSummary:
+    """The textures of a BNTX, see `scan`."""
+
+    textures: list[TextureSummary] = field(default_factory=list)
+
+    def names(self) -> list[str]:
+        return [tex.name for tex in self.textures]
+
+
+def scan(stream: io.BytesIO | io.BufferedReader) -> BntxSummary:
+    """Read the headers of the textures in a BNTX, the same ones `BNTX` reads, but none of their data."""
+    loader = ResFileSwitchLoader(None, stream)
+    # BNTX header
+    loader.check_signature("BNTX")
+    loader.seek(8)  # padding and version
+    loader.read_byte_order()
+    loader.seek(18)  # alignment, address size, file name, flags, block offset, relocation table and file size
+
+    # NX header
+    loader.seek(4)  # target platform
+    tex_count = loader.read_int32()
+    tex_table_array = loader.read_offset()
+
+    summary = BntxSummary()
+    loader.seek(tex_table_array, io.SEEK_SET)
+    for tex_offs in loader.read_uint64s(tex_count):
+        with loader.temporary_seek(tex_offs, io.SEEK_SET):
+            summary.textures.append(_scan_brti(loader))
+    return summary
+
+
+def _scan_brti(loader: ResFileSwitchLoader) -> TextureSummary:
+    loader.check_signature("BRTI")
+    loader.seek(18)  # lengths, flags, dimensions, tile mode and swizzle size
+    mip_count = loader.read_uint16()
+    loader.seek(4)  # multisample count and reserved
+    fmt_dtype = BRTI.TextureDataType(loader.read_byte())
+    fmt_id = loader.read_byte()
+    loader.seek(6)  # padding and access flags
+    width = loader.read_int32()
+    height = loader.read_int32()
+    depth = loader.read_int32()
+    loader.seek(32)  # array count, texture layouts and reserved
+    data_size = loader.read_uint32()
+    loader.seek(12)  # alignment, channel types and texture type
+    name = loader.load_string()
+    return TextureSummary(name, width, height, depth, mip_count, fmt_id, fmt_dtype, data_size)
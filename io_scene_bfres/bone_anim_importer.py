@@ -14,15 +14,13 @@ class BoneAnimationImporter:
         # import all bones
         self.scene_bones: dict[str, tuple[mu.Vector, mu.Quaternion | mu.Euler, mu.Vector]] = {}
         for fmdl in bfres.models.values():
-            for bone in fmdl.skeleton.bones.values():
-                L = mu.Vector(bone.position[0:3])
-                if bone.bone_flags_rotation.name == "EULER_XYZ":
-                    R = mu.Euler(bone.rotation[0:3])
-                else:
-                    R = mu.Quaternion(bone.rotation)
-                S = mu.Vector(bone.scale[0:3])
-
-                self.scene_bones[bone.name] = (L, R, S)
+            fskl = fmdl.skeleton
+            names = [bone.name for bone in fskl.bones.values()]
+            for name, position, rotation, scale, euler in zip(
+                names, fskl.positions.tolist(), fskl.rotations.tolist(), fskl.scales.tolist(), fskl.euler.tolist()
+            ):
+                R = mu.Euler(rotation[0:3]) if euler else mu.Quaternion(rotation)
+                self.scene_bones[name] = (mu.Vector(position), R, mu.Vector(scale))
 
         for fska in bfres.skeletal_anims.values():
             action = bpy.data.actions.new(name=fska.name)
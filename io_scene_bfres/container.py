@@ -0,0 +1,78 @@
+"""Unwrapping of compressed and archived files.
+
+Nothing in here depends on Blender, so it can be used by worker processes and the command line tools.
+"""
+
+import io
+import logging
+import struct
+from collections.abc import Iterator
+
+import zstandard
+
+from . import yaz0
+from .exceptions import MalformedFileError
+
+log = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def decompress(raw: io.BytesIO | io.BufferedReader) -> io.BytesIO | io.BufferedReader:
+    """Return a stream with the decompressed data, or the stream itself if it isn't compressed."""
+    while True:
+        magic = raw.read(4)
+        raw.seek(0, io.SEEK_SET)
+        match magic:
+            case b"Yaz0":
+                raw = yaz0.decompress(raw)
+            case b"\x28\xb5\x2f\xfd":  # zstd
+                dctx = zstandard.ZstdDecompressor()
+                raw = io.BytesIO(dctx.decompress(raw.read()))
+            case _:
+                return raw
+
+
+def decompressed_head(raw: io.BytesIO | io.BufferedReader, size: int) -> bytes:
+    """Return the first `size` bytes of the decompressed data, without decompressing the rest."""
+    while True:
+        magic = raw.read(4)
+        raw.seek(0, io.SEEK_SET)
+        match magic:
+            case b"Yaz0":
+                raw = yaz0.decompress(raw, size)
+            case b"\x28\xb5\x2f\xfd":  # zstd
+                with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                    raw = io.BytesIO(reader.read(size))
+            case _:
+                return raw.read(size)
+
+
+def sarc_files(raw: io.BytesIO | io.BufferedReader) -> Iterator[bytes]:
+    """Yield the data of every file in a SARC archive."""
+    raw.seek(6, io.SEEK_CUR)
+    bom = raw.read(2)
+    endianness = ">" if bom == b"\xfe\xff" else "<"
+    raw.seek(4, io.SEEK_CUR)
+    offs = struct.unpack(endianness + "I", raw.read(4))[0]
+    raw.seek(10, io.SEEK_CUR)
+    num_nodes = struct.unpack(endianness + "H", raw.read(2))[0]
+    raw.seek(4, io.SEEK_CUR)
+    files = []
+    for _ in range(num_nodes):
+        raw.seek(8, io.SEEK_CUR)
+        start_offs = struct.unpack(endianness + "I", raw.read(4))[0]
+        end_offs = struct.unpack(endianness + "I", raw.read(4))[0]
+        files.append((start_offs, end_offs))
+    for start_offs, end_offs in files:
+        raw.seek(start_offs + offs, io.SEEK_SET)
+        yield raw.read(end_offs - start_offs)
+
+
+def get_from_sarc(raw: io.BytesIO | io.BufferedReader) -> io.BytesIO:
+    """Attempt to return a FRES file from a SARC archive."""
+    log.debug("Extracting from SARC")
+    for data in sarc_files(raw):
+        if data[:4] == b"FRES":
+            return io.BytesIO(data)
+    raise MalformedFileError("Embedded SARC file does not contain FRES")
@@ -15,3 +15,7 @@ class UnsupportedFormatError(Exception):
 
 class MalformedFileError(Exception):
     """File is corrupted or unreadable."""
+
+
+class ImportCancelledError(Exception):
+    """The import was cancelled before it finished."""
@@ -1,164 +1,202 @@
-import io
+from __future__ import annotations
+
 import logging
-import struct
+import os
+import queue
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import bpy
-import zstandard
 
-from . import yaz0
 from .bfrespy.res_file import ResFile
+from .bntx.pixelfmt.parallel import DecodePool
 from .bone_anim_importer import BoneAnimationImporter
-from .exceptions import MalformedFileError, UnsupportedFileTypeError
-from .model_importer import ModelImporter
+from .loading import (
+    FileLoader,
+    ImportOptions,
+    LoadPipeline,
+    ParsedFile,
+    load_batches,
+    load_file,
+    loaded_events,
+    parsed_files,
+)
+from .material_importer import MaterialRegistry, MaterialTemplate
+from .mesh_importer import MeshRegistry
+from .model_importer import ModelImporter, import_armatures
+from .texture_importer import TextureMap
+from .timing import StageTimings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
 
 log = logging.getLogger(__name__)
 
 
 class Importer:
-    def __init__(self, operator, filepath):
+    def __init__(
+        self,
+        operator,
+        filepath,
+        decode_pool: DecodePool | None = None,
+        external_strings: dict[int, str] | None = None,
+    ):
         self.operator = operator
-        self.bfres: ResFile
+        self.external_strings = {} if external_strings is None else external_strings
+        """The table of the last external string file of the import, the file refers to its strings by ID in it.
+
+        It is replaced once the file is parsed if the file holds external strings itself.
+        """
+        self.decode_pool = decode_pool
+        """The pool large textures are decoded on, the import this file is part of shuts it down."""
+        self.bfres: ResFile | None = None
 
         # Extract path information.
         self.filepath = Path(filepath)
         self.directory = self.filepath.parent
         self.filename = self.filepath.name
         self.fileext = self.filepath.suffix.upper()
-        self.texture_map = {}
+        self.texture_map = TextureMap(operator, decode_pool)
+        self.material_templates: dict[tuple, MaterialTemplate] = {}
+        """Materials to copy for materials with the same node tree, see `import_material`."""
+        self.material_registry = MaterialRegistry() if operator.reuse_materials else None
+        """Imported materials to reuse for identical ones, see `import_material`."""
+        self.timings = StageTimings()
+        self.mesh_registry = None
+        """Imported meshes to share between identical shapes, see `import_mesh`."""
+        if operator.reuse_meshes != "OFF":
+            self.mesh_registry = MeshRegistry(operator.reuse_meshes == "ALL", self.timings)
+        self.model_importers: dict[tuple[int, str], ModelImporter] = {}
+        """The importer of every model, by the id of the `ParsedFile` it is in and its name."""
+        self.steps_done = 0
+        self.steps_total = 0
+        """The number of steps of the file, known once it is parsed."""
         # Create work directories for temporary files.
 
     def run(self):
-        with open(self.filepath, "rb") as f:
-            return self._load_stream(f)
-
-    def run_file(self, filepath: str | Path):
-        with open(filepath, "rb") as f:
-            return self._load_stream(f)
-
-    def _load_stream(self, raw) -> set:
-        """Check if the stream is decompressed, and then check if it's an archive"""
-        # Ensure to have a stream with decompressed data.
-        magic = raw.read(4)
-        raw.seek(0, io.SEEK_SET)
-        match magic:
-            # Uncompressed
-            case b"FRES":
-                return self._import_bfres(raw)
-            case b"BNTX":
-                return self._import_bntx(raw)
-            # Archive
-            case b"SARC":
-                r = self._get_from_sarc(raw)
-                return self._load_stream(r)
-            # Compressed
-            case b"\x28\xb5\x2f\xfd":  # zstd
-                dctx = zstandard.ZstdDecompressor()
-                r = dctx.decompress(raw.read())
-                return self._load_stream(io.BytesIO(r))
-            case b"Yaz0":
-                r = yaz0.decompress(raw)
-                return self._load_stream(r)
-            case _:
-                raise UnsupportedFileTypeError(magic)
-
-    def _import_bfres(self, stream):
-        """Import a BFRES file, and return 'FINISHED' if it succeeds"""
-        bfres = ResFile(stream)
-        self.bfres = bfres
-
-        # Read and import any external files
-        for node in bfres.external_files:
-            self._import_embed(node, bfres.name)
-
-        if self.operator.import_tex_mode == "TEX_FILE":
-            texpath = Path(self.filepath).stem
-            ext = Path(self.filepath).suffix
-            texpath = texpath + ".Tex" + ext
-            if Path(texpath).is_file():
-                log.info("Importing linked file: %s", texpath)
-                self.run_file(texpath)
-
-        if self.operator.import_tex_mode == "TEX_FOLDER":
-            texfolder = Path(self.filepath).parents[1].joinpath("Tex")
-            ext = Path(self.filepath).suffix
-            for model in bfres.models.values():
-                for fmat in model.materials.values():
-                    for tex in fmat.texture_refs:
-                        texpath = texfolder.joinpath(tex.name).with_suffix(".bntx" + ext)
-                        log.debug("Looking for: %s", texpath)
-                        if texpath.is_file():
-                            log.info("Importing file from Tex folder: %s", texpath)
-                            self.run_file(texpath)
-
-        if self.operator.import_anims:
-            anim_imp = BoneAnimationImporter(self)
-            anim_imp._import_animations(bfres)
-
-        # If there's more than one model, add them all to a collection.
-        if len(bfres.models) > 1:
-            collection = bpy.data.collections.new(name=bfres.name)
-            bpy.context.scene.collection.children.link(collection)
-        else:
-            collection = bpy.context.scene.collection
-
-        model_imp = ModelImporter(self)
-        for fmdl in bfres.models.values():
-            model_imp.convert_fmdl(fmdl, collection)
+        """Load the file on a background thread, and create its Blender data here as it is loaded."""
+        loader = FileLoader(
+            import_options(self.operator), self.external_strings, timings=self.timings, decode_pool=self.decode_pool
+        )
+        for event in LoadPipeline(loader, self.filepath).start():
+            for _ in self.steps(event):
+                pass
+        self.timings.report()
+        return {"FINISHED"}
 
+    def build(self, parsed: ParsedFile) -> set:
+        """Create the Blender data of a loaded file, and return 'FINISHED' if it succeeds"""
+        for event in loaded_events(parsed):
+            for _ in self.steps(event):
+                pass
         return {"FINISHED"}
 
-    def _import_bntx(self, stream):
-        """Import a bntx file, and return 'FINISHED' if it succeeds"""
-        from . import bntx
-        from .texture_importer import import_textures
+    @property
+    def progress(self) -> float:
+        """The fraction of the steps that are done."""
+        return self.steps_done / self.steps_total if self.steps_total else 0.0
 
-        bntx_ = bntx.BNTX(stream)
+    def steps(self, event: tuple) -> Iterator[None]:
+        """Create the Blender data for an event of `loading.LoadPipeline`, yielding after every object.
 
-        self.texture_map.update(import_textures(bntx_, self.operator))
+        The Blender data is consistent between steps, so importing can be stopped at any of them.
+        """
+        for _ in self._event_steps(event):
+            self.steps_done += 1
+            yield
 
-        return {"FINISHED"}
+    def _event_steps(self, event: tuple) -> Iterator[None]:
+        match event:
+            case ("parsed", parsed):
+                yield from self._begin(parsed)
+            case ("mesh", parsed, (model_name, shape_name), lods):
+                model_imp = self.model_importers[id(parsed), model_name]
+                with self.timings.stage("build"):
+                    model_imp.import_shape(model_imp.fmdl.shapes[shape_name], lods)
+                yield
+            case ("done", parsed):
+                yield from self._finish(parsed)
+            case ("error", ex):
+                raise ex
 
-    def _import_embed(self, node, name):
-        """Import an embedded file in the ResFile"""
-        name = node.key
-        file = node.value
-        if name.endswith(".txt"):
-            # embed text blend file
-            obj = bpy.data.texts.new(name=name)
-            obj.write(file.data.decode("utf-8"))
-        elif file.data:
-            try:
-                self._load_stream(io.BytesIO(file.data))
-            except UnsupportedFileTypeError as ex:
-                log.debug("Embedded file '%s' is of unsupported type '%s'", name, ex.magic)
-        else:
-            log.debug("Embedded file '%s' is empty", name)
+    def _begin(self, parsed: ParsedFile) -> Iterator[None]:
+        """Create everything that doesn't need decoded data: texts, animations and armatures."""
+        if parsed.external_strings is not None:
+            self.external_strings = parsed.external_strings
+        self.steps_total = _count_steps(parsed)
+        for file in parsed_files(parsed):
+            with self.timings.stage("build"):
+                for bntx in file.textures:
+                    self.texture_map.add_bntx(bntx)
+                for name, text in file.texts.items():
+                    # embed text blend file
+                    obj = bpy.data.texts.new(name=name)
+                    obj.write(text)
 
-    @staticmethod
-    def _get_from_sarc(raw: io.BytesIO | io.BufferedReader):
-        """Attempt to return a FRES file from a SARC archive."""
-        log.debug("Extracting from SARC")
-        raw.seek(6, io.SEEK_CUR)
-        bom = raw.read(2)
-        endianness = ">" if bom == 0xFEFF else "<"
-        raw.seek(4, io.SEEK_CUR)
-        offs = struct.unpack(endianness + "I", raw.read(4))[0]
-        raw.seek(10, io.SEEK_CUR)
-        num_nodes = struct.unpack(endianness + "H", raw.read(2))[0]
-        raw.seek(4, io.SEEK_CUR)
-        files = []
-        for _ in range(num_nodes):
-            raw.seek(8, io.SEEK_CUR)
-            start_offs = struct.unpack(endianness + "I", raw.read(4))[0]
-            end_offs = struct.unpack(endianness + "I", raw.read(4))[0]
-            files.append((start_offs, end_offs))
-        for fileoff in files:
-            raw.seek(fileoff[0] + offs, io.SEEK_SET)
-            if raw.read(4) == b"FRES":
-                raw.seek(-4, io.SEEK_CUR)
-                return io.BytesIO(raw.read(fileoff[1] - offs))
-        raise MalformedFileError("Embedded SARC file does not contain FRES")
+            bfres = file.bfres
+            if bfres is None:
+                continue
+            self.bfres = bfres
+
+            with self.timings.stage("build"):
+                if self.operator.import_anims:
+                    anim_imp = BoneAnimationImporter(self)
+                    anim_imp._import_animations(bfres)
+
+                # If there's more than one model, add them all to a collection.
+                if len(bfres.models) > 1:
+                    collection = bpy.data.collections.new(name=bfres.name)
+                    bpy.context.scene.collection.children.link(collection)
+                else:
+                    collection = bpy.context.scene.collection
+            yield
+
+            if not bfres.models:
+                continue
+            with self.timings.stage("build"):
+                fmdls = list(bfres.models.values())
+                model_imps = [ModelImporter(self) for _ in fmdls]
+                for fmdl, model_imp in zip(fmdls, model_imps):
+                    self.model_importers[id(file), fmdl.name] = model_imp
+                # One trip to edit mode for all the armatures of the file.
+                import_armatures(model_imps, fmdls, collection, file.rest_matrices)
+            yield
+
+    def _finish(self, parsed: ParsedFile) -> Iterator[None]:
+        """Create the materials once the textures are decoded, and import the textures of texture-only files."""
+        for file in parsed_files(parsed):
+            self.texture_map.add_decoded(file.decoded_textures)
+        for file in parsed_files(parsed):
+            if file.bfres is None:
+                # A BNTX on its own is imported whole.
+                if file.textures:
+                    with self.timings.stage("build"):
+                        self.texture_map.import_all()
+                    yield
+                continue
+
+            for fmdl in file.bfres.models.values():
+                model_imp = self.model_importers[id(file), fmdl.name]
+                yield from self._timed(model_imp.import_textures())
+                yield from self._timed(model_imp.import_materials())
+
+            # A texture-only file has no materials to ask for its textures.
+            if not file.bfres.models:
+                with self.timings.stage("build"):
+                    self.texture_map.import_all()
+                yield
+
+    def _timed(self, steps: Iterator[None]) -> Iterator[None]:
+        """Run every step in the build stage."""
+        while True:
+            with self.timings.stage("build"):
+                if next(steps, _DONE) is _DONE:
+                    return
+            yield
 
     @staticmethod
     def _add_object_to_collecton(obj, collection_name):
@@ -168,3 +206,263 @@ class Importer:
         # Link the provided object to it.
         if obj.name not in group.objects:
             group.objects.link(obj)
+
+
+_DONE = object()
+
+
+def _count_steps(parsed: ParsedFile) -> int:
+    """The number of steps `Importer.steps` takes to create the Blender data of a file."""
+    count = 0
+    for file in parsed_files(parsed):
+        if file.bfres is None:
+            count += bool(file.textures)
+            continue
+        # The collection and animations, then all armatures or a texture-only file's textures.
+        count += 2
+        for fmdl in file.bfres.models.values():
+            textures = {ref.name for fmat in fmdl.materials.values() for ref in fmat.texture_refs}
+            count += len(fmdl.shapes) + len(fmdl.materials) + len(textures)
+    return count
+
+
+def import_options(operator) -> ImportOptions:
+    """The loading options of the operator, with the model cache in the add-on's user directory."""
+    if not operator.model_cache:
+        return ImportOptions.from_operator(operator)
+    try:
+        cache_dir = bpy.utils.extension_path_user(__package__, path="model_cache", create=True)
+    except (AttributeError, ValueError):
+        # Installed as a legacy add-on
+        cache_dir = os.path.join(tempfile.gettempdir(), "io_scene_bfres_model_cache")
+    return ImportOptions.from_operator(operator, cache_dir=cache_dir)
+
+
+def import_serial(operator, paths: list[str]) -> set:
+    """Import files one after another, each loaded on a background thread while its Blender data is built."""
+    ret = {"CANCELLED"}
+    external_strings = {}
+    with DecodePool(operator.texture_decode_workers) as decode_pool:
+        for path in paths:
+            log.info("importing: %s", path)
+            importer = Importer(operator, path, decode_pool, external_strings)
+            if importer.run() == {"FINISHED"}:
+                ret = {"FINISHED"}
+            external_strings = importer.external_strings
+    return ret
+
+
+def import_files(operator, paths: list[str]) -> set:
+    """Import several files, loading them on a process pool while the Blender data of finished ones is built.
+
+    Files are built in the order they finish loading. Files holding external strings are loaded and built first, so
+    the others are loaded with their table. Only if the pool can't be used are the files loaded in this process, an
+    error loading one of them is raised as it is.
+    """
+    ret = {"CANCELLED"}
+    remaining = list(paths)
+    options = import_options(operator)
+    external_strings = {}
+    with DecodePool(operator.texture_decode_workers) as decode_pool:
+        try:
+            with _load_pool(len(paths)) as pool:
+                for batch in load_batches(paths):
+                    futures = _submit_batch(pool, batch, options, external_strings)
+                    for future in as_completed(futures):
+                        path = futures[future]
+                        try:
+                            parsed = future.result()
+                        except BrokenProcessPool:
+                            raise
+                        except Exception:
+                            # Report it without loading the rest of the batch first.
+                            pool.shutdown(wait=False, cancel_futures=True)
+                            raise
+                        log.info("importing: %s", path)
+                        importer = Importer(operator, path, decode_pool, external_strings)
+                        if importer.build(parsed) == {"FINISHED"}:
+                            ret = {"FINISHED"}
+                        external_strings = importer.external_strings
+                        remaining.remove(path)
+        except BrokenProcessPool:
+            log.warning("Could not load files on a process pool, loading them in this process")
+            for path in remaining:
+                log.info("importing: %s", path)
+                importer = Importer(operator, path, decode_pool, external_strings)
+                if importer.run() == {"FINISHED"}:
+                    ret = {"FINISHED"}
+                external_strings = importer.external_strings
+    return ret
+
+
+def _load_pool(files: int) -> ProcessPoolExecutor:
+    """A process pool to load `files` files on with `load_file`, see `_submit_batch`."""
+    try:
+        return ProcessPoolExecutor(max_workers=min(files, os.cpu_count() or 1))
+    except OSError as ex:
+        raise BrokenProcessPool("Could not create the process pool") from ex
+
+
+def _submit_batch(
+    pool: ProcessPoolExecutor, batch: list[str], options: ImportOptions, external_strings: dict[int, str]
+) -> dict[Future[ParsedFile], str]:
+    """Start loading the files of a batch on `pool`.
+
+    Not being able to start the worker processes raises `BrokenProcessPool` like the pool breaking later does, so
+    only that makes the import fall back to loading in this process. Errors loading a file are raised by its future.
+    """
+    try:
+        return {pool.submit(load_file, path, options, external_strings): path for path in batch}
+    except OSError as ex:
+        raise BrokenProcessPool("Could not start the worker processes") from ex
+
+
+class IncrementalImport:
+    """Imports files a bounded amount of work at a time, for a modal operator to call from a timer.
+
+    Files are loaded on background threads by `LoadPipeline`. The next file starts loading once the previous one
+    is loaded, while the Blender data of the previous one is still being created. With "Load Files in Parallel",
+    files are loaded on a process pool like `import_files` does instead, and whichever is loaded first is built.
+    """
+
+    def __init__(self, operator, paths: list[str]):
+        self.operator = operator
+        self.paths = list(paths)
+        self.options = import_options(operator)
+        self.decode_pool = DecodePool(operator.texture_decode_workers)
+        self.external_strings: dict[int, str] = {}
+        """The table of the last external string file imported, the files after it are loaded with it."""
+        self.files_done = 0
+        self.importer: Importer | None = None
+        self.pipeline: LoadPipeline | _LoadedFile | None = None
+        self._next: tuple[Importer, LoadPipeline] | None = None
+        self._steps: Iterator[None] | None = None
+        self._last_event = False
+        self._pending = list(self.paths)
+        """The files that haven't started being built."""
+        self._pool: ProcessPoolExecutor | None = None
+        self._batches: list[list[str]] = []
+        self._futures: dict[Future[ParsedFile], str] = {}
+        if len(self.paths) > 1 and operator.parallel_files:
+            self._batches = load_batches(self.paths)
+            self._pending = [path for batch in self._batches for path in batch]
+            try:
+                self._pool = _load_pool(len(self.paths))
+            except BrokenProcessPool:
+                log.warning("Could not load files on a process pool, loading them in this process")
+
+    @property
+    def progress(self) -> float:
+        """The fraction of the import that is done."""
+        current = self.importer.progress if self.importer is not None else 0.0
+        return (self.files_done + current) / len(self.paths)
+
+    @property
+    def status(self) -> str:
+        if self.importer is None:
+            return "Importing BFRES..."
+        return (
+            f"Importing {self.importer.filename} ({self.files_done + 1}/{len(self.paths)}), "
+            f"{self.importer.progress:.0%}, press Esc to cancel"
+        )
+
+    def tick(self, budget: float) -> bool:
+        """Create Blender data for up to `budget` seconds, and return True once every file is imported.
+
+        Exceptions of loading and building are raised here.
+        """
+        deadline = time.perf_counter() + budget
+        while (remaining := deadline - time.perf_counter()) > 0:
+            if self._steps is None:
+                if self.pipeline is None:
+                    if self.files_done == len(self.paths):
+                        self.decode_pool.shutdown()
+                        return True
+                    if self._pool is not None:
+                        loaded = self._loaded_file(remaining)
+                        if loaded is None:
+                            continue
+                        self.importer, self.pipeline = loaded
+                    else:
+                        self.importer, self.pipeline = self._next or self._start(self._pending.pop(0))
+                        self._next = None
+                try:
+                    event = self.pipeline.events.get(timeout=remaining)
+                except queue.Empty:
+                    return False
+                self._last_event = event[0] in ("done", "error")
+                if event[0] == "done":
+                    self.external_strings = self.importer.external_strings
+                if event[0] == "done" and self._pool is None and self._pending:
+                    # External strings are known now, the next file can be loaded with them.
+                    self._next = self._start(self._pending.pop(0))
+                self._steps = self.importer.steps(event)
+
+            if next(self._steps, _DONE) is _DONE:
+                self._steps = None
+                if self._last_event:
+                    self.importer.timings.report()
+                    self.files_done += 1
+                    self.importer = self.pipeline = None
+        return False
+
+    def cancel(self):
+        """Stop loading, the Blender data created so far is kept."""
+        if self._steps is not None:
+            self._steps.close()
+            self._steps = None
+        for pipeline in (self.pipeline, self._next and self._next[1]):
+            if pipeline is not None:
+                pipeline.cancel()
+        self._shutdown_pool()
+        self.decode_pool.shutdown()
+
+    def _start(self, path: str) -> tuple[Importer, LoadPipeline]:
+        log.info("importing: %s", path)
+        importer = Importer(self.operator, path, self.decode_pool, self.external_strings)
+        loader = FileLoader(self.options, self.external_strings, timings=importer.timings, decode_pool=self.decode_pool)
+        return importer, LoadPipeline(loader, path).start()
+
+    def _loaded_file(self, timeout: float) -> tuple[Importer, _LoadedFile] | None:
+        """The importer and events of a file the process pool has loaded, or None if none is loaded within `timeout`.
+
+        A batch is submitted once the previous one is built, so the files holding external strings are built before
+        the others are loaded. If the pool stops working, the remaining files are loaded on threads instead. An error
+        loading a file is raised as it is.
+        """
+        try:
+            if not self._futures:
+                self._futures = _submit_batch(self._pool, self._batches.pop(0), self.options, self.external_strings)
+            done, _ = wait(self._futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                return None
+            future = done.pop()
+            parsed = future.result()
+        except BrokenProcessPool:
+            log.warning("Could not load files on a process pool, loading them in this process")
+            self._shutdown_pool()
+            return None
+        path = self._futures.pop(future)
+        self._pending.remove(path)
+        if not self._futures and not self._batches:
+            self._shutdown_pool()
+        log.info("importing: %s", path)
+        return Importer(self.operator, path, self.decode_pool, self.external_strings), _LoadedFile(parsed)
+
+    def _shutdown_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._futures = {}
+
+
+class _LoadedFile:
+    """The events of a file loaded by a worker process, in place of the `LoadPipeline` that would load it."""
+
+    def __init__(self, parsed: ParsedFile):
+        self.events: queue.SimpleQueue[tuple] = queue.SimpleQueue()
+        for event in loaded_events(parsed):
+            self.events.put(event)
+
+    def cancel(self):
+        pass
@@ -0,0 +1,481 @@
+"""Reading, parsing and decoding of import files, without Blender.
+
+Everything an imported file needs from disk is loaded here, so it can run in a worker process. The result is a
+picklable `ParsedFile` that `importing.Importer.build` turns into Blender data.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import io
+import logging
+import math
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import zstandard
+
+from . import container
+from .bfrespy import scan
+from .bfrespy.res_file import ResFile
+from .bntx.cache import DecodedTextureCache, decode_cached, decode_key, decoded_textures
+from .bntx.pixelfmt.stream import DEFAULT_STRIP_HEIGHT
+from .exceptions import ImportCancelledError, UnsupportedFileTypeError
+from .mesh_data import AttributeCache, MeshData, build_shape
+from .model_cache import DEFAULT_MAX_BYTES, ModelCache
+from .skeleton_data import rest_matrices
+from .timing import StageTimings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    import numpy as np
+
+    from .asset_index import TextureLocation
+    from .bntx.bntx import BNTX
+    from .bntx.brti import BRTI
+    from .bntx.pixelfmt.parallel import DecodePool
+
+log = logging.getLogger(__name__)
+
+READ_WORKERS = 4
+"""Threads that read and decompress linked texture files, the decompressors release the GIL."""
+
+
+@dataclass
+class ImportOptions:
+    """The operator settings that affect loading, as plain picklable values."""
+
+    import_tex_mode: str = "EMBEDDED"
+    lod_index: int = 0
+    all_lods: bool = False
+    """Decode every LOD of the shapes instead of `lod_index`."""
+    component_selector: bool = True
+    texture_decode_workers: int = 0
+    texture_strip_height: int = DEFAULT_STRIP_HEIGHT
+    model_cache: bool = False
+    model_cache_size: int = DEFAULT_MAX_BYTES // (1024 * 1024)
+    """Size limit of the model cache in MiB."""
+    cache_dir: str | None = None
+    """Directory of the model cache, it is only used if this is set."""
+    asset_index: str = ""
+    """Path of the asset index database textures are looked up in, for the `INDEX` texture import mode."""
+
+    @classmethod
+    def from_operator(cls, operator, **kwargs) -> ImportOptions:
+        values = {f.name: getattr(operator, f.name) for f in dataclasses.fields(cls) if hasattr(operator, f.name)}
+        return cls(**(values | kwargs))
+
+
+@dataclass
+class ParsedFile:
+    """Everything read from one imported file."""
+
+    path: Path
+    bfres: ResFile | None = None
+    textures: list[BNTX] = field(default_factory=list)
+    """BNTX files to take textures from, embedded or linked."""
+    texts: dict[str, str] = field(default_factory=dict)
+    """Embedded text files."""
+    meshes: dict[tuple[str, str], list[MeshData]] = field(default_factory=dict)
+    """The decoded LODs of every shape, by model and shape name. Only one unless all LODs are imported."""
+    rest_matrices: dict[str, np.ndarray] = field(default_factory=dict)
+    """The bone rest matrices of every model's skeleton, by model name."""
+    decoded_textures: dict[tuple, np.ndarray] = field(default_factory=dict)
+    """Decoded pixels of the textures the materials bind, by `bntx.cache.decode_key`."""
+    external_strings: dict[int, str] | None = None
+    """The string table, if this file holds external strings."""
+    children: list[ParsedFile] = field(default_factory=list)
+    """Other BFRES files embedded in this one."""
+
+
+def texture_channel_types(tex: BRTI, component_selector: bool) -> bytes | None:
+    """The component selectors to decode a texture with, or None to keep its channels as they are."""
+    use_selector = (
+        component_selector
+        and tex.format_.__name__ != "BC1"  # don't make alpha channel if it's not needed
+        and not (tex.format_.__name__ == "BC5" and tex.channel_types[2] == 0)  # normal maps
+    )
+    return tex.channel_types if use_selector else None
+
+
+def load_file(path, options: ImportOptions, external_strings: dict[int, str] | None = None) -> ParsedFile:
+    """Load a file in a worker process.
+
+    Textures are decoded in the worker itself, and the GPU buffers that were decoded into meshes are dropped so the
+    result can be pickled.
+    """
+    loader = FileLoader(options, external_strings, DecodedTextureCache(math.inf))
+    parsed = loader.load(path)
+    _detach_buffers(parsed)
+    return parsed
+
+
+def holds_external_strings(path) -> bool:
+    """Whether a file holds the external string table other files refer to, read from the start of its header.
+
+    Files that can't be read are reported by the import itself, so they count as not holding the table.
+    """
+    try:
+        with open(path, "rb") as f:
+            return scan.holds_external_strings(container.decompressed_head(f, scan.HEADER_SIZE))
+    except (OSError, IndexError, AssertionError, zstandard.ZstdError):
+        return False
+
+
+def load_batches(paths: list) -> list[list]:
+    """Split paths into the files holding external strings and the rest, the first to be loaded before the others."""
+    strings = [path for path in paths if holds_external_strings(path)]
+    return [batch for batch in (strings, [path for path in paths if path not in strings]) if batch]
+
+
+class FileLoader:
+    """Loads files into `ParsedFile`s.
+
+    Linked texture files are read and decompressed on a background thread as soon as the BFRES that needs them is
+    parsed, and textures are decoded on another thread while the meshes are decoded. Large textures are decoded on
+    `decode_pool` if it is given, the import it belongs to shuts it down.
+    """
+
+    def __init__(
+        self,
+        options: ImportOptions,
+        external_strings: dict[int, str] | None = None,
+        cache: DecodedTextureCache = decoded_textures,
+        timings: StageTimings | None = None,
+        decode_pool: DecodePool | None = None,
+    ):
+        self.options = options
+        self.decode_pool = decode_pool
+        self.external_strings = {} if external_strings is None else external_strings
+        self.cache = cache
+        self.timings = StageTimings() if timings is None else timings
+        self.model_cache = None
+        if options.model_cache and options.cache_dir:
+            self.model_cache = ModelCache(options.cache_dir, options.model_cache_size * 1024 * 1024)
+        self.sources: set[Path] = set()
+        """Every file read by the last `load`."""
+        self.cancelled = threading.Event()
+        """Set from another thread to stop loading, `load` then raises `ImportCancelledError`."""
+        self._io_pool: ThreadPoolExecutor | None = None
+        self._prefetched: list[tuple[ParsedFile, Future[io.BytesIO]]] = []
+
+    def load(
+        self,
+        path,
+        on_parsed: Callable[[ParsedFile], None] | None = None,
+        on_mesh: Callable[[ParsedFile, tuple[str, str], list[MeshData]], None] | None = None,
+    ) -> ParsedFile:
+        """Load a file, or take it from the model cache if it was loaded with the same options before.
+
+        `on_parsed` is called with the file once it and everything it links to is parsed, before anything is decoded.
+        `on_mesh` is called with the file an embedded model is in, the key and the LODs of every shape as soon as it
+        is decoded.
+        """
+        if self.model_cache is not None:
+            parsed = self.model_cache.get(path, self.options, self.external_strings)
+            if parsed is not None:
+                if parsed.external_strings is not None:
+                    self.external_strings = parsed.external_strings
+                if on_parsed is not None:
+                    on_parsed(parsed)
+                if on_mesh is not None:
+                    for file in parsed_files(parsed):
+                        for key, lods in file.meshes.items():
+                            on_mesh(file, key, lods)
+                return parsed
+
+        # The table the file is parsed with, a file holding external strings replaces it while loading.
+        external_strings = self.external_strings
+        parsed = ParsedFile(Path(path))
+        self.sources = set()
+        with ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="bfres-read") as self._io_pool:
+            self._prefetched = []
+            self._load_file(parsed, parsed.path)
+            for file, future in self._prefetched:
+                self._load_stream(file, future.result())
+        self._io_pool = None
+        self._check_cancelled()
+        if on_parsed is not None:
+            on_parsed(parsed)
+        self._decode(parsed, on_mesh)
+        if self.model_cache is not None:
+            _detach_buffers(parsed)
+            self.model_cache.put(path, self.options, parsed, self.sources, external_strings)
+        return parsed
+
+    def _check_cancelled(self):
+        if self.cancelled.is_set():
+            raise ImportCancelledError
+
+    def _load_file(self, parsed: ParsedFile, path: Path):
+        self.sources.add(path)
+        self._load_stream(parsed, self._read(path))
+
+    def _prefetch(self, parsed: ParsedFile, path: Path):
+        """Start reading a linked file, it is parsed after the file that links it."""
+        self.sources.add(path)
+        self._prefetched.append((parsed, self._io_pool.submit(self._read, path)))
+
+    def _read(self, path: Path) -> io.BytesIO:
+        """Read and decompress a whole file."""
+        with self.timings.stage("read"), open(path, "rb") as f:
+            return container.decompress(io.BytesIO(f.read()))
+
+    def _load_stream(self, parsed: ParsedFile, raw):
+        """Check if the stream is decompressed, and then check if it's an archive"""
+        # Ensure to have a stream with decompressed data.
+        magic = raw.read(4)
+        raw.seek(0, io.SEEK_SET)
+        match magic:
+            # Uncompressed
+            case b"FRES":
+                self._load_bfres(parsed, raw)
+            case b"BNTX":
+                from .bntx import BNTX
+
+                with self.timings.stage("parse"):
+                    parsed.textures.append(BNTX(raw))
+            # Archive
+            case b"SARC":
+                self._load_stream(parsed, container.get_from_sarc(raw))
+            # Compressed
+            case b"\x28\xb5\x2f\xfd" | b"Yaz0":
+                with self.timings.stage("read"):
+                    raw = container.decompress(raw)
+                self._load_stream(parsed, raw)
+            case _:
+                raise UnsupportedFileTypeError(magic)
+
+    def _load_bfres(self, parsed: ParsedFile, stream):
+        with self.timings.stage("parse"):
+            bfres = ResFile(stream, self.external_strings)
+        if bfres.holds_external_strings:
+            log.info("Loaded %d external strings", len(bfres.external_strings))
+            self.external_strings = parsed.external_strings = bfres.external_strings
+            return
+
+        if parsed.bfres is not None:
+            child = ParsedFile(parsed.path)
+            parsed.children.append(child)
+            parsed = child
+        parsed.bfres = bfres
+
+        # The materials tell which texture files are needed, start reading them before the embedded files.
+        if self.options.import_tex_mode == "TEX_FILE":
+            path = parsed.path
+            texpath = path.with_name(path.stem + ".Tex" + path.suffix)
+            if texpath.is_file():
+                log.info("Importing linked file: %s", texpath)
+                self._prefetch(parsed, texpath)
+
+        if self.options.import_tex_mode == "TEX_FOLDER":
+            texfolder = parsed.path.parents[1].joinpath("Tex")
+            ext = parsed.path.suffix
+            for model in bfres.models.values():
+                for fmat in model.materials.values():
+                    for tex in fmat.texture_refs:
+                        texpath = texfolder.joinpath(tex.name).with_suffix(".bntx" + ext)
+                        log.debug("Looking for: %s", texpath)
+                        if texpath.is_file():
+                            log.info("Importing file from Tex folder: %s", texpath)
+                            self._prefetch(parsed, texpath)
+
+        index_packs = None
+        if self.options.import_tex_mode == "INDEX" and self.options.asset_index:
+            index_packs = self._prefetch_from_index(bfres)
+
+        # Read any external files
+        for node in bfres.external_files:
+            self._load_embed(parsed, node)
+
+        if index_packs:
+            self._load_from_index(parsed, index_packs)
+
+    def _prefetch_from_index(self, bfres: ResFile) -> list[tuple[set[str], TextureLocation, Future[io.BytesIO]]]:
+        """Start reading the texture packs in the asset index that hold the textures the materials refer to.
+
+        Return the names every pack is needed for, its location and the future of its stream.
+        """
+        from .asset_index import AssetIndex, open_member
+
+        wanted = set()
+        for model in bfres.models.values():
+            for fmat in model.materials.values():
+                wanted.update(ref.name for ref in fmat.texture_refs)
+        if not wanted:
+            return []
+
+        with AssetIndex(self.options.asset_index) as index:
+            found = index.find_textures(sorted(wanted))
+        for name in wanted.difference(found):
+            log.warning("Texture '%s' is not in the asset index", name)
+        packs: dict[TextureLocation, set[str]] = {}
+        for name, locations in found.items():
+            packs.setdefault(locations[0], set()).add(name)
+
+        def read(pack):
+            with self.timings.stage("read"):
+                return open_member(pack.path, pack.member)
+
+        prefetched = []
+        for pack in sorted(packs, key=lambda pack: (str(pack.path), str(pack.member))):
+            self.sources.add(pack.path)
+            prefetched.append((packs[pack], pack, self._io_pool.submit(read, pack)))
+        return prefetched
+
+    def _load_from_index(self, parsed: ParsedFile, packs: list[tuple[set[str], TextureLocation, Future[io.BytesIO]]]):
+        """Load the prefetched texture packs that hold textures that weren't embedded."""
+        from .bntx import BNTX
+
+        loaded = {name for bntx in parsed.textures for name in bntx.nx.textures.names()}
+        for names, pack, future in packs:
+            stream = future.result()
+            if names <= loaded:
+                continue
+            log.info("Importing texture pack from the asset index: %s %s", pack.path, list(pack.member))
+            with self.timings.stage("parse"):
+                parsed.textures.append(BNTX(stream))
+
+    def _load_embed(self, parsed: ParsedFile, node):
+        """Load an embedded file in the ResFile"""
+        name = node.key
+        file = node.value
+        if name.endswith(".txt"):
+            parsed.texts[name] = file.data.decode("utf-8")
+        elif file.data:
+            try:
+                self._load_stream(parsed, io.BytesIO(file.data))
+            except UnsupportedFileTypeError as ex:
+                log.debug("Embedded file '%s' is of unsupported type '%s'", name, ex.magic)
+        else:
+            log.debug("Embedded file '%s' is empty", name)
+
+    def _decode(self, parsed: ParsedFile, on_mesh=None):
+        """Decode the meshes on this thread while the textures their materials bind are decoded on another."""
+        files = list(parsed_files(parsed))
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bfres-textures") as pool:
+            textures = pool.submit(self._decode_textures, files)
+            for file in files:
+                self._decode_meshes(file, on_mesh)
+            textures.result()
+
+    def _decode_meshes(self, parsed: ParsedFile, on_mesh=None):
+        if parsed.bfres is None:
+            return
+        for model in parsed.bfres.models.values():
+            with self.timings.stage("decode meshes"):
+                rest = parsed.rest_matrices[model.name] = rest_matrices(model.skeleton)
+                cache = AttributeCache(model, self.timings)
+            for fshp in model.shapes.values():
+                self._check_cancelled()
+                with self.timings.stage("decode meshes"):
+                    data = build_shape(model, fshp, rest, self.options.lod_index, self.options.all_lods, cache)
+                    parsed.meshes[model.name, fshp.name] = data
+                if on_mesh is not None:
+                    on_mesh(parsed, (model.name, fshp.name), data)
+
+    def _decode_textures(self, files: list[ParsedFile]):
+        for parsed in files:
+            wanted = None
+            if parsed.bfres is not None and parsed.bfres.models:
+                wanted = set()
+                for model in parsed.bfres.models.values():
+                    for fmat in model.materials.values():
+                        wanted.update(ref.name for ref in fmat.texture_refs)
+
+            for bntx in parsed.textures:
+                for tex in bntx.nx.textures:
+                    if wanted is not None and tex.name not in wanted:
+                        continue
+                    self._check_cancelled()
+                    with self.timings.stage("decode textures"):
+                        channel_types = texture_channel_types(tex, self.options.component_selector)
+                        key = decode_key(tex, channel_types, flip=True)
+                        parsed.decoded_textures[key] = decode_cached(
+                            tex,
+                            pool=self.decode_pool,
+                            strip_height=self.options.texture_strip_height,
+                            channel_types=channel_types,
+                            flip=True,
+                            cache=self.cache,
+                        )
+
+
+class LoadPipeline:
+    """Loads a file on a background thread, and hands what is loaded to the thread that creates the Blender data.
+
+    The events are put on `events` in this order:
+
+    - `("parsed", parsed)` once the file is parsed, before anything is decoded.
+    - `("mesh", file, key, lods)` for every shape, as soon as it is decoded.
+    - `("done", parsed)` once the textures are decoded too, or `("error", exception)` if loading failed.
+    """
+
+    def __init__(self, loader: FileLoader, path):
+        self.loader = loader
+        self.path = path
+        self.events: queue.Queue[tuple] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="bfres-load", daemon=True)
+
+    def start(self) -> LoadPipeline:
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stop loading at the next shape or texture, the last event is then an `ImportCancelledError`."""
+        self.loader.cancelled.set()
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Wait for every event, up to the last one."""
+        while True:
+            event = self.events.get()
+            yield event
+            if event[0] in ("done", "error"):
+                return
+
+    def _run(self):
+        try:
+            parsed = self.loader.load(
+                self.path,
+                on_parsed=lambda parsed: self.events.put(("parsed", parsed)),
+                on_mesh=lambda file, key, lods: self.events.put(("mesh", file, key, lods)),
+            )
+        except Exception as ex:
+            self.events.put(("error", ex))
+        else:
+            self.events.put(("done", parsed))
+
+
+def loaded_events(parsed: ParsedFile) -> Iterator[tuple]:
+    """The events `LoadPipeline` would put on its queue for a file that is already loaded."""
+    yield ("parsed", parsed)
+    for file in parsed_files(parsed):
+        for key, lods in file.meshes.items():
+            yield ("mesh", file, key, lods)
+    yield ("done", parsed)
+
+
+def parsed_files(parsed: ParsedFile) -> Iterator[ParsedFile]:
+    """A file and every file embedded in it, embedded ones first."""
+    for child in parsed.children:
+        yield from parsed_files(child)
+    yield parsed
+
+
+def _detach_buffers(parsed: ParsedFile):
+    """Drop the views into the file data, everything that was needed from them has been decoded."""
+    for child in parsed.children:
+        _detach_buffers(child)
+    if parsed.bfres is None:
+        return
+    for model in parsed.bfres.models.values():
+        for fshp in model.shapes.values():
+            for buffer in fshp.vtx_buffer.buffers:
+                buffer.data = [b""]
+            for mesh in fshp.meshes:
+                mesh.index_buffer.data = [b""]
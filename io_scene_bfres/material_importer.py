@@ -1,4 +1,7 @@
+import hashlib
+import json
 import logging
+from dataclasses import dataclass
 
 import bpy
 import mathutils
@@ -17,6 +20,12 @@ TEX_WRAPPER = {
     "_e0": "emission_color_texture",
     "_op0": "alpha_texture",
 }
+COMPACT_PROPERTY = "bfres_properties"
+"""The custom property with the parameters of a material imported with compact properties, as JSON."""
+SIGNATURE_PROPERTY = "bfres_signature"
+"""The custom property with the signature of the BFRES material a Blender material was imported from."""
+NODE_PROPERTIES = ("SO_texcoord_select_", "MP_tex_mtx0_")
+"""Prefixes of the custom properties the node setup reads, which are set separately even with compact properties."""
 TEXCOORD_SELECT = {
     "_ao0": "ao",
     "_cp0": "comppaint",
@@ -32,21 +41,130 @@ TEXCOORD_SELECT = {
 }
 
 
-def import_material(fmat: Material, texture_dict, name_prefix) -> bpy.types.Material:
-    """Import specified material from fmat."""
-    mat = bpy.data.materials.new(name=name_prefix + fmat.name)
-    mat.use_nodes = True
-    mat_wrap = PrincipledBSDFWrapper(mat, is_readonly=False)
-    __add_custom_properties(fmat, mat)
+@dataclass
+class MaterialTemplate:
+    """A material built from scratch, that materials with the same node tree are copied from."""
 
-    mappingnode = None
+    material: bpy.types.Material
+    image_nodes: list[tuple[str, int, bool]]
+    """`(node name, index in the bound textures or -1, whether it's an unconnected node labelled with the texture)`"""
+    mapping_node: str | None
+    ui_keys: frozenset[str]
+    """The custom properties that already have their UI data."""
+
+
+class MaterialRegistry:
+    """The imported Blender materials by the signature of their BFRES material, to reuse them for identical ones.
+
+    The signature is kept on the material, so materials of earlier imports are found too.
+    """
+
+    def __init__(self):
+        self._materials: dict[str, bpy.types.Material] | None = None
+
+    def get(self, signature: str) -> bpy.types.Material | None:
+        if self._materials is None:
+            self._materials = {
+                mat[SIGNATURE_PROPERTY]: mat for mat in bpy.data.materials if SIGNATURE_PROPERTY in mat
+            }
+        return self._materials.get(signature)
+
+    def add(self, signature: str, mat: bpy.types.Material):
+        mat[SIGNATURE_PROPERTY] = signature
+        if self._materials is not None:
+            self._materials[signature] = mat
+
+
+def import_material(
+    fmat: Material,
+    texture_dict,
+    name_prefix,
+    templates: dict | None = None,
+    compact=False,
+    registry: MaterialRegistry | None = None,
+) -> bpy.types.Material:
+    """Import specified material from fmat.
+
+    With `templates`, a material with the same shader, samplers and options as one imported before is a copy of it with
+    its images and values replaced, instead of a node tree built again. With `compact`, most parameters are stored in
+    one property, see `expand_custom_properties`. With `registry`, an identical material imported before is reused.
+    """
+    bound = _bound_textures(fmat, texture_dict, name_prefix)
+    if registry is not None:
+        signature = material_signature(fmat, bound, name_prefix, compact)
+        mat = registry.get(signature)
+        if mat is not None:
+            return mat
+
+    props, ui = _custom_properties(fmat)
+    stored, stored_ui = _compact_properties(props, ui) if compact else (props, ui)
+    hoian = _hoian_values(props) if fmat.shader_assign.shader_archive_name == "Hoian_UBER" else {}
+    key = _template_key(fmat, props, bound, hoian)
+
+    template = templates.get(key) if templates is not None else None
+    if template is None:
+        mat = bpy.data.materials.new(name=name_prefix + fmat.name)
+        _set_custom_properties(mat, stored, stored_ui)
+        template = _build_nodes(mat, fmat, props, bound, frozenset(stored_ui))
+        if templates is not None:
+            templates[key] = template
+    else:
+        mat = template.material.copy()
+        mat.name = name_prefix + fmat.name
+        for name in set(mat.keys()) - stored.keys():
+            del mat[name]
+        ui_data = {name: data for name, data in stored_ui.items() if name not in template.ui_keys}
+        _set_custom_properties(mat, stored, ui_data)
+    _set_values(mat, template, props, bound, hoian)
+    if registry is not None:
+        registry.add(signature, mat)
+    return mat
+
+
+def material_signature(fmat: Material, bound: list, name_prefix: str, compact: bool) -> str:
+    """A hash of everything an imported material is made from, including the images its textures resolved to."""
+    shader_assign = fmat.shader_assign
+    parts = (
+        name_prefix + fmat.name,
+        compact,
+        shader_assign.shader_archive_name,
+        shader_assign.shading_model_name,
+        [(name, str(value)) for name, value in shader_assign.shaderoptions.items()],
+        [(name, str(value)) for name, value in shader_assign.sampler_assigns.items()],
+        [(name, param.type.name, tuple(param.data)) for name, param in fmat.renderinfos.items()],
+        [(name, param.type.name, param.data_offs) for name, param in fmat.shaderparams.items()],
+        bytes(fmat.shaderparamdata or b"").hex(),
+        [(name, tuple(sampler.tex_sampler.values)) for name, sampler in fmat.samplers.items()],
+        [ref.name for ref in fmat.texture_refs],
+        [(sampler, tex_name, image.name) for sampler, tex_name, image in bound],
+    )
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def expand_custom_properties(mat: bpy.types.Material) -> bool:
+    """Replace the compact properties of a material with a custom property for every parameter.
+
+    Return whether the material had compact properties.
+    """
+    compact = mat.get(COMPACT_PROPERTY)
+    if compact is None:
+        return False
+    data = json.loads(compact)
+    del mat[COMPACT_PROPERTY]
+    _set_custom_properties(mat, data["properties"], data["ui"])
+    return True
+
+
+def _bound_textures(fmat: Material, texture_dict, name_prefix) -> list[tuple[str, str, bpy.types.Image]]:
+    """The `(sampler name, texture name, image)` of every sampler that has an image."""
+    bound = []
     i = 0
     # TODO: debug to see why removing tex_sampler breaks this
-    for sampler, tex_sampler in fmat.samplers.items():
+    for sampler in fmat.samplers:
         tex_name = fmat.texture_refs[i].name
-        if tex_name in texture_dict:
-            image = texture_dict[tex_name]
-        else:
+        # Only the textures that are bound get decoded
+        image = texture_dict.get(tex_name)
+        if image is None:
             image = bpy.data.images.get(name_prefix + tex_name) or bpy.data.images.get(tex_name)
 
         if image is None:
@@ -55,52 +173,99 @@ def import_material(fmat: Material, texture_dict, name_prefix) -> bpy.types.Mate
 
         tex_sampler_name = fmat.shader_assign.sampler_assigns.key_from_value(ResString(sampler))
         i += 1
+        bound.append((tex_sampler_name, tex_name, image))
+    return bound
+
+
+def _uses_mapping(fmat: Material, props: dict) -> bool:
+    return bool(props.get("MP_tex_mtx0_mode") and fmat.shaderparams["tex_mtx0"].data)
+
+
+def _template_key(fmat: Material, props: dict, bound: list, hoian: dict) -> tuple:
+    """Everything the node tree of a material depends on, materials with the same key only differ in values."""
+    samplers = tuple(
+        (name, props.get("SO_texcoord_select_" + TEXCOORD_SELECT[name]) if name in TEXCOORD_SELECT else None)
+        for name, _, _ in bound
+    )
+    return (
+        fmat.shader_assign.shader_archive_name,
+        fmat.shader_assign.shading_model_name,
+        samplers,
+        _uses_mapping(fmat, props),
+        tuple(hoian),
+        props.get("SO_emission_color_type") == "1",
+    )
 
+
+def _build_nodes(mat: bpy.types.Material, fmat: Material, props: dict, bound: list, ui_keys) -> MaterialTemplate:
+    """Create the node tree of a material with the bound textures, the values are set by `_set_values`."""
+    mat.use_nodes = True
+    mat_wrap = PrincipledBSDFWrapper(mat, is_readonly=False)
+    image_nodes = []
+    mappingnode = None
+    uses_mapping = _uses_mapping(fmat, props)
+    for i, (tex_sampler_name, _, image) in enumerate(bound):
         # Get the bpy Texture Wrapper from the sampler name
         tex_helper_name = TEX_WRAPPER.get(tex_sampler_name)
         if tex_helper_name:
             tex_helper: ShaderImageTextureWrapper = getattr(mat_wrap, tex_helper_name)
             tex_helper.image = image
+            image_nodes.append((tex_helper.node_image.name, i, False))
         else:
             # Add the texture as a node not connected to anything if no samplers match
             tex_node = mat.node_tree.nodes.new(type="ShaderNodeTexImage")
-            log.warning("Unused texture: %s", tex_name)
             tex_node.location = mathutils.Vector(mat_wrap._grid_to_location(1, -2))
-            tex_node.label = f"{tex_sampler_name} {tex_name}"
-            tex_node.image = image
+            image_nodes.append((tex_node.name, i, True))
             set_uv_coords(mat, tex_sampler_name, tex_node)
             continue
 
         # Mapping
-        if mat.get("MP_tex_mtx0_mode") and fmat.shaderparams["tex_mtx0"].data:
+        if uses_mapping:
             if mappingnode is None:
-                loc = mat["MP_tex_mtx0_translation"]
-                tex_helper.translation = mathutils.Vector((loc[0], loc[1], 0))
-
-                rot = mat["MP_tex_mtx0_rotation"]
-                tex_helper.rotation = mathutils.Vector((0, 0, rot))
-
-                scale = mat["MP_tex_mtx0_scaling"]
-                scalemode = mat["MP_tex_mtx0_mode"]
-                # XXX: Needs improvement
-                match scalemode:
-                    case "MODE_MAYA":
-                        scalevec = (1 / scale[0], 1 / scale[1], 1)
-                    case _:
-                        scalevec = (scale[0], scale[1], 1)
-                tex_helper.scale = mathutils.Vector(scalevec)
-
                 mappingnode = tex_helper.node_mapping
             else:
                 mat.node_tree.links.new(mappingnode.outputs["Vector"], tex_helper.node_image.inputs["Vector"])
 
         set_uv_coords(mat, tex_sampler_name, tex_helper.node_image)
 
-    match fmat.shader_assign.shader_archive_name:
-        case "Hoian_UBER":
-            __shader_hoian(mat, mat_wrap)
+    # Splatoon 3 materials can use the base color as emission
+    if fmat.shader_assign.shader_archive_name == "Hoian_UBER" and props.get("SO_emission_color_type") == "1":
+        base_color = next((i for i, (name, _, _) in enumerate(bound) if name == "_a0"), -1)
+        mat_wrap.emission_color_texture.image = mat_wrap.base_color_texture.image
+        image_nodes.append((mat_wrap.emission_color_texture.node_image.name, base_color, False))
 
-    return mat
+    return MaterialTemplate(mat, image_nodes, mappingnode.name if mappingnode is not None else None, ui_keys)
+
+
+def _set_values(mat: bpy.types.Material, template: MaterialTemplate, props: dict, bound: list, hoian: dict):
+    """Set the images and the values that come from parameters on the node tree made by `_build_nodes`."""
+    nodes = mat.node_tree.nodes
+    for node_name, i, labelled in template.image_nodes:
+        node = nodes[node_name]
+        node.image = bound[i][2] if i >= 0 else None
+        if labelled:
+            tex_sampler_name, tex_name, _ = bound[i]
+            log.warning("Unused texture: %s", tex_name)
+            node.label = f"{tex_sampler_name} {tex_name}"
+
+    if template.mapping_node is not None:
+        mapping = nodes[template.mapping_node]
+        loc = props["MP_tex_mtx0_translation"]
+        mapping.inputs["Location"].default_value = (loc[0], loc[1], 0)
+        mapping.inputs["Rotation"].default_value = (0, 0, props["MP_tex_mtx0_rotation"])
+
+        scale = props["MP_tex_mtx0_scaling"]
+        # XXX: Needs improvement
+        match props["MP_tex_mtx0_mode"]:
+            case "MODE_MAYA":
+                mapping.inputs["Scale"].default_value = (1 / scale[0], 1 / scale[1], 1)
+            case _:
+                mapping.inputs["Scale"].default_value = (scale[0], scale[1], 1)
+
+    if hoian:
+        mat_wrap = PrincipledBSDFWrapper(mat, is_readonly=False)
+        for name, value in hoian.items():
+            setattr(mat_wrap, name, value)
 
 
 def set_uv_coords(mat: bpy.types.Material, sampler: str, tex_node: bpy.types.ShaderNodeTexImage):
@@ -118,70 +283,81 @@ def set_uv_coords(mat: bpy.types.Material, sampler: str, tex_node: bpy.types.Sha
         tree.links.new(socket_src, tex_node.inputs["Vector"])
 
 
-def __add_custom_properties(fmat, mat: bpy.types.Material):
-    """Add render/shader/material parameters and sampler list
-    as custom properties on the Blender material object.
+def _custom_properties(fmat) -> tuple[dict, dict[str, dict]]:
+    """Render/shader/material parameters and the sampler list, to add as custom properties on the Blender material.
+
+    Return the properties and the UI data of the ones that have it.
     """
+    props = {}
+    ui = {}
     # Make Render Info
     for name, param in fmat.renderinfos.items():
         val = param.data
         if len(param.data) == 1:
             val = val[0]
-        mat["RI_" + name] = val
+        props["RI_" + name] = val
 
     # Make Material Params
     for name, param in fmat.shaderparams.items():
         pname = "MP_" + name
         if param.type.name in {"TEX_SRT", "TEX_SRT_EX", "SRT2D", "SRT3D"}:
             if param.type.name in {"TEX_SRT", "TEX_SRT_EX"}:
-                mat[pname + "_mode"] = param.data.mode.name
-            mat[pname + "_scaling"] = param.data.scaling
-            mat[pname + "_rotation"] = param.data.rotation
-            mat[pname + "_translation"] = param.data.translation
-
-            propman = mat.id_properties_ui(pname + "_scaling")
-            propman.update(subtype="XYZ")
-            propman = mat.id_properties_ui(pname + "_rotation")
-            if param.type.name == "SRT3D":
-                propman.update(subtype="EULER")
-            else:
-                propman.update(subtype="ANGLE")
-            propman = mat.id_properties_ui(pname + "_translation")
-            propman.update(subtype="XYZ")
+                props[pname + "_mode"] = param.data.mode.name
+            props[pname + "_scaling"] = param.data.scaling
+            props[pname + "_rotation"] = param.data.rotation
+            props[pname + "_translation"] = param.data.translation
+
+            ui[pname + "_scaling"] = {"subtype": "XYZ"}
+            ui[pname + "_rotation"] = {"subtype": "EULER" if param.type.name == "SRT3D" else "ANGLE"}
+            ui[pname + "_translation"] = {"subtype": "XYZ"}
         else:
-            mat[pname] = param.data
+            props[pname] = param.data
             if param.type.name == "FLOAT4":
-                propman = mat.id_properties_ui(pname)
-                propman.update(subtype="COLOR_GAMMA", min=0, max=1, step=0.01)
+                ui[pname] = {"subtype": "COLOR_GAMMA", "min": 0, "max": 1, "step": 0.01}
 
     for name, val in fmat.shader_assign.shaderoptions.items():
-        mat["SO_" + name] = str(val)
+        props["SO_" + name] = str(val)
 
-    mat["samplers"] = {key: str(value) for key, value in fmat.shader_assign.sampler_assigns.items()}
+    props["samplers"] = {key: str(value) for key, value in fmat.shader_assign.sampler_assigns.items()}
+    return props, ui
 
 
-def __shader_hoian(mat, mat_wrap: PrincipledBSDFWrapper):
-    # Small changes for Splatoon 3 shaders
-    if mat.get("SO_enable_albedo_tex") == "false":
-        mat_wrap.base_color = mat["MP_albedo_color"][:3]
+def _compact_properties(props: dict, ui: dict[str, dict]) -> tuple[dict, dict[str, dict]]:
+    """Keep the properties the node setup reads, and put the others with their UI data in one JSON property."""
+    eager = {name: value for name, value in props.items() if name.startswith(NODE_PROPERTIES)}
+    others = {name: value for name, value in props.items() if name not in eager}
+    # Reserved parameters are bytes, stored as lists of ints
+    compact = json.dumps({"properties": others, "ui": {name: ui[name] for name in others if name in ui}}, default=list)
+    return {**eager, COMPACT_PROPERTY: compact}, {name: data for name, data in ui.items() if name in eager}
 
-    if mat.get("SO_enable_roughness_map") != "true":
-        mat_wrap.roughness = mat["MP_roughness"]
 
-    if mat.get("SO_enable_metalness_map") != "true":
-        mat_wrap.metallic = mat["MP_metalness"]
+def _set_custom_properties(mat: bpy.types.Material, props: dict, ui: dict[str, dict]):
+    mat.update(props)
+    for name, data in ui.items():
+        mat.id_properties_ui(name).update(**data)
 
-    if mat.get("SO_enable_opacity_tex") != "true":
-        mat_wrap.alpha = mat["MP_opacity"]
 
-    if mat.get("SO_enable_emission_map") != "true":
-        mat_wrap.emission_color = mat["MP_emission_color"][:3]
+def _hoian_values(props: dict) -> dict:
+    """The values of the Principled BSDF of a Splatoon 3 material, by `PrincipledBSDFWrapper` property."""
+    values = {}
+    if props.get("SO_enable_albedo_tex") == "false":
+        values["base_color"] = props["MP_albedo_color"][:3]
 
-    if mat.get("SO_emission_color_type") == "1":
-        mat_wrap.emission_color_texture.image = mat_wrap.base_color_texture.image
+    if props.get("SO_enable_roughness_map") != "true":
+        values["roughness"] = props["MP_roughness"]
+
+    if props.get("SO_enable_metalness_map") != "true":
+        values["metallic"] = props["MP_metalness"]
+
+    if props.get("SO_enable_opacity_tex") != "true":
+        values["alpha"] = props["MP_opacity"]
+
+    if props.get("SO_enable_emission_map") != "true":
+        values["emission_color"] = props["MP_emission_color"][:3]
 
-    if mat.get("SO_enable_emission") == "true":
-        mat_wrap.emission_strength = mat["MP_emission_intensity"]
+    if props.get("SO_enable_emission") == "true":
+        values["emission_strength"] = props["MP_emission_intensity"]
     else:
         # for blender 3.6
-        mat_wrap.emission_strength = 0.0
+        values["emission_strength"] = 0.0
+    return values
@@ -0,0 +1,484 @@
+"""Decoding of shapes into NumPy arrays ready to be written to Blender, without Blender.
+
+`MeshLOD` is the raw decoded vertex attributes and indices of a LOD. `MeshData` is the same LOD in Blender's
+coordinate system, split into the arrays a Blender mesh is made of. `build_shape` makes the `MeshData` of the LODs
+of a shape that are imported, with an `AttributeCache` to decode vertex buffers shared by several shapes once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .attribute import AttributeFormat
+from .bfrespy.gx2 import GX2PrimitiveType
+from .exceptions import MalformedFileError
+
+if TYPE_CHECKING:
+    from .timing import StageTimings
+
+log = logging.getLogger(__name__)
+
+PRIMITIVE_TYPES = {
+    GX2PrimitiveType.POINTS: (1, 1, ()),
+    GX2PrimitiveType.LINES: (2, 2, (0, 1)),
+    GX2PrimitiveType.LINE_STRIP: (2, 1, (0, 1)),
+    GX2PrimitiveType.LINES_ADJACENCY: (4, 4, (1, 2)),
+    GX2PrimitiveType.LINE_STRIP_ADJACENCY: (4, 1, (1, 2)),
+    GX2PrimitiveType.TRIANGLES: (3, 3, (0, 1, 2)),
+    GX2PrimitiveType.TRIANGLE_STRIP: (3, 1, (0, 1, 2)),
+    GX2PrimitiveType.TRIANGLES_ADJACENCY: (6, 6, (0, 2, 4)),
+    GX2PrimitiveType.TRIANGLE_STRIP_ADJACENCY: (6, 2, (0, 2, 4)),
+}
+"""`(indices per primitive, indices to the next primitive, corners)` of the primitive types.
+
+The corners are the indices of a primitive that make the triangle or line, adjacency primitives have more.
+"""
+
+PRIMITIVE_RESTART = 0xFFFFFFFF
+"""The index that ends a strip in compacted indices, see `compact_indices`."""
+
+
+@dataclass
+class MeshLOD:
+    """The decoded vertex attributes and indices of one LOD of a shape.
+
+    Only the vertices the LOD's indices reference are decoded, and the indices are remapped to them.
+    """
+
+    lod_index: int
+    attributes: dict[str, np.ndarray]
+    indices: np.ndarray
+    """The remapped indices, with `PRIMITIVE_RESTART` where a strip ends."""
+    vertices: np.ndarray
+    """The decoded vertices, as indices from the first vertex of the LOD."""
+
+
+@dataclass
+class MeshData:
+    """One LOD of a shape in Blender's coordinate system.
+
+    Every per vertex array has one row per vertex, and `faces` and `edges` hold rows of vertex indices.
+    """
+
+    name: str
+    positions: np.ndarray
+    faces: np.ndarray
+    edges: np.ndarray
+    """Loose edges, of line primitives."""
+    normals: np.ndarray | None
+    uv_maps: dict[str, np.ndarray]
+    """UV coordinates by attribute name, with V already flipped."""
+    colors: np.ndarray | None
+    vertex_groups: list[str]
+    weights: list[tuple[int, np.ndarray, float]]
+    """`(group index, vertex indices, weight)` in the order they have to be assigned, later ones replace earlier."""
+    signature: str = ""
+    """A hash of everything but the name, equal for LODs that make identical Blender meshes, see `mesh_signature`."""
+
+
+class AttributeCache:
+    """The decoded vertex attributes of the vertex buffers of one model that several shapes use.
+
+    A vertex buffer is identified by the shape's `vtx_buff_idx` into `Model.vtx_buffers`. A shared buffer is decoded
+    whole the first time, and every shape and LOD takes its vertices from it, whatever its first vertex. Buffers only
+    one shape uses are decoded as usual. Hits and misses are counted in `timings`.
+    """
+
+    def __init__(self, fmdl, timings: StageTimings | None = None):
+        self.users = Counter(fshp.vtx_buff_idx for fshp in fmdl.shapes.values())
+        """The number of shapes using every vertex buffer."""
+        self.timings = timings
+        self.entries: dict[int, dict[str, np.ndarray]] = {}
+
+    def get(self, fshp, first_vtx: int, vertices: np.ndarray) -> dict[str, np.ndarray]:
+        """The attributes of the sorted `vertices` of a shape, counted from `first_vtx`."""
+        if self.users[fshp.vtx_buff_idx] < 2:
+            return get_vtx_attributes(fshp.vtx_buffer, first_vtx, vertices)
+        attributes = self.entries.get(fshp.vtx_buff_idx)
+        if attributes is None:
+            attributes = self.entries[fshp.vtx_buff_idx] = get_vtx_attributes(fshp.vtx_buffer, 0)
+            self._count("attribute cache misses")
+        else:
+            self._count("attribute cache hits")
+        rows = vertices.astype(np.int64) + first_vtx
+        return {name: data[rows] for name, data in attributes.items()}
+
+    def _count(self, name: str):
+        if self.timings is not None:
+            self.timings.count(name)
+
+
+def decode_lod(fshp, lod_idx: int, cache: AttributeCache | None = None) -> MeshLOD:
+    """Decode the LOD `lod_idx` of a shape, or its last LOD if it has fewer."""
+    lod_idx = min(lod_idx, len(fshp.meshes) - 1)
+    mesh = fshp.meshes[lod_idx]
+    num_vtx = max(fshp.vtx_buffer.vtx_count - mesh.first_vtx, 0)
+    vertices, indices = compact_indices(get_face_indices(mesh), num_vtx, restart_index(mesh))
+    if cache is None:
+        attributes = get_vtx_attributes(fshp.vtx_buffer, mesh.first_vtx, vertices)
+    else:
+        attributes = cache.get(fshp, mesh.first_vtx, vertices)
+    return MeshLOD(lod_idx, attributes, indices, vertices)
+
+
+def compact_indices(indices: np.ndarray, num_vtx: int, restart: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """The sorted vertices an index buffer references, and the indices remapped to positions in them.
+
+    The `restart` index is left out of the vertices, and is `PRIMITIVE_RESTART` in the remapped indices.
+    """
+    if restart is None:
+        used = indices
+    else:
+        restarts = indices == restart
+        used = indices[~restarts]
+    if used.size and (used.max() >= num_vtx or used.min() < 0):
+        raise MalformedFileError("LOD submesh faces are out of bounds")
+    vertices, remapped = np.unique(used, return_inverse=True)
+    if restart is None:
+        return vertices, remapped.astype(np.uint32)
+    result = np.full(len(indices), PRIMITIVE_RESTART, dtype=np.uint32)
+    result[~restarts] = remapped
+    return vertices, result
+
+
+def restart_index(lod_mesh) -> int | None:
+    """The index that restarts the strips of a LOD, the largest one of the index format. Lists can't restart."""
+    window, step, _ = PRIMITIVE_TYPES.get(lod_mesh.primitive_type, (1, 1, ()))
+    if step >= window:
+        return None
+    return 0xFFFF if lod_mesh.index_format.name.startswith("UINT16") else 0xFFFFFFFF
+
+
+def get_vtx_attributes(fvtx, first_vtx: int, vertices: np.ndarray | None = None) -> dict[str, np.ndarray]:
+    """Decode the vertex attributes from `first_vtx` to the end of the buffer, or only `vertices` of them."""
+    attributes = {}
+    num_vtx = max(fvtx.vtx_count - first_vtx, 0)
+
+    for attribute in fvtx.attributes.values():
+        buffer = fvtx.buffers[attribute.buffer_idx]
+        fmt = AttributeFormat(attribute.format_.value)
+
+        data = _read_attribute(buffer, fmt, first_vtx, num_vtx, attribute.name, vertices)
+        if fmt.func:
+            data = fmt.func(data)
+
+        # Check if normalized
+        elif fmt.AttribType.INTEGER not in fmt.flags and fmt.AttribType.SCALED not in fmt.flags:  # SNORM
+            if fmt.AttribType.SIGNED in fmt.flags:
+                data = np.where(data == fmt.min, -1, np.divide(data, fmt.max))
+            # UNORM
+            else:
+                data = np.divide(data, fmt.max)
+
+        attributes[attribute.name] = data
+    return attributes
+
+
+def _read_attribute(
+    buffer, fmt: AttributeFormat, first_vtx: int, num_vtx: int, name: str, vertices: np.ndarray | None = None
+) -> np.ndarray:
+    """Read `num_vtx` vertices of an attribute straight from the buffer view as a `(num_vtx, components)` array.
+
+    With the sorted `vertices`, only those rows are read.
+    """
+    if vertices is not None:
+        num_vtx = int(vertices[-1]) + 1 if len(vertices) else 0
+    view = buffer.data[0]
+    offset = first_vtx * buffer.stride
+    size = fmt.count * fmt.dtype.itemsize
+    if num_vtx > 0 and offset + (num_vtx - 1) * buffer.stride + size > len(view):
+        bad_vtx = max(0, (len(view) - offset - size) // buffer.stride + 1) if buffer.stride else 0
+        message = f"Vertex {bad_vtx} reading out of bounds for attribute '{name}'"
+        raise MalformedFileError(message)
+
+    result_type = np.float64 if fmt.dtype.kind == "f" else np.int64
+    if num_vtx == 0:
+        return np.empty((0, fmt.count), dtype=result_type)
+    data = np.ndarray(
+        (num_vtx, fmt.count),
+        dtype=fmt.dtype,
+        buffer=view,
+        offset=offset,
+        strides=(buffer.stride, fmt.dtype.itemsize),
+    )
+    if vertices is not None:
+        data = data[vertices]
+    return data.astype(result_type)
+
+
+def get_face_indices(lod_mesh) -> np.ndarray:
+    idx_buff = lod_mesh.index_buffer.data[0]
+    match lod_mesh.index_format.name:
+        case "UINT16_LITTLE_ENDIAN":
+            indices = np.frombuffer(idx_buff, dtype="<H")
+        case "UINT32_LITTLE_ENDIAN":
+            indices = np.frombuffer(idx_buff, dtype="<I")
+        case _:
+            raise ValueError("Invalid index buffer value %s", lod_mesh.index_format.name)
+    return indices
+
+
+def build_shape(
+    fmdl, fshp, rest: np.ndarray, lod_idx: int, all_lods=False, cache: AttributeCache | None = None
+) -> list[MeshData]:
+    """The LOD `lod_idx` of a shape in Blender's coordinate system, or all its LODs with `all_lods`."""
+    if all_lods:
+        lods = build_all_lods(fmdl, fshp, rest, cache)
+    else:
+        lods = [build_mesh_data(fmdl, fshp, decode_lod(fshp, lod_idx, cache), rest)]
+    return [replace(data, signature=mesh_signature(data)) for data in lods]
+
+
+def mesh_signature(data: MeshData) -> str:
+    """A hash of the geometry, attributes and weights of mesh data, the same shape in two files has the same one."""
+    digest = hashlib.blake2b(digest_size=16)
+    arrays = [data.positions, data.faces, data.edges, data.normals, data.colors, *data.uv_maps.values()]
+    for array in arrays:
+        if array is None:
+            digest.update(b"-")
+            continue
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(np.ascontiguousarray(array).data)
+    digest.update(repr((list(data.uv_maps), data.vertex_groups)).encode())
+    for group, vertices, weight in data.weights:
+        digest.update(repr((group, weight, len(vertices))).encode())
+        digest.update(np.ascontiguousarray(vertices, dtype=np.int64).data)
+    return digest.hexdigest()
+
+
+def build_all_lods(fmdl, fshp, rest: np.ndarray, cache: AttributeCache | None = None) -> list[MeshData]:
+    """Every LOD of a shape, from one decode of the vertices any of them reference.
+
+    The LODs are named after the shape with a `_LOD<index>` suffix.
+    """
+    if not fshp.meshes:
+        return []
+    lod_indices = []
+    for mesh in fshp.meshes:
+        # Indices from the start of the vertex buffer, with -1 where a strip restarts
+        raw = get_face_indices(mesh)
+        indices = raw.astype(np.int64) + mesh.first_vtx
+        if (restart := restart_index(mesh)) is not None:
+            indices[raw == restart] = -1
+        lod_indices.append(indices)
+    vertices, shared_indices = compact_indices(np.concatenate(lod_indices), fshp.vtx_buffer.vtx_count, -1)
+    if cache is None:
+        attributes = get_vtx_attributes(fshp.vtx_buffer, 0, vertices)
+    else:
+        attributes = cache.get(fshp, 0, vertices)
+    shared = vertex_data(fmdl, fshp, attributes, rest)
+
+    result = []
+    splits = np.cumsum([len(indices) for indices in lod_indices])[:-1]
+    for lod_idx, (mesh, indices) in enumerate(zip(fshp.meshes, np.split(shared_indices, splits))):
+        rows, indices = compact_indices(indices, len(vertices), PRIMITIVE_RESTART)
+        faces, edges = _assemble_elements(mesh.primitive_type, indices, len(rows))
+        result.append(_vertex_subset(shared, rows, faces, edges, f"{fshp.name}_LOD{lod_idx}"))
+    return result
+
+
+def build_mesh_data(fmdl, fshp, lod: MeshLOD, rest: np.ndarray) -> MeshData:
+    """Transform a decoded LOD into Blender's coordinate system.
+
+    `rest` are the bone rest matrices of the model's skeleton, see `skeleton_data.rest_matrices`.
+    """
+    mesh = fshp.meshes[lod.lod_index]
+    log.debug("LOD has %d vtxs, %d idxs", len(lod.vertices), len(lod.indices))
+    data = vertex_data(fmdl, fshp, lod.attributes, rest)
+    faces, edges = _assemble_elements(mesh.primitive_type, lod.indices, len(data.positions))
+    return replace(data, faces=faces, edges=edges)
+
+
+def vertex_data(fmdl, fshp, attributes: dict[str, np.ndarray], rest: np.ndarray) -> MeshData:
+    """Transform decoded vertex attributes into Blender's coordinate system, as mesh data without faces or edges."""
+    positions = attributes["_p0"][:, 0:3]
+    normals = attributes["_n0"][:, 0:3] if "_n0" in attributes else None
+    match fshp.vtx_skin_count:
+        case 0:
+            matrices = rest[fshp.bone_idx][np.newaxis]
+        case 1:
+            matrices = rest[fmdl.skeleton.mtx_to_bone[attributes["_i0"][:, 0]]]
+        case _:
+            matrices = None
+
+    if matrices is None:
+        positions = positions[:, [0, 2, 1]] * (1, -1, 1)
+        if normals is not None:
+            normals = normals[:, [0, 2, 1]] * (1, -1, 1)
+    else:
+        positions = np.matmul(matrices[:, :3, :3], positions[:, :, np.newaxis])[:, :, 0] + matrices[:, :3, 3]
+        if normals is not None:
+            normals = np.matmul(rotation_parts(matrices), normals[:, :, np.newaxis])[:, :, 0]
+
+    uv_maps = {}
+    for name, uvs in attributes.items():
+        if len(name) != 3 or name[:2] != "_u":
+            continue
+        uv_maps[name] = np.column_stack((uvs[:, 0], 1 - uvs[:, 1]))
+
+    colors = None
+    if "_c0" in attributes:
+        colors = np.ones((len(positions), 4), dtype=np.float32)
+        colors[:, : attributes["_c0"].shape[1]] = attributes["_c0"][:, :4]
+
+    vertex_groups, weights = _vertex_weights(fmdl, fshp, attributes)
+    return MeshData(
+        name=fshp.name,
+        positions=positions.astype(np.float32),
+        faces=np.empty((0, 3), dtype=np.int32),
+        edges=np.empty((0, 2), dtype=np.int32),
+        normals=None if normals is None else normals.astype(np.float32),
+        uv_maps=uv_maps,
+        colors=colors,
+        vertex_groups=vertex_groups,
+        weights=weights,
+    )
+
+
+def rotation_parts(matrices: np.ndarray) -> np.ndarray:
+    """The `(n, 3, 3)` rotations of `(n, 4, 4)` matrices without their scale, like `Matrix.decompose()` returns.
+
+    A negative scale is taken out too, like Blender does by negating the rotation of mirrored matrices.
+    """
+    rotations = matrices[:, :3, :3]
+    lengths = np.linalg.norm(rotations, axis=1, keepdims=True)
+    rotations = rotations / np.where(lengths > 1e-12, lengths, 1)
+    return np.where(np.linalg.det(rotations)[:, np.newaxis, np.newaxis] < 0, -rotations, rotations)
+
+
+def _vertex_subset(data: MeshData, rows: np.ndarray, faces: np.ndarray, edges: np.ndarray, name: str) -> MeshData:
+    """The sorted vertices `rows` of mesh data, with `faces` and `edges` indexing them."""
+    new_index = np.full(len(data.positions), -1, dtype=np.int64)
+    new_index[rows] = np.arange(len(rows))
+    weights = []
+    for group, vertices, weight in data.weights:
+        vertices = new_index[vertices]
+        vertices = vertices[vertices >= 0]
+        if len(vertices):
+            weights.append((group, vertices, weight))
+    return MeshData(
+        name=name,
+        positions=data.positions[rows],
+        faces=faces,
+        edges=edges,
+        normals=None if data.normals is None else data.normals[rows],
+        uv_maps={uv_name: uvs[rows] for uv_name, uvs in data.uv_maps.items()},
+        colors=None if data.colors is None else data.colors[rows],
+        vertex_groups=data.vertex_groups,
+        weights=weights,
+    )
+
+
+def assemble_primitives(primitive_type, indices: np.ndarray) -> np.ndarray:
+    """The corners of the primitives an index buffer draws, one row of 3 per triangle or 2 per line.
+
+    Strips end at `PRIMITIVE_RESTART`, and every other triangle of a strip has its first two corners swapped to keep
+    the winding the same. Of adjacency primitives, only the corners of the triangle or line itself are kept.
+    """
+    if primitive_type not in PRIMITIVE_TYPES:
+        raise MalformedFileError(f"Unsupported primitive type {primitive_type!r}")
+    window, step, corners = PRIMITIVE_TYPES[primitive_type]
+    indices = np.asarray(indices, dtype=np.int64)
+    if not corners or len(indices) < window:
+        return np.empty((0, len(corners)), dtype=np.int64)
+
+    positions = np.arange(len(indices))
+    restarts = indices == PRIMITIVE_RESTART
+    # The first index of the strip every index is in, and the number of restarts before it.
+    strip_start = np.maximum.accumulate(np.where(restarts, positions + 1, 0))
+    restarts_before = np.concatenate(([0], np.cumsum(restarts)))
+
+    starts = positions[: len(indices) - window + 1]
+    offsets = starts - strip_start[starts]
+    # Primitives start every `step` indices from the start of their strip, and don't span a restart.
+    keep = (offsets % step == 0) & (restarts_before[starts + window] == restarts_before[starts])
+    starts = starts[keep]
+    result = indices[starts[:, np.newaxis] + np.asarray(corners)]
+    if len(corners) == 3 and step < window:
+        odd = (offsets[keep] // step) % 2 == 1
+        result[odd, :2] = result[odd, 1::-1]
+    return result
+
+
+def _assemble_elements(primitive_type, indices: np.ndarray, num_vtx: int) -> tuple[np.ndarray, np.ndarray]:
+    """The faces and loose edges of a LOD, leaving out degenerate and repeated ones like bmesh does."""
+    primitives = assemble_primitives(primitive_type, indices)
+    faces = np.empty((0, 3), dtype=np.int32)
+    edges = np.empty((0, 2), dtype=np.int32)
+    if primitives.shape[1] < 2:
+        return faces, edges
+    if primitives.size and primitives.max() >= num_vtx:
+        raise MalformedFileError("LOD submesh faces are out of bounds")
+
+    ordered = np.sort(primitives, axis=1)
+    degenerate = np.any(ordered[:, 1:] == ordered[:, :-1], axis=1)
+    ordered = ordered[~degenerate]
+    if num_vtx ** ordered.shape[1] < 2**63:
+        # Repeats are much faster to find in one number per primitive than in rows.
+        keys = ordered[:, 0].astype(np.int64)
+        for column in ordered.T[1:]:
+            keys = keys * num_vtx + column
+        _, first = np.unique(keys, return_index=True)
+    else:
+        _, first = np.unique(ordered, axis=0, return_index=True)
+    keep = np.flatnonzero(~degenerate)[np.sort(first)]
+    primitives = primitives[keep].astype(np.int32)
+    if primitives.shape[1] == 3:
+        return primitives, edges
+    return faces, primitives
+
+
+def _vertex_weights(fmdl, fshp, attributes) -> tuple[list[str], list[tuple[int, np.ndarray, float]]]:
+    """The vertex group names and weight assignments of a shape."""
+    skeleton = fmdl.skeleton
+    names = [bone.name for bone in skeleton.bones.values()]
+    num_vtx = len(attributes["_p0"])
+
+    # no i0 or w0, mesh is parented to the bone_idx
+    if fshp.vtx_skin_count == 0:
+        return [names[fshp.bone_idx]], [(0, np.arange(num_vtx), 1.0)]
+
+    # A group for every bone, found by its smooth or rigid matrix index
+    lookup = _matrix_groups(skeleton, int(attributes["_i0"].max(initial=0)) + 1)
+
+    if fshp.vtx_skin_count == 1:
+        # i0 specifies the bone rigid matrix group.
+        matrix_idxs, inverse = np.unique(attributes["_i0"][:, 0], return_inverse=True)
+        groups = lookup[matrix_idxs]
+        if np.any(groups < 0):
+            unknown = matrix_idxs[groups < 0].tolist()
+            raise MalformedFileError(f"Shape '{fshp.name}' uses unknown matrices {unknown}")
+        vtx_groups = groups[inverse]
+        return names, [(int(group), np.flatnonzero(vtx_groups == group), 1.0) for group in np.unique(vtx_groups)]
+
+    # Smooth skinning, bone index and weight
+    weights = []
+    for i in range(fshp.vtx_skin_count):
+        group_col = lookup[attributes["_i0"][:, i]]
+        weight_col = attributes["_w0"][:, i]
+        valid = np.flatnonzero((weight_col > 0) & (group_col >= 0))
+        order = valid[np.lexsort((weight_col[valid], group_col[valid]))]
+        if not len(order):
+            continue
+        changes = (np.diff(group_col[order]) != 0) | (np.diff(weight_col[order]) != 0)
+        for chunk in np.split(order, np.flatnonzero(changes) + 1):
+            weights.append((int(group_col[chunk[0]]), np.sort(chunk), float(weight_col[chunk[0]]) / 255.0))
+    return names, weights
+
+
+def _matrix_groups(skeleton, size: int) -> np.ndarray:
+    """The bone of every matrix index up to at least `size`, or -1. A later bone wins if two share a matrix."""
+    matrix_idxs = np.stack([skeleton.smooth_mtx_idx, skeleton.rigid_mtx_idx], axis=1).ravel().astype(np.int64)
+    bone_idxs = np.repeat(np.arange(len(skeleton.smooth_mtx_idx)), 2)
+    valid = matrix_idxs >= 0
+    # np.unique keeps the first of equal entries, so search from the last bone.
+    matrix_idxs, first = np.unique(matrix_idxs[valid][::-1], return_index=True)
+    lookup = np.full(max(size, int(matrix_idxs.max(initial=-1)) + 1), -1, dtype=np.int64)
+    lookup[matrix_idxs] = bone_idxs[valid][::-1][first]
+    return lookup
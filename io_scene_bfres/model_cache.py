@@ -0,0 +1,262 @@
+"""On-disk cache of loaded files, so importing an unchanged file again skips decompressing, parsing and decoding it.
+
+Every entry is three files named by its key:
+
+- `<key>.npz`: the NumPy arrays of the `ParsedFile`, uncompressed so they can be memory-mapped.
+- `<key>.pickle`: the rest of the `ParsedFile`, with references to the arrays in the `.npz`.
+- `<key>.json`: a small manifest with the source files the entry was made from, its size and when it was last used.
+
+Entries are keyed by the path, modification time, size and contents of the imported file, the loading options and
+the external string table it is loaded with. Files that were read alongside it, like linked texture files, are
+checked by modification time and size.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+import zipfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .loading import ImportOptions, ParsedFile
+
+log = logging.getLogger(__name__)
+
+CACHE_VERSION = 7
+"""Bumped whenever the layout of `ParsedFile` or anything in it changes, so old entries are never loaded."""
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+MIN_ARRAY_BYTES = 4096
+"""Arrays smaller than this are kept in the pickle, memory-mapping them isn't worth it."""
+
+
+class ModelCache:
+    """A directory of cached `ParsedFile`s, bounded by their total size on disk with least recently used eviction."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def get(self, path, options: ImportOptions, external_strings: dict[int, str] | None = None) -> ParsedFile | None:
+        """Load the cached result of loading `path` with `options` and `external_strings`.
+
+        Returns None if it isn't cached or is out of date.
+        """
+        path = Path(path)
+        try:
+            key = cache_key(path, options, external_strings)
+            manifest_path = self._path(key, ".json")
+            manifest = json.loads(manifest_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != CACHE_VERSION or not all(_unchanged(dep) for dep in manifest["dependencies"]):
+            log.debug("Cached '%s' is out of date", path)
+            self._remove(key)
+            return None
+
+        try:
+            arrays = _mmap_npz(self._path(key, ".npz"))
+            with open(self._path(key, ".pickle"), "rb") as f:
+                parsed = _ArrayUnpickler(f, arrays).load()
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            log.warning("Cached '%s' is unreadable, loading it again", path, exc_info=True)
+            self._remove(key)
+            return None
+
+        manifest["last_used"] = time.time()
+        _write_text(manifest_path, json.dumps(manifest))
+        log.info("Loaded '%s' from the model cache", path)
+        return parsed
+
+    def put(
+        self,
+        path,
+        options: ImportOptions,
+        parsed: ParsedFile,
+        sources: Iterable[Path] = (),
+        external_strings: dict[int, str] | None = None,
+    ):
+        """Store a loaded file. `sources` are the other files read to load it, the entry is invalid once they change.
+
+        The file must not hold views into the file data anymore, see `loading._detach_buffers`.
+        """
+        path = Path(path)
+        try:
+            key = cache_key(path, options, external_strings)
+            self.directory.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            log.warning("Could not cache '%s'", path, exc_info=True)
+            return
+        try:
+            arrays: dict[str, np.ndarray] = {}
+            with open(self._path(key, ".pickle.tmp"), "wb") as f:
+                _ArrayPickler(f, arrays).dump(parsed)
+            with open(self._path(key, ".npz.tmp"), "wb") as f:
+                np.savez(f, **arrays)
+            nbytes = sum(self._path(key, suffix + ".tmp").stat().st_size for suffix in (".pickle", ".npz"))
+            if nbytes > self.max_bytes:
+                log.debug("'%s' is too large to cache (%d bytes)", path, nbytes)
+                self._remove(key, ".tmp")
+                return
+
+            # A reader only trusts an entry once its manifest exists, so it is written last.
+            self._remove(key)
+            for suffix in (".pickle", ".npz"):
+                os.replace(self._path(key, suffix + ".tmp"), self._path(key, suffix))
+            manifest = {
+                "version": CACHE_VERSION,
+                "source": str(path),
+                "dependencies": [_stat(source) for source in {path, *sources}],
+                "nbytes": nbytes,
+                "last_used": time.time(),
+            }
+            _write_text(self._path(key, ".json"), json.dumps(manifest))
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            log.warning("Could not cache '%s'", path, exc_info=True)
+            self._remove(key, ".tmp")
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is within `max_bytes`."""
+        entries = []
+        for manifest_path in self.directory.glob("*.json"):
+            try:
+                manifest = json.loads(manifest_path.read_text())
+                entries.append((manifest["last_used"], manifest["nbytes"], manifest_path.stem))
+            except (OSError, ValueError, KeyError):
+                continue
+        entries.sort()
+        total = sum(nbytes for _, nbytes, _ in entries)
+        for _, nbytes, key in entries:
+            if total <= self.max_bytes:
+                break
+            log.debug("Evicting '%s' from the model cache", key)
+            self._remove(key)
+            total -= nbytes
+
+    def clear(self):
+        for manifest_path in self.directory.glob("*.json"):
+            self._remove(manifest_path.stem)
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / (key + suffix)
+
+    def _remove(self, key: str, extra_suffix=""):
+        for suffix in (".json", ".pickle", ".npz"):
+            try:
+                self._path(key, suffix + extra_suffix).unlink(missing_ok=True)
+            except OSError:
+                # Still memory-mapped by an earlier import on Windows, it is removed on a later eviction.
+                log.debug("Could not remove '%s%s'", key, suffix)
+
+
+def cache_key(path: Path, options: ImportOptions, external_strings: dict[int, str] | None = None) -> str:
+    """The key of a file loaded with `options` and `external_strings`, from its path, modification time, size and data.
+
+    Files parsed with a different string table get different names, so they are different entries.
+    """
+    stat = path.stat()
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    settings = {k: v for k, v in dataclasses.asdict(options).items() if k not in _IGNORED_OPTIONS}
+    strings = strings_digest(external_strings)
+    key = json.dumps(
+        [CACHE_VERSION, str(path.resolve()), stat.st_mtime_ns, stat.st_size, digest.hexdigest(), settings, strings]
+    )
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def strings_digest(external_strings: dict[int, str] | None) -> str:
+    """A digest of an external string table, empty if there is none."""
+    if not external_strings:
+        return ""
+    digest = hashlib.blake2b(digest_size=16)
+    for string_id, string in sorted(external_strings.items()):
+        digest.update(string_id.to_bytes(8, "little"))
+        digest.update(string.encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+_IGNORED_OPTIONS = {"texture_decode_workers", "texture_strip_height", "model_cache", "model_cache_size", "cache_dir"}
+"""Options that don't change what is loaded."""
+
+
+def _stat(path: Path) -> dict:
+    stat = path.stat()
+    return {"path": str(path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _unchanged(dependency: dict) -> bool:
+    try:
+        return _stat(Path(dependency["path"])) == dependency
+    except OSError:
+        return False
+
+
+def _write_text(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+class _ArrayPickler(pickle.Pickler):
+    """Pickles large arrays as references to entries of `arrays`, so they can be stored in the `.npz`."""
+
+    def __init__(self, file, arrays: dict[str, np.ndarray]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays = arrays
+
+    def persistent_id(self, obj):
+        if type(obj) is np.ndarray and not obj.dtype.hasobject and obj.nbytes >= MIN_ARRAY_BYTES:
+            name = f"a{len(self.arrays)}"
+            self.arrays[name] = obj
+            return name
+        return None
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, file, arrays: dict[str, np.ndarray]):
+        super().__init__(file)
+        self.arrays = arrays
+
+    def persistent_load(self, pid):
+        return self.arrays[pid]
+
+
+def _mmap_npz(path: Path) -> dict[str, np.ndarray]:
+    """Memory-map the arrays of an uncompressed `.npz` read only, instead of reading them like `np.load` does."""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"'{info.filename}' in {path} is compressed")
+            # The data follows the local file header, which has its own name and extra field lengths.
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename.removesuffix(".npy")
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            order = "F" if fortran_order else "C"
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape, order=order)
+    return arrays
@@ -1,8 +1,18 @@
+from __future__ import annotations
+
 import logging
+from typing import TYPE_CHECKING
+
+import bpy
 
 from .material_importer import import_material
-from .mesh_importer import import_mesh
-from .skeleton_importer import import_fskl
+from .mesh_data import build_shape
+from .mesh_importer import assign_material, import_mesh
+from .skeleton_data import rest_matrices
+from .skeleton_importer import import_fskls
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
 
 log = logging.getLogger(__name__)
 
@@ -11,25 +21,34 @@ class ModelImporter:
     def __init__(self, parent):
         self.operator = parent.operator
         self.texture_map = parent.texture_map
+        self.material_templates = parent.material_templates
+        self.material_registry = parent.material_registry
+        self.mesh_registry = parent.mesh_registry
+        self.fmdl = None
+        """The model, set when its armature is created by `import_armatures`."""
+        self.collection = None
+        self.fskl_ob = None
+        self.mesh_objects = []
+        """The `(fshp, object)` of every imported shape, one per LOD when importing all LODs."""
+        self.shape_count = 0
+        self.lod_collections = {}
+        """The LOD collections of the model by name, created as the first mesh of a LOD is imported."""
 
-    def convert_fmdl(self, fmdl, collection):
-        self.fskl_ob = import_fskl(fmdl, fmdl.skeleton, collection, self.operator.copy_bone_transforms)
-
-        # Import all Materials for this model
-        material_map = {}
-        for i, fmat in enumerate(fmdl.materials.values()):
-            log.info("Importing material %3d / %3d...", i + 1, len(fmdl.materials))
-            mat = import_material(fmat, self.texture_map, self.operator.name_prefix)
-            material_map[i] = mat
-
-        # Go through the polygons in this model and create mesh objects representing them.
-        for i, fshp in enumerate(fmdl.shapes.values()):
-            log.info("Importing shape %3d / %3d '%s'...", i + 1, len(fmdl.shapes), fshp.name)
-            mesh_object = import_mesh(fmdl, fshp, self.operator.lod_index, self.operator.custom_normals)
-            mesh_object.data.materials.append(material_map[fshp.material_idx])
+    def import_shape(self, fshp, lods=None):
+        """Create the mesh objects of a shape. `lods` are the LODs decoded while loading."""
+        self.shape_count += 1
+        log.info("Importing shape %3d / %3d '%s'...", self.shape_count, len(self.fmdl.shapes), fshp.name)
+        if lods is None:
+            rest = rest_matrices(self.fmdl.skeleton)
+            lods = build_shape(self.fmdl, fshp, rest, self.operator.lod_index, self.operator.all_lods)
+        for i, data in enumerate(lods):
+            mesh_object = import_mesh(
+                self.fmdl, fshp, self.operator.lod_index, self.operator.custom_normals, data, self.mesh_registry
+            )
+            self.mesh_objects.append((fshp, mesh_object))
 
             # Parent to the empty FMDL object and link it to the scene.
-            collection.objects.link(mesh_object)
+            self.lod_collection(i).objects.link(mesh_object)
             mesh_object.parent = self.fskl_ob
 
             # Add armature modifier
@@ -37,3 +56,58 @@ class ModelImporter:
             modifier.object = self.fskl_ob
             modifier.use_bone_envelopes = False
             modifier.use_vertex_groups = True
+
+    def lod_collection(self, lod_idx: int):
+        """The collection the meshes of a LOD are linked to, one per LOD inside the model's when importing all LODs."""
+        if not self.operator.all_lods:
+            return self.collection
+        name = f"{self.fmdl.name}_LOD{lod_idx}"
+        collection = self.lod_collections.get(name)
+        if collection is None:
+            collection = bpy.data.collections.new(name)
+            self.collection.children.link(collection)
+            self.lod_collections[name] = collection
+        return collection
+
+    def import_textures(self) -> Iterator[None]:
+        """Create the images of the textures the materials bind, yielding after every image."""
+        names = dict.fromkeys(ref.name for fmat in self.fmdl.materials.values() for ref in fmat.texture_refs)
+        for name in names:
+            self.texture_map.get(name)
+            yield
+
+    def import_materials(self) -> Iterator[None]:
+        """Create the materials of the model and assign them to the imported shapes, yielding after every material.
+
+        This is done last, so the textures the materials bind have been decoded.
+        """
+        for i, fmat in enumerate(self.fmdl.materials.values()):
+            log.info("Importing material %3d / %3d...", i + 1, len(self.fmdl.materials))
+            mat = import_material(
+                fmat,
+                self.texture_map,
+                self.operator.name_prefix,
+                self.material_templates,
+                self.operator.compact_material_properties,
+                self.material_registry,
+            )
+            for fshp, mesh_object in self.mesh_objects:
+                if fshp.material_idx == i:
+                    assign_material(mesh_object, mat)
+            yield
+
+
+def import_armatures(model_importers: list[ModelImporter], fmdls, collection, rest_matrices: dict):
+    """Create the armatures of the models of a file together, their shapes are parented to them as they are imported.
+
+    `rest_matrices` are the bone rest matrices computed while loading, by model name.
+    """
+    if not model_importers:
+        return
+    copy_bone_transforms = model_importers[0].operator.copy_bone_transforms
+    models = [(fmdl, collection, rest_matrices.get(fmdl.name)) for fmdl in fmdls]
+    for model_imp, fmdl, arm_obj in zip(model_importers, fmdls, import_fskls(models, copy_bone_transforms)):
+        model_imp.fmdl = fmdl
+        model_imp.collection = collection
+        model_imp.mesh_objects = []
+        model_imp.fskl_ob = arm_obj
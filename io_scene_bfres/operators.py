@@ -0,0 +1,376 @@
+# type: ignore[reportInvalidTypeForm]
+"""Blender operators and import panels."""
+
+import logging
+
+import bpy
+from bpy.props import (
+    BoolProperty,
+    CollectionProperty,
+    EnumProperty,
+    IntProperty,
+    StringProperty,
+)
+from bpy_extras.io_utils import ImportHelper
+
+log = logging.getLogger(__name__)
+
+TIMER_INTERVAL = 0.02
+"""Seconds between the ticks of a background import."""
+FRAME_BUDGET = 1 / 60
+"""Seconds of work a background import does per tick, so the interface keeps redrawing."""
+
+
+class ImportBFRES(bpy.types.Operator, ImportHelper):
+    """Load a BFRES model file"""
+
+    bl_idname = "import_scene.bfres"
+    bl_label = "Import NX BFRES"
+    bl_options = {"UNDO"}
+
+    filename_ext = ".bfres"
+
+    files: CollectionProperty(
+        name="File Path",
+        type=bpy.types.OperatorFileListElement,
+    )
+
+    filter_glob: StringProperty(
+        default="*.sbfres;*.bfres;*.fres;*.szs;*.zs",
+        options={"HIDDEN"},
+    )
+
+    ui_tab: EnumProperty(
+        items=(("MAIN", "Main", "Main basic settings"),),
+        name="ui_tab",
+        description="Import options categories",
+    )
+
+    import_tex_mode: EnumProperty(
+        name="Texture Import Mode",
+        items = (
+            ("EMBEDDED", "Embedded", "Import textures embedded in the model file."),
+            ("TEX_FILE", ".Tex File", "Imports from a .tex file in the same directory"),
+            ("TEX_FOLDER", "Tex Folder", "Imports from a tex folder in the parent directory"),
+            ("INDEX", "Asset Index", "Imports the textures from wherever the asset index found them"),
+            ),
+        description="How should textures be imported, different depending on the game.",
+        default="EMBEDDED",
+    )
+
+    asset_index: StringProperty(
+        name="Asset Index",
+        description="Asset index database built from the game files with `python -m io_scene_bfres.asset_index`",
+        subtype="FILE_PATH",
+        default="",
+    )
+
+    texture_strip_height: IntProperty(
+        name="Texture Strip Height",
+        description="Decode textures in strips of about this many rows to limit memory use. 0 decodes at once",
+        default=1024,
+        min=0,
+        max=16384,
+        subtype="PIXEL",
+    )
+
+    texture_decode_workers: IntProperty(
+        name="Texture Decode Processes",
+        description="Processes large textures are decoded on, for the whole import. 0 uses one per core, 1 disables it",
+        default=0,
+        min=0,
+        max=64,
+    )
+
+    texture_cache_size: IntProperty(
+        name="Decoded Texture Cache (MiB)",
+        description="Memory kept for decoded textures, so importing them again in this session is faster",
+        default=1024,
+        min=0,
+        max=65536,
+    )
+
+    copy_bone_transforms: BoolProperty(
+        name="Copy Bone Transforms",
+        description="Copies all bone transforms to the selected armature",
+        default=False,
+    )
+
+    component_selector: BoolProperty(
+        name="Use Component Selector",
+        description="Uses the component selector for each texture. Turn it on if the colours look off",
+        default=True,
+    )
+
+    custom_normals: BoolProperty(
+        name="Custom Normals",
+        description="Uses the n0 attribute of the model to compute the normals.",
+        default=True,
+    )
+
+    lod_index: IntProperty(
+        name="LOD index",
+        description="The index of the LOD to import. Lower is more detail.",
+        default=0,
+        min=0,
+        max=255,
+    )
+
+    reuse_meshes: EnumProperty(
+        name="Share Identical Meshes",
+        items=(
+            ("OFF", "Off", "Every shape gets its own mesh"),
+            ("FILE", "Within File", "Shapes of a file with identical geometry share one mesh"),
+            ("ALL", "With Earlier Imports", "Also share the meshes of files imported before"),
+        ),
+        description="Makes the objects of identical shapes linked duplicates of one mesh.",
+        default="FILE",
+    )
+
+    all_lods: BoolProperty(
+        name="Import All LODs",
+        description="Imports every LOD of the models into a collection per LOD, instead of only the LOD index.",
+        default=False,
+    )
+
+    name_prefix: StringProperty(
+        name="Material/Texture Name Prefix",
+        description="Text to prepend to material and texture names to keep them unique.",
+        maxlen=32,
+        default="",
+    )
+
+    reuse_materials: BoolProperty(
+        name="Reuse Identical Materials",
+        description=(
+            "Use the existing material for a material identical to one imported before, "
+            "with the same parameters and textures, instead of creating another one. "
+            "Materials edited since they were imported are reused too"
+        ),
+        default=False,
+    )
+
+    compact_material_properties: BoolProperty(
+        name="Compact Custom Properties",
+        description=(
+            "Store the parameters of every material in one custom property instead of one each. "
+            "They can be expanded from the Custom Properties panel of the material"
+        ),
+        default=False,
+    )
+
+    add_fake_user: BoolProperty(
+        name="Add Fake User",
+        description="Adds a fake user to images and actions to prevent them from being deleted on save.",
+        default=False,
+    )
+
+    background_import: BoolProperty(
+        name="Import in Background",
+        description="Keep Blender responsive while importing, with the progress in the status bar. Esc cancels",
+        default=True,
+    )
+
+    parallel_files: BoolProperty(
+        name="Load Files in Parallel",
+        description="Load multiple selected files on separate processes while the previous ones are being built",
+        default=True,
+    )
+
+    model_cache: BoolProperty(
+        name="Cache Loaded Files",
+        description="Keep the parsed and decoded data of imported files on disk, so importing them again is faster",
+        default=False,
+    )
+
+    model_cache_size: IntProperty(
+        name="Model Cache Size (MiB)",
+        description="Disk space kept for cached files, the least recently imported ones are removed first",
+        default=1024,
+        min=0,
+        max=1048576,
+    )
+
+    import_anims: BoolProperty(
+        name="Import base animation data",
+        description="Imports data and the first frame of the animations as actions.",
+        default=False,
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False  # No animation.
+
+        import_panel_textures(layout, self)
+        import_panel_mesh(layout, self)
+        import_panel_material(layout, self)
+        import_panel_misc(layout, self)
+
+    def execute(self, context):
+        import os
+
+        if self.files:
+            dirname = os.path.dirname(self.filepath)
+            paths = [os.path.join(dirname, file.name) for file in self.files]
+        else:
+            paths = [self.filepath]
+        if self.background_import and context.window is not None:
+            return self.start_background_import(context, paths)
+
+        from .importing import import_files, import_serial
+
+        if len(paths) > 1 and self.parallel_files:
+            return import_files(self, paths)
+        return import_serial(self, paths)
+
+    def start_background_import(self, context, paths):
+        from .importing import IncrementalImport
+
+        self._import = IncrementalImport(self, paths)
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(TIMER_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, 100)
+        context.workspace.status_text_set(self._import.status)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            self._import.cancel()
+            self.report({"WARNING"}, "Import cancelled, the data imported so far is kept")
+            # Finished rather than cancelled, so the partial import is still a single undo step.
+            return self.finish_background_import(context)
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+
+        try:
+            done = self._import.tick(FRAME_BUDGET)
+        except Exception as ex:
+            log.exception("Import failed")
+            self._import.cancel()
+            self.report({"ERROR"}, f"Import failed: {ex}")
+            return self.finish_background_import(context)
+        if done:
+            return self.finish_background_import(context)
+        context.window_manager.progress_update(int(self._import.progress * 100))
+        context.workspace.status_text_set(self._import.status)
+        return {"RUNNING_MODAL"}
+
+    def finish_background_import(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        return {"FINISHED"}
+
+
+class ExpandMaterialProperties(bpy.types.Operator):
+    """Add the parameters of BFRES materials imported with compact custom properties as separate custom properties"""
+
+    bl_idname = "material.bfres_expand_properties"
+    bl_label = "Expand BFRES Properties"
+    bl_options = {"REGISTER", "UNDO"}
+
+    all_materials: BoolProperty(
+        name="All Materials",
+        description="Expand every material in the file instead of the active one",
+        default=False,
+    )
+
+    def execute(self, context):
+        from .material_importer import expand_custom_properties
+
+        if self.all_materials:
+            materials = list(bpy.data.materials)
+        else:
+            materials = [context.material] if context.material else []
+        count = sum(expand_custom_properties(mat) for mat in materials)
+        self.report({"INFO"}, f"Expanded the properties of {count} materials")
+        return {"FINISHED"}
+
+
+def import_panel_textures(layout, operator):
+    if bpy.app.version[0] >= 4 and bpy.app.version[1] >= 1:
+        header, body = layout.panel("BFRES_import_texture", default_closed=False)
+        header.label(text="Textures")
+    else:
+        layout.label(text="Textures")
+        body = layout.column(align=False)
+    if body:
+        body.prop(operator, "import_tex_mode")
+        if operator.import_tex_mode == "INDEX":
+            body.prop(operator, "asset_index")
+        body.prop(operator, "component_selector")
+        body.prop(operator, "texture_strip_height")
+        body.prop(operator, "texture_decode_workers")
+        body.prop(operator, "texture_cache_size")
+
+
+def import_panel_mesh(layout, operator):
+    if bpy.app.version[0] >= 4 and bpy.app.version[1] >= 1:
+        header, body = layout.panel("BFRES_import_mesh", default_closed=False)
+        header.label(text="Meshes")
+    else:
+        layout.label(text="Meshes")
+        body = layout.column(align=False)
+    if body:
+        body.prop(operator, "custom_normals")
+        body.prop(operator, "lod_index")
+        body.prop(operator, "all_lods")
+        body.prop(operator, "reuse_meshes")
+
+
+def import_panel_material(layout, operator):
+    if bpy.app.version[0] >= 4 and bpy.app.version[1] >= 1:
+        header, body = layout.panel("BFRES_import_mat", default_closed=False)
+        header.label(text="Materials")
+    else:
+        layout.label(text="Materials")
+        body = layout.column(align=False)
+    if body:
+        body.prop(operator, "name_prefix")
+        body.prop(operator, "reuse_materials")
+        body.prop(operator, "compact_material_properties")
+
+
+def import_panel_misc(layout, operator):
+    if bpy.app.version[0] >= 4 and bpy.app.version[1] >= 1:
+        header, body = layout.panel("BFRES_import_misc", default_closed=False)
+        header.label(text="Misc")
+    else:
+        layout.label(text="Misc")
+        body = layout.column(align=False)
+    if body:
+        body.prop(operator, "copy_bone_transforms")
+        body.prop(operator, "add_fake_user")
+        body.prop(operator, "import_anims")
+        body.prop(operator, "background_import")
+        body.prop(operator, "parallel_files")
+        body.prop(operator, "model_cache")
+        body.prop(operator, "model_cache_size")
+
+
+def material_custom_props_draw(self, context):
+    from .material_importer import COMPACT_PROPERTY
+
+    if context.material and COMPACT_PROPERTY in context.material:
+        row = self.layout.row(align=True)
+        row.operator(ExpandMaterialProperties.bl_idname)
+        row.operator(ExpandMaterialProperties.bl_idname, text="Expand All").all_materials = True
+
+
+def menu_func_import(self, context):
+    self.layout.operator_context = "INVOKE_DEFAULT"
+    self.layout.operator(ImportBFRES.bl_idname, text="Nintendo Switch BFRES (.bfres/.szs/.zs)")
+
+
+# def menu_func_export(self, context):
+#    self.layout.operator(ExportBFRES.bl_idname, text="Nintendo Switch BFRES (.bfres)")
+
+
+classes = (
+    ImportBFRES,
+    ExpandMaterialProperties,
+    # ExportBFRES,
+)
@@ -0,0 +1,166 @@
+"""Bone rest matrices computed with NumPy, without Blender."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from .exceptions import MalformedFileError
+
+Y_UP_TO_Z_UP = np.array(
+    [
+        [1, 0, 0, 0],
+        [0, 0, -1, 0],
+        [0, 1, 0, 0],
+        [0, 0, 0, 1],
+    ],
+    dtype=np.float64,
+)
+"""Rotation of 90 degrees around X, applied to the root bones."""
+
+
+def euler_xyz_matrices(rotations: np.ndarray) -> np.ndarray:
+    """`(n, 3, 3)` rotation matrices of XYZ Euler rotations, the same as `mathutils.Euler(rotation).to_matrix()`."""
+    cx, cy, cz = np.cos(rotations).T
+    sx, sy, sz = np.sin(rotations).T
+    result = np.empty((len(rotations), 3, 3))
+    result[:, 0, 0] = cy * cz
+    result[:, 0, 1] = sx * sy * cz - cx * sz
+    result[:, 0, 2] = cx * sy * cz + sx * sz
+    result[:, 1, 0] = cy * sz
+    result[:, 1, 1] = sx * sy * sz + cx * cz
+    result[:, 1, 2] = cx * sy * sz - sx * cz
+    result[:, 2, 0] = -sy
+    result[:, 2, 1] = sx * cy
+    result[:, 2, 2] = cx * cy
+    return result
+
+
+def quaternion_matrices(rotations: np.ndarray) -> np.ndarray:
+    """`(n, 3, 3)` rotation matrices of `(w, x, y, z)` quaternions, like `Quaternion(rotation).to_matrix()`."""
+    w, x, y, z = rotations.T
+    result = np.empty((len(rotations), 3, 3))
+    result[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    result[:, 0, 1] = 2 * (x * y - w * z)
+    result[:, 0, 2] = 2 * (x * z + w * y)
+    result[:, 1, 0] = 2 * (x * y + w * z)
+    result[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    result[:, 1, 2] = 2 * (y * z - w * x)
+    result[:, 2, 0] = 2 * (x * z - w * y)
+    result[:, 2, 1] = 2 * (y * z + w * x)
+    result[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return result
+
+
+def local_matrices(fskl) -> np.ndarray:
+    """The `(bones, 4, 4)` transforms of the bones relative to their parents, from position, rotation and scale."""
+    rotations = fskl.rotations.astype(np.float64)
+    result = np.zeros((len(rotations), 4, 4))
+    result[fskl.euler, :3, :3] = euler_xyz_matrices(rotations[fskl.euler, 0:3])
+    result[~fskl.euler, :3, :3] = quaternion_matrices(rotations[~fskl.euler])
+    result[:, :3, :3] *= fskl.scales[:, np.newaxis, :]
+    result[:, :3, 3] = fskl.positions
+    result[:, 3, 3] = 1
+    return result
+
+
+def edit_bone_matrices(matrices: np.ndarray) -> np.ndarray:
+    """The matrices edit bones end up with when `matrices` are assigned to them.
+
+    Edit bones only store a head, a tail and a roll, so scale is dropped. The Y axis is kept and the Z axis is made
+    perpendicular to it.
+    """
+    result = np.zeros_like(matrices)
+    y_axis = _normalized(matrices[:, :3, 1], (0, 1, 0))
+    z_axis = matrices[:, :3, 2]
+    z_axis = _normalized(z_axis - np.sum(z_axis * y_axis, axis=1, keepdims=True) * y_axis, (0, 0, 1))
+    result[:, :3, 0] = np.cross(y_axis, z_axis)
+    result[:, :3, 1] = y_axis
+    result[:, :3, 2] = z_axis
+    result[:, :3, 3] = matrices[:, :3, 3]
+    result[:, 3, 3] = 1
+    return result
+
+
+def _normalized(vectors: np.ndarray, fallback) -> np.ndarray:
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    valid = lengths > 1e-12
+    return np.where(valid, vectors / np.where(valid, lengths, 1), np.asarray(fallback, dtype=np.float64))
+
+
+def bone_depths(parent_idx: np.ndarray) -> np.ndarray:
+    """The number of ancestors of every bone."""
+    count = len(parent_idx)
+    parents = parent_idx.astype(np.int64)
+    if np.any(parents >= count):
+        raise MalformedFileError("Bone parent index is out of bounds")
+    depths = np.zeros(count, dtype=np.int64)
+    ancestors = parents.copy()
+    for _ in range(count + 1):
+        has_parent = ancestors >= 0
+        if not has_parent.any():
+            return depths
+        depths[has_parent] += 1
+        ancestors[has_parent] = parents[ancestors[has_parent]]
+    raise MalformedFileError("Bone hierarchy has a cycle")
+
+
+def rest_matrices(fskl) -> np.ndarray:
+    """The `(bones, 4, 4)` rest matrices of a skeleton in armature space, in Blender's Z up coordinates.
+
+    These are the matrices the edit bones of the imported armature have. All bones of the same depth in the hierarchy
+    are computed at once, parents before children.
+    """
+    local = local_matrices(fskl)
+    parents = fskl.parent_idx.astype(np.int64)
+    depths = bone_depths(parents)
+    result = np.empty_like(local)
+    order = np.argsort(depths, kind="stable")
+    for level in np.split(order, np.flatnonzero(np.diff(depths[order])) + 1):
+        if not len(level):
+            continue
+        if depths[level[0]] == 0:
+            result[level] = edit_bone_matrices(Y_UP_TO_Z_UP @ local[level])
+        else:
+            result[level] = edit_bone_matrices(result[parents[level]] @ local[level])
+    return result
+
+
+def zero_roll_matrices(y_axes: np.ndarray) -> np.ndarray:
+    """The `(n, 3, 3)` orientations of bones pointing along unit `y_axes` with no roll, like Blender's
+    `vec_roll_to_mat3_normalized`.
+    """
+    x, y, z = y_axes.T
+    theta = 1 + y
+    theta_alt = x * x + z * z
+    # Close to -Y the precision of theta is bad, it is computed from x and z instead.
+    theta = np.where(theta <= 6.1e-3, theta_alt * 0.5 + theta_alt * theta_alt * 0.125, theta)
+    flipped = (theta <= 6.1e-3) & (theta_alt <= 2.5e-4**2)
+    theta = np.where(flipped, 1, theta)
+
+    result = np.empty((len(y_axes), 3, 3))
+    result[:, 0, 0] = 1 - x * x / theta
+    result[:, 0, 1] = x
+    result[:, 0, 2] = -x * z / theta
+    result[:, 1, 0] = -x
+    result[:, 1, 1] = y
+    result[:, 1, 2] = -z
+    result[:, 2, 0] = -x * z / theta
+    result[:, 2, 1] = z
+    result[:, 2, 2] = 1 - z * z / theta
+    # Pointing straight down -Y, mirrored around Z.
+    result[flipped] = np.diag([-1.0, -1.0, 1.0])
+    return result
+
+
+def head_tail_roll(matrices: np.ndarray, length: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The heads, tails and rolls of edit bones of `length` with the `(n, 4, 4)` edit bone `matrices`.
+
+    Setting these gives the same bones as assigning the matrices to `EditBone.matrix`.
+    """
+    heads = matrices[:, :3, 3]
+    y_axes = matrices[:, :3, 1]
+    tails = heads + y_axes * length
+    # The rotation from the bone without roll to the bone is around its Y axis.
+    roll_matrices = np.matmul(zero_roll_matrices(y_axes).transpose(0, 2, 1), matrices[:, :3, :3])
+    rolls = np.arctan2(roll_matrices[:, 0, 2], roll_matrices[:, 2, 2])
+    return heads, tails, rolls
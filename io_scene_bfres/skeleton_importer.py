@@ -1,49 +1,87 @@
-import math
+from contextlib import contextmanager
 
 import bpy
-import mathutils
-
-
-def import_fskl(fmdl, fskl, collection, copy_bone_transforms):
-    name = fmdl.name
-    bpy.context.scene.cursor.location = (0.0, 0.0, 0.0)
-
-    amt = bpy.data.armatures.new(name=name + ".Armature")
-    amt.relation_line_position = "HEAD"
-    arm_obj = bpy.data.objects.new(name=name, object_data=amt)
-
-    collection.objects.link(arm_obj)
-
-    previous_active = bpy.context.active_object
-    bpy.context.view_layer.objects.active = arm_obj
+import numpy as np
+
+from .skeleton_data import head_tail_roll, rest_matrices
+
+BONE_LENGTH = 0.1
+
+
+def import_fskl(fmdl, fskl, collection, copy_bone_transforms, rest=None):
+    """Create the armature of a skeleton. `rest` are its bone rest matrices, if they were computed ahead of time."""
+    return import_fskls([(fmdl, collection, rest)], copy_bone_transforms)[0]
+
+
+def import_fskls(models, copy_bone_transforms) -> list[bpy.types.Object]:
+    """Create the armatures of several models, all in one trip to edit mode.
+
+    `models` are the `(fmdl, collection, rest)` of every model, with `rest` None if the rest matrices weren't computed
+    ahead of time.
+    """
+    arm_objs = []
+    for fmdl, collection, _ in models:
+        amt = bpy.data.armatures.new(name=fmdl.name + ".Armature")
+        amt.relation_line_position = "HEAD"
+        arm_obj = bpy.data.objects.new(name=fmdl.name, object_data=amt)
+        collection.objects.link(arm_obj)
+        arm_objs.append(arm_obj)
+    if not arm_objs:
+        return arm_objs
+
+    with _editing(arm_objs):
+        for (fmdl, _, rest), arm_obj in zip(models, arm_objs):
+            _add_bones(arm_obj.data, fmdl.skeleton, rest_matrices(fmdl.skeleton) if rest is None else rest)
+
+    active = bpy.context.active_object
+    for (fmdl, _, _), arm_obj in zip(models, arm_objs):
+        if fmdl.skeleton.flags_rotation.name == "EULER_XYZ":
+            for pb in arm_obj.pose.bones:
+                pb.rotation_mode = "XYZ"
+        if copy_bone_transforms and active:
+            copy_transforms(arm_obj, active)
+    return arm_objs
+
+
+@contextmanager
+def _editing(objects: list[bpy.types.Object]):
+    """Put all `objects` in edit mode together, then go back to object mode with the previous selection."""
+    view_layer = bpy.context.view_layer
+    previous_active = view_layer.objects.active
+    previous_selected = list(bpy.context.selected_objects)
+    for obj in previous_selected:
+        obj.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    view_layer.objects.active = objects[0]
 
     bpy.ops.object.mode_set(mode="EDIT", toggle=False)
-    bone_objs = {}
-    for i, bone in enumerate(fskl.bones.values()):
-        bone_obj = amt.edit_bones.new(name=bone.name)
-        bone_objs[i] = bone_obj
-        bone_obj.use_relative_parent = True
-        bone_obj.use_local_location = True
-
-        bone_obj.length = 0.1
-        if bone.parent_idx >= 0:
-            bone_obj.parent = bone_objs[bone.parent_idx]
-            bone_obj.matrix = bone_obj.parent.matrix @ __bone_matrix(bone)
-        else:
-            matrix = __bone_matrix(bone)
-
-            bone_obj.matrix = mathutils.Matrix.Rotation(math.radians(90), 4, (1, 0, 0)) @ matrix
-        bone.matrix = bone_obj.matrix
-    bpy.ops.object.mode_set(mode="OBJECT")
-    bpy.context.view_layer.objects.active = previous_active
-
-    if fskl.flags_rotation.name == "EULER_XYZ":
-        for pb in arm_obj.pose.bones:
-            pb.rotation_mode = "XYZ"
-    if copy_bone_transforms and bpy.context.active_object:
-        copy_transforms(arm_obj, bpy.context.active_object)
-
-    return arm_obj
+    try:
+        yield
+    finally:
+        bpy.ops.object.mode_set(mode="OBJECT")
+        for obj in objects:
+            obj.select_set(False)
+        for obj in previous_selected:
+            obj.select_set(True)
+        view_layer.objects.active = previous_active
+
+
+def _add_bones(amt: bpy.types.Armature, fskl, rest: np.ndarray):
+    """Add the edit bones of a skeleton, with their head, tail and roll set from the rest matrices all at once."""
+    edit_bones = amt.edit_bones
+    bone_objs = [edit_bones.new(name=bone.name) for bone in fskl.bones.values()]
+    for bone_obj, parent_idx in zip(bone_objs, fskl.parent_idx.tolist()):
+        if parent_idx >= 0:
+            bone_obj.parent = bone_objs[parent_idx]
+
+    heads, tails, rolls = head_tail_roll(rest, BONE_LENGTH)
+    edit_bones.foreach_set("head", heads.astype(np.float32).ravel())
+    edit_bones.foreach_set("tail", tails.astype(np.float32).ravel())
+    edit_bones.foreach_set("roll", rolls.astype(np.float32))
+    enabled = np.ones(len(bone_objs), dtype=bool)
+    edit_bones.foreach_set("use_relative_parent", enabled)
+    edit_bones.foreach_set("use_local_location", enabled)
 
 
 def copy_transforms(new_armature: bpy.types.Object, active: bpy.types.Object):
@@ -64,14 +102,3 @@ def __add_constraint(pose_bone, bone_name: str, active: bpy.types.Object):
     constraint.target = active
     constraint.subtarget = bone_name
 
-
-def __bone_matrix(obj):
-    L = mathutils.Vector(obj.position[0:3])
-    if obj.bone_flags_rotation.name == "EULER_XYZ":
-        R = mathutils.Euler(obj.rotation[0:3])
-    else:
-        R = mathutils.Quaternion(obj.rotation)
-    S = mathutils.Vector(obj.scale[0:3])
-    M = mathutils.Matrix.LocRotScale(L, R, S)
-
-    return M
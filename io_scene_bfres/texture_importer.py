@@ -6,87 +6,134 @@ from typing import TYPE_CHECKING
 import bpy
 import numpy as np
 
+from .bntx.cache import decode_cached, decode_key, decoded_textures
+from .bntx.preview import DEFAULT_PREVIEW_SIZE, preview
+from .loading import texture_channel_types
+
 log = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
     from .bntx.bntx import BNTX
+    from .bntx.brti import BRTI
+    from .bntx.pixelfmt.parallel import DecodePool
+
+
+class TextureMap:
+    """The Blender images of the textures in the loaded BNTX files.
+
+    An image is only created, and its texture decoded, when a material first asks for it.
+    """
+
+    def __init__(self, operator, decode_pool: DecodePool | None = None):
+        self.operator = operator
+        self.decode_pool = decode_pool
+        self.images: dict[str, bpy.types.Image] = {}
+        self.sources: list[BNTX] = []
+        self.decoded: dict[tuple, np.ndarray] = {}
+
+    def add_bntx(self, bntx: BNTX):
+        self.sources.append(bntx)
+
+    def add_decoded(self, decoded: dict[tuple, np.ndarray]):
+        """Add textures that were already decoded while loading, by `bntx.cache.decode_key`."""
+        self.decoded.update(decoded)
 
+    def get(self, name: str) -> bpy.types.Image | None:
+        image = self.images.get(name)
+        if image is not None:
+            return image
+        for bntx in self.sources:
+            tex = bntx.get(name)
+            if tex is not None:
+                log.info("Importing texture '%s'...", tex.name)
+                image = self.images[name] = import_texture(tex, self.operator, self.decoded, self.decode_pool)
+                return image
+        return None
 
-def import_textures(bntx: BNTX, operator):
+    def import_all(self):
+        """Import the textures no material has asked for."""
+        for bntx in self.sources:
+            skip = self.images.keys()
+            self.images.update(import_textures(bntx, self.operator, skip, self.decoded, self.decode_pool))
+
+
+def import_textures(bntx: BNTX, operator, skip=(), decoded=None, pool: DecodePool | None = None):
     """Import textures from BNTX."""
     images = {}
     for i, tex in enumerate(bntx.nx.textures):
-        log.info(
-            "Importing texture %3d/%3d '%s' (%s, %s)...",
-            i + 1,
-            len(bntx.nx.textures),
-            tex.name,
-            tex.format_.__name__,
-            tex.fmt_dtype.name,
-        )
-        float_buffer = False
-        isdata = not bool(tex.fmt_dtype.name == "SRGB")
-        alpha = bool(b"\x05" in tex.channel_types)
-
-        if tex.fmt_dtype.name in {"UHALF", "SINGLE"}:
-            isdata = False
-            float_buffer = True
-
-        image = bpy.data.images.new(
-            name=operator.name_prefix + tex.name,
-            width=tex.width,
-            height=tex.height,
-            float_buffer=float_buffer,
-            alpha=alpha,
-            is_data=isdata,
+        if tex.name in skip:
+            continue
+        log.info("Importing texture %3d/%3d '%s'...", i + 1, len(bntx.nx.textures), tex.name)
+        images[tex.name] = import_texture(tex, operator, decoded, pool)
+    return images
+
+
+def import_texture(tex: BRTI, operator, decoded=None, pool: DecodePool | None = None) -> bpy.types.Image:
+    """Decode a texture and create a packed Blender image from it.
+
+    `decoded` maps `bntx.cache.decode_key` keys to pixels that were decoded ahead of time. Textures that weren't are
+    decoded on `pool` if they are large and it is given.
+    """
+    log.debug("Texture '%s' is %s, %s", tex.name, tex.format_.__name__, tex.fmt_dtype.name)
+    decoded_textures.resize(operator.texture_cache_size * 1024 * 1024)
+
+    float_buffer = False
+    isdata = not bool(tex.fmt_dtype.name == "SRGB")
+    alpha = bool(b"\x05" in tex.channel_types)
+
+    if tex.fmt_dtype.name in {"UHALF", "SINGLE"}:
+        isdata = False
+        float_buffer = True
+
+    image = bpy.data.images.new(
+        name=operator.name_prefix + tex.name,
+        width=tex.width,
+        height=tex.height,
+        float_buffer=float_buffer,
+        alpha=alpha,
+        is_data=isdata,
+    )
+
+    channel_types = texture_channel_types(tex, operator.component_selector)
+
+    # Decode in strips straight into the final buffer, flipped from dx to gl.
+    # Textures decoded earlier in the session are reused.
+    key = decode_key(tex, channel_types, flip=True)
+    pixels = decoded.get(key) if decoded else None
+    if pixels is not None:
+        decoded_textures.put(key, pixels)
+    else:
+        pixels = decode_cached(
+            tex,
+            pool=pool,
+            strip_height=operator.texture_strip_height,
+            channel_types=channel_types,
+            flip=True,
         )
 
-        # Issues arise when textures are not multiples of 4, pretty rare.
-        if len(tex.pixels) > tex.width * tex.height * 4:
-            pixels = tex.pixels[: tex.width * tex.height * 4]
-            pixels = tex.format_.decodepixels(pixels)
-        else:
-            pixels = tex.format_.decodepixels(tex.pixels)
-        pixels = pixels.reshape((tex.height, tex.width, 4))
-
-        if (
-            operator.component_selector
-            and tex.format_.__name__ != "BC1"  # don't make alpha channel if it's not needed
-            and not (tex.format_.__name__ == "BC5" and tex.channel_types[2] == 0)  # normal maps
-        ):
-            temppix = pixels.copy()
-            for ch in range(4):
-                if tex.channel_types[ch] == ch + 2:
-                    continue
-                match tex.channel_types[ch]:
-                    case 0:
-                        pixels[..., ch] = 0
-                    case 1:
-                        pixels[..., ch] = 1
-                    case 2:
-                        pixels[..., ch] = temppix[..., 0]
-                    case 3:
-                        pixels[..., ch] = temppix[..., 1]
-                    case 4:
-                        pixels[..., ch] = temppix[..., 2]
-                    case 5:
-                        pixels[..., ch] = temppix[..., 3]
-
-        # Add some file data if it's needed:
-        if tex.fmt_dtype.name in {"UHALF", "SINGLE"}:
-            image.file_format = "OPEN_EXR"
-            image.colorspace_settings.name = "sRGB"
-        else:
-            image.file_format = "PNG"
-
-        # flip image from dx to gl
-        pixels = np.flipud(pixels)
-
-        image.pixels = np.ravel(pixels)
-
-        image.use_fake_user = operator.add_fake_user
-
-        image.update()
-        image.pack()
-        images[tex.name] = image
-    return images
+    # Add some file data if it's needed:
+    if tex.fmt_dtype.name in {"UHALF", "SINGLE"}:
+        image.file_format = "OPEN_EXR"
+        image.colorspace_settings.name = "sRGB"
+    else:
+        image.file_format = "PNG"
+
+    image.pixels.foreach_set(np.ravel(pixels))
+    _set_preview(image, tex, channel_types, pixels, operator.texture_strip_height)
+
+    image.use_fake_user = operator.add_fake_user
+
+    image.update()
+    image.pack()
+    return image
+
+
+def _set_preview(image, tex, channel_types, decoded: np.ndarray, strip_height: int):
+    """Give the image a preview from a small mip level, so Blender doesn't scale down the full image for it.
+
+    `decoded` is the full image, bottom row first, which is subsampled if there is no smaller level to use.
+    """
+    pixels = preview(tex, DEFAULT_PREVIEW_SIZE, channel_types, strip_height, decoded[::-1])
+    image_preview = image.preview_ensure()
+    image_preview.image_size = (pixels.shape[1], pixels.shape[0])
+    image_preview.image_pixels_float.foreach_set(np.ravel(pixels[::-1]))
@@ -0,0 +1,62 @@
+"""Wall clock timing of the import stages, to see how much they overlap, and counts of what happened in them."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class StageTimings:
+    """Collects how long every stage took and on which thread, stages may run at the same time."""
+
+    def __init__(self):
+        self.spans: list[tuple[str, str, float, float]] = []
+        """`(stage, thread name, start, end)` of every timed section."""
+        self.counters: dict[str, int] = defaultdict(int)
+        """Counts of events during the import, like cache hits."""
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.spans.append((name, threading.current_thread().name, start, end))
+
+    def count(self, name: str, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def totals(self) -> dict[str, float]:
+        """The time spent in every stage, in seconds."""
+        totals = defaultdict(float)
+        with self._lock:
+            for name, _, start, end in self.spans:
+                totals[name] += end - start
+        return dict(totals)
+
+    def wall_time(self) -> float:
+        """The time from the start of the first stage to the end of the last."""
+        with self._lock:
+            if not self.spans:
+                return 0.0
+            return max(end for *_, end in self.spans) - min(start for _, _, start, _ in self.spans)
+
+    def report(self):
+        """Log the time of every stage, and how much of it ran alongside other stages."""
+        totals = self.totals()
+        for name, seconds in totals.items():
+            threads = sorted({thread for stage, thread, _, _ in self.spans if stage == name})
+            log.info("%-16s %8.3fs on %s", name, seconds, ", ".join(threads))
+        wall = self.wall_time()
+        log.info("%.3fs of work in %.3fs", sum(totals.values()), wall)
+        for name, value in sorted(self.counters.items()):
+            log.info("%-24s %8d", name, value)
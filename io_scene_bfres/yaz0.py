@@ -5,13 +5,16 @@ import struct
 log = logging.getLogger(__name__)
 
 
-def decompress(compressed: io.BufferedReader):
+def decompress(compressed: io.BufferedReader, max_size: int | None = None):
+    """Decompress a Yaz0 stream, or only about its first `max_size` bytes."""
     # Not using BinaryReader and BinaryRandom here to combat the horrible performance a bit.
     log.debug("Decompressing Yaz0 file...")
     # Read the header.
     if compressed.read(4).decode("ascii") != "Yaz0":
         raise AssertionError("Invalid Yaz0 header.")
     decompressed_size = struct.unpack(">I", compressed.read(4))[0]
+    if max_size is not None:
+        decompressed_size = min(decompressed_size, max_size)
     compressed.seek(8, io.SEEK_CUR)  # Padding
     # Decompress the data into an array. Cache methods to avoid looking them up in the loop.
     decompressed = bytearray()
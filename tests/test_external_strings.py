@@ -0,0 +1,54 @@
+"""Files holding external strings are found from the start of their header, also when they are compressed."""
+
+import io
+import struct
+
+import pytest
+import zstandard
+
+from io_scene_bfres import container
+from io_scene_bfres.bfrespy import scan
+from io_scene_bfres.bfrespy.res_file import ResFile
+from io_scene_bfres.loading import holds_external_strings, load_batches
+
+
+def _header(version: int, flags: int, size: int = 0x400) -> bytes:
+    data = bytearray(size)
+    struct.pack_into("<4s4sI2s", data, 0, b"FRES", b"    ", version, b"\xff\xfe")
+    data[0xEE] = flags
+    return bytes(data)
+
+
+def _yaz0(data: bytes) -> bytes:
+    # Only raw bytes, every group of 8 preceded by a configuration byte with all bits set.
+    groups = (b"\xff" + data[i : i + 8] for i in range(0, len(data), 8))
+    return b"Yaz0" + struct.pack(">I", len(data)) + bytes(8) + b"".join(groups)
+
+
+STRINGS = _header(0x000A_0000, ResFile.ExternalFlags.HOLDS_EXTERNAL_STRINGS)
+MODEL = _header(0x000A_0000, ResFile.ExternalFlags.HAS_EXTERNAL_STRING)
+
+
+@pytest.mark.parametrize("compress", [bytes, zstandard.ZstdCompressor().compress, _yaz0])
+def test_decompressed_head(compress):
+    assert container.decompressed_head(io.BytesIO(compress(STRINGS)), 0x100) == STRINGS[:0x100]
+
+
+def test_holds_external_strings():
+    assert scan.holds_external_strings(STRINGS)
+    assert not scan.holds_external_strings(MODEL)
+    # Older versions have no flags at that offset.
+    assert not scan.holds_external_strings(_header(0x0009_0000, ResFile.ExternalFlags.HOLDS_EXTERNAL_STRINGS))
+    assert not scan.holds_external_strings(STRINGS[: scan.HEADER_SIZE - 1])
+
+
+def test_load_batches(tmp_path):
+    paths = []
+    for name, data in [("a.bfres.zs", MODEL), ("b.bfres.zs", STRINGS), ("c.bfres", MODEL), ("d.bfres", b"")]:
+        path = tmp_path / name
+        path.write_bytes(zstandard.ZstdCompressor().compress(data) if name.endswith(".zs") else data)
+        paths.append(path)
+    assert holds_external_strings(paths[1])
+    assert not holds_external_strings(tmp_path / "missing.bfres")
+    assert load_batches(paths) == [[paths[1]], [paths[0], paths[2], paths[3]]]
+    assert load_batches([paths[0]]) == [[paths[0]]]
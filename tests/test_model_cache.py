@@ -0,0 +1,28 @@
+"""Cached files are only reused when they would be loaded the same way again."""
+
+from pathlib import Path
+
+from io_scene_bfres.loading import ImportOptions, ParsedFile
+from io_scene_bfres.model_cache import ModelCache
+
+
+def _cached(tmp_path: Path) -> tuple[ModelCache, Path]:
+    path = tmp_path / "model.bfres"
+    path.write_bytes(b"FRES")
+    cache = ModelCache(tmp_path / "cache")
+    parsed = ParsedFile(path, texts={"name": "first"})
+    cache.put(path, ImportOptions(), parsed, external_strings={1: "first"})
+    return cache, path
+
+
+def test_same_strings(tmp_path):
+    cache, path = _cached(tmp_path)
+    assert cache.get(path, ImportOptions(), {1: "first"}).texts == {"name": "first"}
+
+
+def test_other_strings(tmp_path):
+    cache, path = _cached(tmp_path)
+    # Names parsed with another table, or without one, would be wrong.
+    assert cache.get(path, ImportOptions(), {1: "second"}) is None
+    assert cache.get(path, ImportOptions()) is None
+    assert cache.get(path, ImportOptions(lod_index=1), {1: "first"}) is None
@@ -0,0 +1,39 @@
+"""Textures decoded on a `DecodePool` are the same as textures decoded in this process."""
+
+import numpy as np
+
+from io_scene_bfres.bntx.brti import BRTI
+from io_scene_bfres.bntx.pixelfmt.base import TextureFormat
+from io_scene_bfres.bntx.pixelfmt.parallel import PARALLEL_MIN_PIXELS, DecodePool, decode_parallel
+
+
+def _texture(seed: int) -> BRTI:
+    tex = BRTI()
+    tex.name = f"texture {seed}"
+    tex.fmt_id = 0x0B  # R8G8B8A8
+    tex.fmt_dtype = BRTI.TextureDataType(1)
+    tex.format_ = TextureFormat.get(tex.fmt_id)
+    tex.width = tex.height = int(PARALLEL_MIN_PIXELS**0.5)
+    tex.blk_width = tex.blk_height = 1
+    tex.bpp = 4
+    tex.tile_mode = 0
+    tex.gob_height_log2 = 4
+    size = tex.width * tex.height * tex.bpp * 2
+    tex.data = np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+    return tex
+
+
+def test_pool_matches_serial():
+    textures = [_texture(seed) for seed in range(2)]
+    with DecodePool(2) as pool:
+        flipped = decode_parallel(textures[0], pool, flip=True)
+        executor = pool.executor()
+        selected = decode_parallel(textures[1], pool, channel_types=b"\x05\x04\x03\x02")
+        # Every texture of an import is decoded on the same processes.
+        assert pool.executor() is executor
+    assert np.array_equal(flipped, decode_parallel(textures[0], flip=True))
+    assert np.array_equal(selected, decode_parallel(textures[1], channel_types=b"\x05\x04\x03\x02"))
+    # Views keep the shared memory the pixels were decoded into.
+    view = flipped[::-1]
+    del flipped
+    assert np.array_equal(view[::-1], decode_parallel(textures[0], flip=True))
@@ -0,0 +1,88 @@
+"""Parsing on threads and processes gives the same results as parsing one file after another.
+
+Every input is a small Switch blob with a `BufferTextureViewInfo`, a `Mesh` whose index data is found through it, a
+string in the file and a string ID from an external string table. Each file has its own buffer offset and table, so
+state shared between files shows up as another file's indices or strings.
+"""
+
+import io
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from io_scene_bfres.bfrespy.models.shape import Mesh
+from io_scene_bfres.bfrespy.res_file import ResFile
+from io_scene_bfres.bfrespy.switch.memory_pool import BufferTextureViewInfo
+from io_scene_bfres.bfrespy.switch.switchcore import ResFileSwitchLoader
+
+FILES = 8
+EXTERNAL_ID = 0x1234_0000_0000
+BUFFER_INFO_OFFSET = 104
+STRING_OFFSET = 152
+
+
+def _indices(seed: int) -> list[int]:
+    return [seed * 100 + i for i in range(6)]
+
+
+def _blob(seed: int) -> bytes:
+    indices = struct.pack("<6H", *_indices(seed))
+    buff_offs = 256 + 32 * seed
+    face_buff_offs = 16 * (FILES - seed)
+    name = f"file {seed}".encode()
+
+    data = bytearray(buff_offs + face_buff_offs + len(indices))
+    # BufferTextureViewInfo: unknown, size, buffer offset and padding
+    struct.pack_into("<IIq", data, 0, 0, 0, buff_offs)
+    # Mesh: submeshes, memory pool, buffer, buffer info, face buffer offset, primitive type, index format,
+    # index count, first vertex, submesh count and padding
+    struct.pack_into("<QQQQIIIIIHH", data, 32, 0, 0, 0, BUFFER_INFO_OFFSET, face_buff_offs, 3, 1, 6, seed, 0, 0)
+    # The offsets of a string in the file and of a string in the external table
+    struct.pack_into("<QQ", data, 88, STRING_OFFSET, EXTERNAL_ID + seed)
+    # BufferInfo: size and flags
+    struct.pack_into("<II", data, BUFFER_INFO_OFFSET, len(indices), 0)
+    struct.pack_into(f"<H{len(name)}sx", data, STRING_OFFSET, len(name), name)
+    data[buff_offs + face_buff_offs :] = indices
+    return bytes(data)
+
+
+def parse(seed: int, barrier: threading.Barrier | None = None) -> tuple:
+    """Parse the blob of `seed`, waiting at `barrier` after its buffer info is read."""
+    res_file = ResFile.__new__(ResFile)
+    external_strings = {EXTERNAL_ID + seed: f"external {seed}"}
+    loader = ResFileSwitchLoader(res_file, io.BytesIO(_blob(seed)), string_cache=external_strings)
+    res_file.buffer_info = loader.load(BufferTextureViewInfo, use_offset=False)
+    if barrier is not None:
+        # Every file has its buffer info before any of them uses it.
+        barrier.wait(timeout=10)
+    mesh = Mesh()
+    mesh.load(loader)
+    name, external_name = loader.load_string(), loader.load_string()
+    return res_file.buffer_info.buff_offs, bytes(mesh.index_buffer.data[0]), mesh.first_vtx, name, external_name
+
+
+def _serial() -> list[tuple]:
+    return [parse(seed) for seed in range(FILES)]
+
+
+def test_serial():
+    for seed, (_, indices, first_vtx, name, external_name) in enumerate(_serial()):
+        assert list(struct.unpack("<6H", indices)) == _indices(seed)
+        assert first_vtx == seed
+        assert name == f"file {seed}"
+        assert external_name == f"external {seed}"
+
+
+def test_threads():
+    barrier = threading.Barrier(FILES)
+    with ThreadPoolExecutor(max_workers=FILES) as pool:
+        results = list(pool.map(parse, range(FILES), [barrier] * FILES))
+    assert results == _serial()
+
+
+def test_processes():
+    # Spawned like on Windows and macOS, so the package has to import without Blender.
+    with ProcessPoolExecutor(max_workers=2, mp_context=get_context("spawn")) as pool:
+        results = list(pool.map(parse, range(FILES)))
+    assert results == _serial()
@@ -0,0 +1,37 @@
+"""Previews subsample pixels that are already decoded instead of decoding the first mip level again."""
+
+import numpy as np
+
+from io_scene_bfres.bntx.brti import BRTI
+from io_scene_bfres.bntx.pixelfmt.base import TextureFormat
+from io_scene_bfres.bntx.pixelfmt.parallel import decode_parallel
+from io_scene_bfres.bntx.preview import preview
+
+
+def _texture(size: int) -> BRTI:
+    tex = BRTI()
+    tex.name = "texture"
+    tex.fmt_id = 0x0B  # R8G8B8A8
+    tex.fmt_dtype = BRTI.TextureDataType(1)
+    tex.format_ = TextureFormat.get(tex.fmt_id)
+    tex.width = tex.height = size
+    tex.blk_width = tex.blk_height = 1
+    tex.bpp = 4
+    tex.tile_mode = 0
+    tex.gob_height_log2 = tex.blk_height_log2 = 4
+    tex.mip_offsets = [0]
+    tex.data = np.random.default_rng(0).integers(0, 256, size * size * tex.bpp * 2, dtype=np.uint8).tobytes()
+    return tex
+
+
+def test_decoded_in_strips():
+    tex = _texture(256)
+    assert np.array_equal(preview(tex, 128, strip_height=16), decode_parallel(tex)[::2, ::2])
+
+
+def test_reuses_decoded():
+    tex = _texture(256)
+    decoded = decode_parallel(tex)
+    pixels = preview(tex, 128, strip_height=16, decoded=decoded)
+    assert pixels.shape == (128, 128, 4)
+    assert np.shares_memory(pixels, decoded)
@@ -0,0 +1,147 @@
+"""`mesh_data.assemble_primitives` and `_assemble_elements` against a straightforward per-primitive loop."""
+
+import numpy as np
+import pytest
+
+from io_scene_bfres.bfrespy.gx2 import GX2PrimitiveType as Primitive
+from io_scene_bfres.exceptions import MalformedFileError
+from io_scene_bfres.mesh_data import PRIMITIVE_RESTART, _assemble_elements, assemble_primitives
+
+LIST_TYPES = {
+    Primitive.POINTS,
+    Primitive.LINES,
+    Primitive.LINES_ADJACENCY,
+    Primitive.TRIANGLES,
+    Primitive.TRIANGLES_ADJACENCY,
+}
+STRIP_TYPES = {
+    Primitive.LINE_STRIP,
+    Primitive.LINE_STRIP_ADJACENCY,
+    Primitive.TRIANGLE_STRIP,
+    Primitive.TRIANGLE_STRIP_ADJACENCY,
+}
+TRIANGLE_TYPES = {
+    Primitive.TRIANGLES,
+    Primitive.TRIANGLES_ADJACENCY,
+    Primitive.TRIANGLE_STRIP,
+    Primitive.TRIANGLE_STRIP_ADJACENCY,
+}
+
+
+def _strips(indices):
+    strip = []
+    for index in indices:
+        if index == PRIMITIVE_RESTART:
+            yield strip
+            strip = []
+        else:
+            strip.append(int(index))
+    yield strip
+
+
+def reference_primitives(primitive_type, indices) -> list[tuple[int, ...]]:
+    """The primitives of an index buffer one at a time, as the GL specification describes them."""
+    result = []
+    for s in _strips(indices):
+        n = len(s)
+        match primitive_type:
+            case Primitive.POINTS:
+                pass
+            case Primitive.LINES:
+                result += [(s[i], s[i + 1]) for i in range(0, n - 1, 2)]
+            case Primitive.LINE_STRIP:
+                result += [(s[i], s[i + 1]) for i in range(n - 1)]
+            case Primitive.LINES_ADJACENCY:
+                result += [(s[i + 1], s[i + 2]) for i in range(0, n - 3, 4)]
+            case Primitive.LINE_STRIP_ADJACENCY:
+                result += [(s[i + 1], s[i + 2]) for i in range(n - 3)]
+            case Primitive.TRIANGLES:
+                result += [(s[i], s[i + 1], s[i + 2]) for i in range(0, n - 2, 3)]
+            case Primitive.TRIANGLES_ADJACENCY:
+                result += [(s[i], s[i + 2], s[i + 4]) for i in range(0, n - 5, 6)]
+            case Primitive.TRIANGLE_STRIP:
+                for i in range(n - 2):
+                    a, b, c = s[i], s[i + 1], s[i + 2]
+                    result.append((b, a, c) if i % 2 else (a, b, c))
+            case Primitive.TRIANGLE_STRIP_ADJACENCY:
+                for i in range((n - 4) // 2):
+                    a, b, c = s[2 * i], s[2 * i + 2], s[2 * i + 4]
+                    result.append((b, a, c) if i % 2 else (a, b, c))
+    return result
+
+
+def reference_elements(primitive_type, indices) -> list[tuple[int, ...]]:
+    """The primitives without degenerate ones and without repeats of the same vertices in any order."""
+    result, seen = [], set()
+    for primitive in reference_primitives(primitive_type, indices):
+        key = tuple(sorted(primitive))
+        if len(set(primitive)) == len(primitive) and key not in seen:
+            seen.add(key)
+            result.append(primitive)
+    return result
+
+
+def _random_indices(rng, primitive_type, count, num_vtx=10):
+    indices = rng.integers(0, num_vtx, size=count).astype(np.uint32)
+    if primitive_type in STRIP_TYPES:
+        indices[rng.random(count) < 0.1] = PRIMITIVE_RESTART
+    return indices
+
+
+@pytest.mark.parametrize("primitive_type", sorted(LIST_TYPES | STRIP_TYPES))
+def test_matches_reference(primitive_type):
+    rng = np.random.default_rng(int(primitive_type))
+    for _ in range(200):
+        indices = _random_indices(rng, primitive_type, int(rng.integers(0, 40)))
+        result = assemble_primitives(primitive_type, indices)
+        assert [tuple(row) for row in result.tolist()] == reference_primitives(primitive_type, indices)
+
+
+@pytest.mark.parametrize("primitive_type", sorted(LIST_TYPES | STRIP_TYPES))
+def test_elements_match_reference(primitive_type):
+    rng = np.random.default_rng(int(primitive_type) + 100)
+    for _ in range(200):
+        # Few vertices, so there are many degenerate and repeated primitives.
+        indices = _random_indices(rng, primitive_type, int(rng.integers(0, 60)), num_vtx=5)
+        faces, edges = _assemble_elements(primitive_type, indices, 5)
+        elements = faces if primitive_type in TRIANGLE_TYPES else edges
+        assert [tuple(row) for row in elements.tolist()] == reference_elements(primitive_type, indices)
+        assert len(faces) == 0 or len(edges) == 0
+
+
+def test_triangle_strip_winding():
+    indices = np.array([0, 1, 2, 3, 4], dtype=np.uint32)
+    assert assemble_primitives(Primitive.TRIANGLE_STRIP, indices).tolist() == [[0, 1, 2], [2, 1, 3], [2, 3, 4]]
+
+
+def test_triangle_strip_restart():
+    # The winding starts over after a restart.
+    indices = np.array([0, 1, 2, 3, PRIMITIVE_RESTART, 4, 5, 6, 7], dtype=np.uint32)
+    assert assemble_primitives(Primitive.TRIANGLE_STRIP, indices).tolist() == [
+        [0, 1, 2],
+        [2, 1, 3],
+        [4, 5, 6],
+        [6, 5, 7],
+    ]
+
+
+def test_triangle_strip_adjacency():
+    indices = np.array([0, 10, 1, 11, 2, 12, 3, 13], dtype=np.uint32)
+    assert assemble_primitives(Primitive.TRIANGLE_STRIP_ADJACENCY, indices).tolist() == [[0, 1, 2], [2, 1, 3]]
+
+
+def test_degenerate_and_repeated_faces():
+    indices = np.array([0, 1, 2, 0, 0, 1, 2, 1, 0, 1, 2, 3], dtype=np.uint32)
+    faces, edges = _assemble_elements(Primitive.TRIANGLES, indices, 4)
+    assert faces.tolist() == [[0, 1, 2], [1, 2, 3]]
+    assert edges.shape == (0, 2)
+
+
+def test_out_of_bounds():
+    with pytest.raises(MalformedFileError):
+        _assemble_elements(Primitive.TRIANGLES, np.array([0, 1, 5], dtype=np.uint32), 3)
+
+
+def test_unsupported_type():
+    with pytest.raises(MalformedFileError):
+        assemble_primitives(Primitive.QUADS, np.arange(4, dtype=np.uint32))